@@ -456,6 +456,57 @@ def send_mail(customer_id: str, stage: str, condition: str = None) -> Dict[str,
         }
 
 
+# Logic App endpoint for templated emails (also used by the orchestrator's email outbox)
+EMAIL_TEMPLATE_API_URL = "https://demo1414.azurewebsites.net:443/api/updated_customer_communication_agent/triggers/When_a_HTTP_request_is_received/invoke?api-version=2022-05-01&sp=%2Ftriggers%2FWhen_a_HTTP_request_is_received%2Frun&sv=1.0&sig=2uR2bnk-5cSwS7mQzgwyEZB-csvLYxTzBwlUL5YMdfM"
+
+
+def build_email_template_payload(customer_id: str, stage: str):
+    """
+    Build the Logic App payload for a templated stage email.
+    
+    :param customer_id (str): The customer's unique ID number
+    :param stage (str): The loan process stage
+    :return: (payload, None) on success or (None, error result) when the stage has no template
+    """
+    
+    # Import the mapping function
+    from email_templates import map_stage_to_template
+    
+    # Map stage to template name
+    template_name = map_stage_to_template(stage)
+    
+    if not template_name:
+        return None, {
+            "status": "error",
+            "customer_id": customer_id,
+            "stage": stage,
+            "message": f"Could not map stage '{stage}' to template. Available stages: 1-6 or application, document_submission, verification, document_approval, approval, loan_letter"
+        }
+    
+    # Get the email template
+    templates = get_email_templates()
+    
+    if template_name not in templates:
+        return None, {
+            "status": "error",
+            "customer_id": customer_id,
+            "stage": stage,
+            "template_name": template_name,
+            "message": f"Template '{template_name}' not found. Available templates: {list(templates.keys())}"
+        }
+    
+    template = templates[template_name]
+    
+    # Payload with template subject and body (like send_mail function structure)
+    return {
+        "customerId": customer_id,
+        "stage": stage,
+        "template_name": template_name,
+        "email_subject": template["subject"],
+        "email_body": template["body"]
+    }, None
+
+
 def send_email_template(customer_id: str, stage: str) -> Dict[str, Any]:
     """
     Send a templated email using predefined email templates for loan process communication.
@@ -469,58 +520,34 @@ def send_email_template(customer_id: str, stage: str) -> Dict[str, Any]:
     :rtype: Dict[str, Any]
     """
     
-    # Import the mapping function
-    from email_templates import map_stage_to_template
-    
-    # Email sending endpoint (same as send_mail but for templates)
-    api_url = "https://demo1414.azurewebsites.net:443/api/updated_customer_communication_agent/triggers/When_a_HTTP_request_is_received/invoke?api-version=2022-05-01&sp=%2Ftriggers%2FWhen_a_HTTP_request_is_received%2Frun&sv=1.0&sig=2uR2bnk-5cSwS7mQzgwyEZB-csvLYxTzBwlUL5YMdfM"
-    
     try:
-        # Map stage to template name
-        template_name = map_stage_to_template(stage)
+        payload, error = build_email_template_payload(customer_id, stage)
+        if error:
+            return error
+        template_name = payload["template_name"]
         
-        if not template_name:
-            return {
-                "status": "error",
-                "customer_id": customer_id,
-                "stage": stage,
-                "message": f"Could not map stage '{stage}' to template. Available stages: 1-6 or application, document_submission, verification, document_approval, approval, loan_letter"
-            }
+        print(f"Sending {template_name} template email for customer {customer_id}...")
         
-        # Get the email template
-        templates = get_email_templates()
+        # Make the HTTP POST request
+        response = requests.post(
+            EMAIL_TEMPLATE_API_URL,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=30
+        )
         
-        if template_name not in templates:
+        if response.status_code >= 400:
+            print(f"Logic App returned HTTP {response.status_code} for customer {customer_id}")
             return {
                 "status": "error",
                 "customer_id": customer_id,
                 "stage": stage,
                 "template_name": template_name,
-                "message": f"Template '{template_name}' not found. Available templates: {list(templates.keys())}"
+                "http_status": response.status_code,
+                "retry_after": response.headers.get("Retry-After"),
+                "message": f"Logic App rejected the email with HTTP {response.status_code}"
             }
         
-        template = templates[template_name]
-        email_subject = template["subject"]
-        email_body = template["body"]
-        
-        print(f"Sending {template_name} template email for customer {customer_id}...")
-        
-        # Prepare payload with template subject and body (like send_mail function structure)
-        payload = {
-            "customerId": customer_id,
-            "stage": stage,
-            "template_name": template_name,
-            "email_subject": email_subject,
-            "email_body": email_body
-        }
-        
-        # Make the HTTP POST request
-        response = requests.post(
-            api_url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-        )
-        
         # Return success response (similar to send_mail function)
         result = {
             "status": "submitted",
@@ -533,6 +560,16 @@ def send_email_template(customer_id: str, stage: str) -> Dict[str, Any]:
         print(f"Email template sent successfully for customer {customer_id}")
         return result
         
+    except (requests.ConnectionError, requests.Timeout) as e:
+        # Transient: callers with a retry loop (the orchestrator's email outbox) try again
+        print(f"Error sending email template: {str(e)}")
+        return {
+            "status": "error",
+            "customer_id": customer_id,
+            "stage": stage,
+            "retryable": True,
+            "message": f"Could not reach the email service: {type(e).__name__}"
+        }
     except Exception as e:
         print(f"Error sending email template: {str(e)}")
         return {
@@ -0,0 +1,126 @@
+"""
+Customer snapshot used by the loan offer agent.
+
+One statement returns everything an offer needs: the customer master record,
+employment, account and existing loan details, and the 6-month transaction
+aggregate (computed in an APPLY instead of a second query). A customer with
+several employment, account or loan rows gets exactly one of each, picked by
+a fixed order: the latest job, the oldest account and the latest loan
+application, so single-customer and bulk snapshots agree. The aggregate's
+date range predicate seeks IX_Transaction_History_Customer_Date
+(Dataset/tables.sql) rather than scanning the customer's whole history. The
+same select pages through the whole portfolio in Customer_ID order for bulk
+re-pricing.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+_SNAPSHOT_SELECT = """
+    m.Customer_ID, m.Name, m.Age, m.Annual_Income_Range, m.Risk_Category,
+    m.KYC_Status, m.Fraud_Flag, m.Customer_Since,
+    e.Employment_Type, e.Employment_Status, e.Monthly_Income, e.Other_Income,
+    e.Total_Monthly_Income, e.Work_Experience_Years, e.Employer_Name,
+    b.Account_Balance, b.Average_Monthly_Balance, b.Account_Type,
+    b.Customer_Category, b.Account_Status,
+    l.Credit_Score, l.Loan_Status, l.Loan_Amount AS Existing_Loan_Amount,
+    l.EMI AS Existing_EMI, l.Loan_Type AS Existing_Loan_Type,
+    t.Transaction_Count, t.Avg_Transaction_Amount, t.Total_Credits, t.Total_Debits
+FROM Master_Customer_Data m
+OUTER APPLY (
+    SELECT TOP (1) * FROM Employment_Info ei
+    WHERE ei.Customer_ID = m.Customer_ID
+    ORDER BY ei.Joining_Date DESC, ei.Employer_Name, ei.Total_Monthly_Income DESC
+) e
+OUTER APPLY (
+    SELECT TOP (1) * FROM Bank_Info bi
+    WHERE bi.Customer_ID = m.Customer_ID
+    ORDER BY bi.Account_Opening_Date, bi.Account_Number
+) b
+OUTER APPLY (
+    SELECT TOP (1) * FROM Loan_Info li
+    WHERE li.Customer_ID = m.Customer_ID
+    ORDER BY li.Application_Date DESC, li.Loan_Amount DESC, li.Loan_Type
+) l
+CROSS APPLY (
+    SELECT COUNT(*) AS Transaction_Count,
+           AVG(th.Amount) AS Avg_Transaction_Amount,
+           SUM(CASE WHEN th.Amount > 0 THEN th.Amount ELSE 0 END) AS Total_Credits,
+           SUM(CASE WHEN th.Amount < 0 THEN ABS(th.Amount) ELSE 0 END) AS Total_Debits
+    FROM Transaction_History th
+    WHERE th.Customer_ID = m.Customer_ID
+      AND th.Transaction_Date >= DATEADD(month, -6, GETDATE())
+) t
+"""
+
+SNAPSHOT_QUERY = f"SELECT {_SNAPSHOT_SELECT} WHERE m.Customer_ID = ?"
+
+# Keyset pagination over the clustered Customer_ID key: parameters are (chunk size, last Customer_ID seen).
+# The APPLYs return one row per customer, so TOP counts customers
+SNAPSHOT_CHUNK_QUERY = f"SELECT TOP (?) {_SNAPSHOT_SELECT} WHERE m.Customer_ID > ? ORDER BY m.Customer_ID"
+
+
+class CustomerSnapshot(NamedTuple):
+    """One customer's loan-relevant data; field names match the SQL columns"""
+    Customer_ID: str
+    Name: Optional[str] = None
+    Age: Optional[int] = None
+    Annual_Income_Range: Optional[str] = None
+    Risk_Category: Optional[str] = None
+    KYC_Status: Optional[str] = None
+    Fraud_Flag: Optional[str] = None
+    Customer_Since: Optional[date] = None
+    Employment_Type: Optional[str] = None
+    Employment_Status: Optional[str] = None
+    Monthly_Income: Optional[int] = None
+    Other_Income: Optional[int] = None
+    Total_Monthly_Income: Optional[int] = None
+    Work_Experience_Years: Optional[int] = None
+    Employer_Name: Optional[str] = None
+    Account_Balance: Optional[Decimal] = None
+    Average_Monthly_Balance: Optional[Decimal] = None
+    Account_Type: Optional[str] = None
+    Customer_Category: Optional[str] = None
+    Account_Status: Optional[str] = None
+    Credit_Score: Optional[int] = None
+    Loan_Status: Optional[str] = None
+    Existing_Loan_Amount: Optional[int] = None
+    Existing_EMI: Optional[Decimal] = None
+    Existing_Loan_Type: Optional[str] = None
+    Transaction_Count: int = 0
+    Avg_Transaction_Amount: Optional[Decimal] = None
+    Total_Credits: Optional[Decimal] = None
+    Total_Debits: Optional[Decimal] = None
+
+    @classmethod
+    def from_row(cls, columns, row) -> "CustomerSnapshot":
+        return cls(**dict(zip(columns, row)))
+
+    def to_dict(self) -> dict:
+        """customer_data dict as used by the assessment and pricing functions"""
+        return self._asdict()
+
+
+def fetch_customer_snapshot(connection, customer_id: str) -> Optional[CustomerSnapshot]:
+    """Load a customer's snapshot in one round trip; None if the customer does not exist"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SNAPSHOT_QUERY, customer_id)
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return CustomerSnapshot.from_row([column[0] for column in cursor.description], row)
+    finally:
+        cursor.close()
+
+
+def fetch_snapshot_chunk(connection, chunk_size: int, after: str = "") -> list:
+    """Next chunk_size customers with Customer_ID greater than after, in Customer_ID order"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SNAPSHOT_CHUNK_QUERY, chunk_size, after)
+        columns = [column[0] for column in cursor.description]
+        return [CustomerSnapshot.from_row(columns, row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
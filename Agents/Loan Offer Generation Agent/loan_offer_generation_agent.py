@@ -5,12 +5,23 @@ import json
 import math
 import requests
 from datetime import datetime, timedelta
+from functools import lru_cache
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 
 import os
 from dotenv import load_dotenv
 
+from sql_pool import ConnectionPool, PoolTimeoutError
+from customer_snapshot import fetch_customer_snapshot
+from loan_rules import customer_features, get_rules
+
+# NumPy pricing grid; without NumPy offers fall back to scalar calculate_loan_details calls
+try:
+    from pricing_engine import price_grid
+except ImportError:
+    price_grid = None
+
 # Load environment variables
 load_dotenv()
 
@@ -19,144 +30,112 @@ SERVER = os.getenv("DB_SERVER")
 DATABASE = os.getenv("DB_DATABASE")
 USERNAME = os.getenv("DB_USERNAME")
 PASSWORD = os.getenv("DB_PASSWORD")
-# Loan Assessment Parameters
+
+# Connection pool settings (see sql_pool.py)
+SQL_POOL_MAX_SIZE = int(os.getenv("SQL_POOL_MAX_SIZE", "5"))
+SQL_POOL_IDLE_TIMEOUT = float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300"))  # seconds before an idle connection is closed
+SQL_POOL_VALIDATE_AFTER = float(os.getenv("SQL_POOL_VALIDATE_AFTER", "5"))  # idle seconds after which checkout pings with SELECT 1
+SQL_POOL_CHECKOUT_TIMEOUT = float(os.getenv("SQL_POOL_CHECKOUT_TIMEOUT", "30"))
+# Loan Assessment Parameters (credit / income gates and rate adjustments live in loan_rules.json)
 LOAN_PARAMETERS = {
     "HOME_LOAN": {
-        "min_credit_score": 650,
         "max_ltv_ratio": 0.85,  # Loan to Value ratio
         "min_income_multiplier": 3.5,
         "max_tenure_years": 30,
         "base_interest_rate": 8.5,
         "processing_fee_percent": 0.5,
         "insurance_percent": 0.25
-    },
-    "INTEREST_RATE_FACTORS": {
-        "credit_score_excellent": -0.5,  # 750+
-        "credit_score_good": 0,          # 650-749
-        "credit_score_fair": 0.5,        # 600-649
-        "existing_customer": -0.25,
-        "high_income": -0.25,            # Income > 100k
-        "employment_stable": -0.25,      # Employment > 3 years
-        "risk_category_low": -0.25,
-        "risk_category_high": 0.75
     }
 }
 
+@lru_cache(maxsize=1)
+def get_sql_connection_string():
+    """
+    Resolves the SQL Server ODBC driver once per process and builds the connection string
+    """
+    # Check available drivers
+    available_drivers = [driver for driver in pyodbc.drivers() if 'SQL Server' in driver]
+    print(f"Available ODBC drivers: {available_drivers}")
+    
+    if not available_drivers:
+        raise RuntimeError("No SQL Server ODBC drivers found!")
+    
+    # Prefer newer drivers
+    preferred_drivers = [
+        "ODBC Driver 18 for SQL Server",
+        "ODBC Driver 17 for SQL Server", 
+        "SQL Server"
+    ]
+    
+    driver = None
+    for preferred in preferred_drivers:
+        if preferred in available_drivers:
+            driver = preferred
+            break
+    
+    if not driver:
+        driver = available_drivers[0]
+        
+    print(f"Using driver: {driver}")
+    
+    # Build connection string
+    if "18" in driver:
+        return f"Driver={{{driver}}};Server=tcp:{SERVER},1433;Database={DATABASE};Uid={USERNAME};Pwd={PASSWORD};Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
+    return f"Driver={{{driver}}};Server=tcp:{SERVER},1433;Database={DATABASE};Uid={USERNAME};Pwd={PASSWORD};Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;"
+
+def _report_connection_error(error):
+    error_msg = str(error)
+    print(f"Error connecting to Azure SQL Database: {error_msg}")
+    
+    if "40615" in error_msg or "not allowed to access" in error_msg:
+        print("\n🔥 FIREWALL ISSUE DETECTED 🔥")
+        print("Please add your IP address to Azure SQL Server firewall rules.")
+
+def _open_sql_connection():
+    # Read-only queries, so autocommit avoids an open transaction on pooled connections
+    connection = pyodbc.connect(get_sql_connection_string(), autocommit=True)
+    print("Successfully connected to Azure SQL Database!")
+    return connection
+
+# Shared by every offer and assessment in this process
+sql_pool = ConnectionPool(
+    _open_sql_connection,
+    max_size=SQL_POOL_MAX_SIZE,
+    idle_timeout=SQL_POOL_IDLE_TIMEOUT,
+    validate_after=SQL_POOL_VALIDATE_AFTER,
+    checkout_timeout=SQL_POOL_CHECKOUT_TIMEOUT
+)
+
 def get_azure_sql_connection():
     """
-    Establishes connection to Azure SQL Database
+    Establishes a new (unpooled) connection to Azure SQL Database
     """
     try:
-        # Check available drivers
-        available_drivers = [driver for driver in pyodbc.drivers() if 'SQL Server' in driver]
-        print(f"Available ODBC drivers: {available_drivers}")
-        
-        if not available_drivers:
-            print("No SQL Server ODBC drivers found!")
-            return None
-        
-        # Prefer newer drivers
-        preferred_drivers = [
-            "ODBC Driver 18 for SQL Server",
-            "ODBC Driver 17 for SQL Server", 
-            "SQL Server"
-        ]
-        
-        driver = None
-        for preferred in preferred_drivers:
-            if preferred in available_drivers:
-                driver = preferred
-                break
-        
-        if not driver:
-            driver = available_drivers[0]
-            
-        print(f"Using driver: {driver}")
-        
-        # Build connection string
-        if "18" in driver:
-            conn_str = f"Driver={{{driver}}};Server=tcp:{SERVER},1433;Database={DATABASE};Uid={USERNAME};Pwd={PASSWORD};Encrypt=yes;TrustServerCertificate=yes;Connection Timeout=30;"
-        else:
-            conn_str = f"Driver={{{driver}}};Server=tcp:{SERVER},1433;Database={DATABASE};Uid={USERNAME};Pwd={PASSWORD};Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;"
-        
-        connection = pyodbc.connect(conn_str)
-        print("Successfully connected to Azure SQL Database!")
-        return connection
-        
+        return _open_sql_connection()
     except Exception as e:
-        error_msg = str(e)
-        print(f"Error connecting to Azure SQL Database: {error_msg}")
-        
-        if "40615" in error_msg or "not allowed to access" in error_msg:
-            print("\n🔥 FIREWALL ISSUE DETECTED 🔥")
-            print("Please add your IP address to Azure SQL Server firewall rules.")
-            
+        _report_connection_error(e)
         return None
 
-def get_customer_data(customer_id):
+def get_customer_snapshot(customer_id):
     """
-    Retrieves comprehensive customer data for loan assessment
+    Retrieves the customer's typed CustomerSnapshot in a single database round trip
     """
-    connection = get_azure_sql_connection()
-    if not connection:
-        return None
-    
     try:
-        cursor = connection.cursor()
-        
-        # Comprehensive customer data query
-        query = """
-        SELECT 
-            m.Customer_ID, m.Name, m.Age, m.Annual_Income_Range, m.Risk_Category,
-            m.KYC_Status, m.Fraud_Flag, m.Customer_Since,
-            e.Employment_Type, e.Employment_Status, e.Monthly_Income, e.Other_Income,
-            e.Total_Monthly_Income, e.Work_Experience_Years, e.Employer_Name,
-            b.Account_Balance, b.Average_Monthly_Balance, b.Account_Type,
-            b.Customer_Category, b.Account_Status,
-            l.Credit_Score, l.Loan_Status, l.Loan_Amount as Existing_Loan_Amount,
-            l.EMI as Existing_EMI, l.Loan_Type as Existing_Loan_Type
-        FROM Master_Customer_Data m
-        LEFT JOIN Employment_Info e ON m.Customer_ID = e.Customer_ID
-        LEFT JOIN Bank_Info b ON m.Customer_ID = b.Customer_ID
-        LEFT JOIN Loan_Info l ON m.Customer_ID = l.Customer_ID
-        WHERE m.Customer_ID = ?
-        """
-        
-        cursor.execute(query, customer_id)
-        result = cursor.fetchone()
-        
-        if not result:
-            return None
-        
-        # Convert to dictionary
-        columns = [column[0] for column in cursor.description]
-        customer_data = dict(zip(columns, result))
-        
-        # Get transaction history for additional assessment
-        transaction_query = """
-        SELECT COUNT(*) as Transaction_Count,
-               AVG(Amount) as Avg_Transaction_Amount,
-               SUM(CASE WHEN Amount > 0 THEN Amount ELSE 0 END) as Total_Credits,
-               SUM(CASE WHEN Amount < 0 THEN ABS(Amount) ELSE 0 END) as Total_Debits
-        FROM Transaction_History 
-        WHERE Customer_ID = ? AND Transaction_Date >= DATEADD(month, -6, GETDATE())
-        """
-        
-        cursor.execute(transaction_query, customer_id)
-        trans_result = cursor.fetchone()
-        
-        if trans_result:
-            trans_columns = [column[0] for column in cursor.description]
-            transaction_data = dict(zip(trans_columns, trans_result))
-            customer_data.update(transaction_data)
-        
-        return customer_data
-        
+        with sql_pool.connection() as connection:
+            return fetch_customer_snapshot(connection, customer_id)
+    except (pyodbc.OperationalError, pyodbc.InterfaceError, PoolTimeoutError, RuntimeError) as e:
+        _report_connection_error(e)
+        return None
     except Exception as e:
         print(f"Error fetching customer data: {str(e)}")
         return None
-    finally:
-        connection.close()
+
+def get_customer_data(customer_id):
+    """
+    Retrieves comprehensive customer data for loan assessment
+    """
+    snapshot = get_customer_snapshot(customer_id)
+    return snapshot.to_dict() if snapshot else None
 
 def assess_loan_eligibility(customer_data, collateral_info, requested_loan_amount):
     """
@@ -179,17 +158,15 @@ def assess_loan_eligibility(customer_data, collateral_info, requested_loan_amoun
     # Skip KYC and document verification - assume these are handled separately
     print("ℹ️  Note: KYC and document verification assumed to be completed separately")
     
-    # Credit Score check
-    credit_score = customer_data.get("Credit_Score", 0) or 0
-    if credit_score < LOAN_PARAMETERS["HOME_LOAN"]["min_credit_score"]:
-        assessment["reasons"].append(f"Credit score {credit_score} below minimum {LOAN_PARAMETERS['HOME_LOAN']['min_credit_score']}")
-        return assessment
-    
-    # Income verification
-    monthly_income = customer_data.get("Total_Monthly_Income", 0) or customer_data.get("Monthly_Income", 0) or 0
-    if monthly_income <= 0:
-        assessment["reasons"].append("Income information not available")
+    rules = get_rules()
+    features = customer_features(customer_data)
+
+    # Blocking checks (credit score, income) from the rule table
+    reason = rules.failed_gate(features)
+    if reason:
+        assessment["reasons"].append(reason)
         return assessment
+    monthly_income = features["monthly_income"]
     
     # Calculate maximum eligible amount based on income
     max_emi = monthly_income * 0.4  # 40% of income as max EMI
@@ -212,115 +189,21 @@ def assess_loan_eligibility(customer_data, collateral_info, requested_loan_amoun
         assessment["reasons"].append(f"Requested amount ₹{requested_loan_amount:,.2f} exceeds maximum eligible ₹{max_eligible:,.2f}")
         assessment["recommended_amount"] = max_eligible * 0.9  # Recommend 90% of max
     else:
-        assessment["eligible"] = True
         assessment["recommended_amount"] = requested_loan_amount
     
-    # Risk assessment - these are informational, not blocking
-    risk_category = customer_data.get("Risk_Category", "").upper()
-    if risk_category == "HIGH":
-        assessment["risk_factors"].append("High risk customer category")
-    elif risk_category == "LOW":
-        assessment["positive_factors"].append("Low risk customer category")
-    
-    # Employment stability
-    work_experience = customer_data.get("Work_Experience_Years", 0) or 0
-    if work_experience >= 3:
-        assessment["positive_factors"].append(f"Stable employment ({work_experience} years)")
-    else:
-        assessment["risk_factors"].append(f"Limited work experience ({work_experience} years)")
-    
-    # Existing customer relationship
-    if customer_data.get("Customer_Since"):
-        assessment["positive_factors"].append("Existing customer relationship")
-    
-    # Account balance and banking behavior
-    account_balance = customer_data.get("Account_Balance", 0) or 0
-    avg_balance = customer_data.get("Average_Monthly_Balance", 0) or 0
-    
-    if account_balance >= monthly_income * 3:
-        assessment["positive_factors"].append("Strong account balance")
-    elif account_balance < monthly_income:
-        assessment["risk_factors"].append("Low account balance")
-    
-    # Additional positive factors for better assessment
-    if credit_score >= 750:
-        assessment["positive_factors"].append("Excellent credit score")
-    elif credit_score >= 700:
-        assessment["positive_factors"].append("Good credit score")
-    
-    if monthly_income >= 100000:
-        assessment["positive_factors"].append("High monthly income")
-    elif monthly_income >= 50000:
-        assessment["positive_factors"].append("Good monthly income")
-    
-    # If no major blocking issues and we have income + credit score, approve
-    if monthly_income > 0 and credit_score >= LOAN_PARAMETERS["HOME_LOAN"]["min_credit_score"]:
-        assessment["eligible"] = True
-        if not assessment["recommended_amount"]:
-            assessment["recommended_amount"] = min(requested_loan_amount, max_eligible)
+    # Risk and positive factors are informational, not blocking
+    assessment["positive_factors"], assessment["risk_factors"] = rules.assessment_factors(features)
+    
+    # Passing the gates (income + credit score) makes the customer eligible
+    assessment["eligible"] = True
     
     return assessment
 
 def calculate_interest_rate(customer_data, base_rate=8.5):
     """
-    Calculate personalized interest rate based on customer profile
-    """
-    final_rate = base_rate
-    rate_factors = []
-    
-    # Credit score adjustments
-    credit_score = customer_data.get("Credit_Score", 0) or 0
-    if credit_score >= 750:
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["credit_score_excellent"]
-        final_rate += adjustment
-        rate_factors.append(f"Excellent credit score ({credit_score}): {adjustment:+.2f}%")
-    elif credit_score >= 650:
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["credit_score_good"]
-        final_rate += adjustment
-        rate_factors.append(f"Good credit score ({credit_score}): {adjustment:+.2f}%")
-    elif credit_score > 0:  # Only apply fair credit if we have a score
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["credit_score_fair"]
-        final_rate += adjustment
-        rate_factors.append(f"Fair credit score ({credit_score}): {adjustment:+.2f}%")
-    else:
-        rate_factors.append("Credit score not available - using base rate")
-    
-    # Existing customer benefit
-    if customer_data.get("Customer_Since"):
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["existing_customer"]
-        final_rate += adjustment
-        rate_factors.append(f"Existing customer: {adjustment:+.2f}%")
-    
-    # High income benefit
-    monthly_income = customer_data.get("Total_Monthly_Income", 0) or customer_data.get("Monthly_Income", 0) or 0
-    if monthly_income > 100000:
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["high_income"]
-        final_rate += adjustment
-        rate_factors.append(f"High income: {adjustment:+.2f}%")
-    
-    # Employment stability
-    work_experience = customer_data.get("Work_Experience_Years", 0) or 0
-    if work_experience >= 3:
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["employment_stable"]
-        final_rate += adjustment
-        rate_factors.append(f"Stable employment: {adjustment:+.2f}%")
-    
-    # Risk category
-    risk_category = customer_data.get("Risk_Category", "").upper()
-    if risk_category == "LOW":
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["risk_category_low"]
-        final_rate += adjustment
-        rate_factors.append(f"Low risk category: {adjustment:+.2f}%")
-    elif risk_category == "HIGH":
-        adjustment = LOAN_PARAMETERS["INTEREST_RATE_FACTORS"]["risk_category_high"]
-        final_rate += adjustment
-        rate_factors.append(f"High risk category: {adjustment:+.2f}%")
-    
-    # Ensure we have at least one rate factor
-    if not rate_factors:
-        rate_factors.append("Standard rate applied - limited customer data available")
-    
-    return max(final_rate, 7.0), rate_factors  # Minimum 7% rate
+    Calculate personalized interest rate based on customer profile (rate adjustments in loan_rules.json)
+    """
+    return get_rules().price(customer_features(customer_data), base_rate)
 
 def calculate_loan_details(loan_amount, interest_rate, tenure_years):
     """
@@ -352,6 +235,62 @@ def calculate_loan_details(loan_amount, interest_rate, tenure_years):
         "total_upfront_cost": processing_fee + insurance_premium
     }
 
+def calculate_loan_options(loan_amount, interest_rate, tenure_options=(15, 20, 25, 30)):
+    """
+    Loan details for each allowed tenure, priced in one vectorized pass when NumPy is available
+    """
+    tenures = [tenure for tenure in tenure_options if tenure <= LOAN_PARAMETERS["HOME_LOAN"]["max_tenure_years"]]
+    if price_grid is None:
+        return [calculate_loan_details(loan_amount, interest_rate, tenure) for tenure in tenures]
+    return price_grid(
+        [loan_amount], [interest_rate], tenures,
+        processing_fee_percent=LOAN_PARAMETERS["HOME_LOAN"]["processing_fee_percent"],
+        insurance_percent=LOAN_PARAMETERS["HOME_LOAN"]["insurance_percent"]
+    ).options()
+
+def default_requested_amount(customer_data, collateral_info):
+    """
+    90% of the maximum eligible amount, used when no loan amount was requested
+    """
+    monthly_income = customer_data.get("Total_Monthly_Income", 0) or customer_data.get("Monthly_Income", 0) or 0
+    max_emi = monthly_income * 0.4
+    base_rate = LOAN_PARAMETERS["HOME_LOAN"]["base_interest_rate"] / 100 / 12
+    tenure_months = LOAN_PARAMETERS["HOME_LOAN"]["max_tenure_years"] * 12
+    max_by_income = max_emi * ((1 - (1 + base_rate) ** -tenure_months) / base_rate)
+    max_by_ltv = collateral_info.get("property_value", 0) * LOAN_PARAMETERS["HOME_LOAN"]["max_ltv_ratio"]
+    return min(max_by_income, max_by_ltv) * 0.9
+
+def assess_customer_loan(customer_id, collateral_json, requested_amount=None):
+    """
+    Eligibility, personalized rate and repayment options for a customer, without the
+    AI summary, console report and email of generate_loan_offer
+    """
+    try:
+        collateral_info = json.loads(collateral_json) if isinstance(collateral_json, str) else collateral_json
+    except json.JSONDecodeError:
+        return {"status": "error", "customer_id": customer_id, "message": "Invalid collateral JSON format"}
+    
+    customer_data = get_customer_data(customer_id)
+    if not customer_data:
+        return {"status": "error", "customer_id": customer_id, "message": "Customer not found or error fetching data"}
+    
+    if not requested_amount:
+        requested_amount = default_requested_amount(customer_data, collateral_info)
+    eligibility = assess_loan_eligibility(customer_data, collateral_info, requested_amount)
+    final_amount = eligibility["recommended_amount"] if eligibility["recommended_amount"] > 0 else requested_amount
+    final_rate, rate_factors = calculate_interest_rate(customer_data)
+    loan_options = calculate_loan_options(final_amount, final_rate)
+    
+    return {
+        "status": "success",
+        "customer_id": customer_id,
+        "customer_data": customer_data,
+        "eligibility": eligibility,
+        "loan_options": loan_options,
+        "final_rate": final_rate,
+        "rate_factors": rate_factors
+    }
+
 def generate_loan_offer(customer_id, collateral_json, requested_amount=None):
     """
     Main function to generate comprehensive loan offer
@@ -386,14 +325,7 @@ def generate_loan_offer(customer_id, collateral_json, requested_amount=None):
     
     # If no requested amount, calculate maximum eligible
     if not requested_amount:
-        # Quick calculation for max amount
-        monthly_income = customer_data.get("Total_Monthly_Income", 0) or customer_data.get("Monthly_Income", 0) or 0
-        max_emi = monthly_income * 0.4
-        base_rate = LOAN_PARAMETERS["HOME_LOAN"]["base_interest_rate"] / 100 / 12
-        tenure_months = LOAN_PARAMETERS["HOME_LOAN"]["max_tenure_years"] * 12
-        max_by_income = max_emi * ((1 - (1 + base_rate) ** -tenure_months) / base_rate)
-        max_by_ltv = collateral_info.get("property_value", 0) * LOAN_PARAMETERS["HOME_LOAN"]["max_ltv_ratio"]
-        requested_amount = min(max_by_income, max_by_ltv) * 0.9
+        requested_amount = default_requested_amount(customer_data, collateral_info)
       # Assess eligibility
     print("\n🔍 Assessing loan eligibility...")
     eligibility = assess_loan_eligibility(customer_data, collateral_info, requested_amount)
@@ -422,13 +354,7 @@ def generate_loan_offer(customer_id, collateral_json, requested_amount=None):
     final_rate, rate_factors = calculate_interest_rate(customer_data)
     
     # Calculate loan details for different tenure options
-    tenure_options = [15, 20, 25, 30]
-    loan_options = []
-    
-    for tenure in tenure_options:
-        if tenure <= LOAN_PARAMETERS["HOME_LOAN"]["max_tenure_years"]:
-            loan_details = calculate_loan_details(final_amount, final_rate, tenure)
-            loan_options.append(loan_details)
+    loan_options = calculate_loan_options(final_amount, final_rate)
     
     # Generate AI-powered loan offer summary
     offer_summary = generate_ai_loan_summary(customer_data, collateral_info, loan_options[2], eligibility, rate_factors)  # Use 25-year option for summary
@@ -0,0 +1,281 @@
+"""
+Declarative pricing and eligibility rules for the loan offer agent.
+
+loan_rules.json holds the rate adjustments, eligibility gates and assessment
+factors as data (condition, adjustment, factor / reason text) instead of
+if/elif ladders, so a rule change is a file edit rather than a code deploy.
+The file is compiled into a RuleTable whose conditions are plain comparison
+functions; they work on one customer's features (scalars) and on a chunk of
+customers' feature columns (NumPy arrays) alike, so bulk re-pricing evaluates
+each rule once per chunk and looks the adjustments up by matched rule index.
+
+get_rules() re-reads the file when its modification time changes (checked at
+most every LOAN_RULES_RELOAD_INTERVAL seconds); a file that fails to load or
+compile is reported and the previous rules stay in force.
+
+Rule groups behave like if/elif chains: the first rule of a group whose
+"when" holds applies, and a rule without "when" is the group's else branch.
+A condition compares a feature with a constant ("value") or with another
+feature, optionally scaled ("ref", "times").
+"""
+
+import json
+import operator
+import os
+import string
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LOAN_RULES_PATH = os.getenv("LOAN_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "loan_rules.json"))
+LOAN_RULES_RELOAD_INTERVAL = float(os.getenv("LOAN_RULES_RELOAD_INTERVAL", "5"))  # seconds between file mtime checks
+
+OPERATORS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Features the rules can refer to, derived from a customer_data dict the same way the assessment always did
+FEATURES = {
+    "credit_score": lambda data: float(data.get("Credit_Score") or 0),
+    "monthly_income": lambda data: float(data.get("Total_Monthly_Income") or data.get("Monthly_Income") or 0),
+    "work_experience": lambda data: float(data.get("Work_Experience_Years") or 0),
+    "existing_customer": lambda data: bool(data.get("Customer_Since")),
+    "risk_category": lambda data: (data.get("Risk_Category") or "").upper(),
+    "account_balance": lambda data: float(data.get("Account_Balance") or 0),
+}
+
+
+def customer_features(customer_data: dict) -> dict:
+    """Rule features of one customer"""
+    return {name: extract(customer_data) for name, extract in FEATURES.items()}
+
+
+def feature_columns(records) -> dict:
+    """Rule features of many customers (customer_data dicts) as NumPy columns"""
+    records = list(records)
+    columns = {}
+    for name, extract in FEATURES.items():
+        values = [extract(record) for record in records]
+        dtype = object if name == "risk_category" else (bool if name == "existing_customer" else float)
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+def _display(value):
+    """Feature value as it appears in factor text (750.0 -> 750)"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _template_fields(template: str) -> set:
+    return {field.split(".")[0].split("[")[0] for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+class Text:
+    """Factor / reason text; constant unless it quotes a feature value"""
+
+    def __init__(self, template: str, adjustment: float = 0.0):
+        unknown = _template_fields(template) - set(FEATURES) - {"adjustment"}
+        if unknown:
+            raise ValueError(f"Unknown field(s) {sorted(unknown)} in {template!r}")
+        self.template = template
+        self.adjustment = adjustment
+        self.fields = _template_fields(template) - {"adjustment"}
+        self.constant = None if self.fields else template.format(adjustment=adjustment)
+
+    def render(self, features: dict) -> str:
+        if self.constant is not None:
+            return self.constant
+        return self.template.format(adjustment=self.adjustment, **{f: _display(features[f]) for f in self.fields})
+
+    def render_row(self, columns: dict, i: int) -> str:
+        if self.constant is not None:
+            return self.constant
+        return self.template.format(adjustment=self.adjustment, **{f: _display(columns[f][i]) for f in self.fields})
+
+
+def compile_condition(when):
+    """Comparison function over features (scalars or columns); None means always true"""
+    if when is None:
+        return lambda features: True
+    field, op_name = when["field"], when["op"]
+    if op_name not in OPERATORS:
+        raise ValueError(f"Unknown operator {op_name!r}")
+    compare = OPERATORS[op_name]
+    for name in (field, when.get("ref")):
+        if name is not None and name not in FEATURES:
+            raise ValueError(f"Unknown feature {name!r}")
+    if "ref" in when:
+        ref, times = when["ref"], float(when.get("times", 1))
+        return lambda features: compare(features[field], features[ref] * times)
+    value = when["value"]
+    return lambda features: compare(features[field], value)
+
+
+class Rule:
+    def __init__(self, spec: dict, text_key: str):
+        self.matches = compile_condition(spec.get("when"))
+        self.adjustment = float(spec.get("adjustment", 0))
+        self.kind = spec.get("kind")
+        self.text = Text(spec[text_key], self.adjustment)
+
+
+class RuleGroup:
+    """if/elif chain: the first matching rule applies"""
+
+    def __init__(self, spec: dict, text_key: str = "factor"):
+        self.name = spec.get("name", "")
+        self.rules = [Rule(rule, text_key) for rule in spec["rules"]]
+        self._adjustments = None
+
+    def match(self, features: dict):
+        for rule in self.rules:
+            if rule.matches(features):
+                return rule
+        return None
+
+    def match_columns(self, columns: dict, size: int):
+        """Index of the matched rule per row, -1 where none matched"""
+        matched = np.full(size, -1)
+        # Walk the chain backwards so earlier rules overwrite later ones
+        for index in range(len(self.rules) - 1, -1, -1):
+            hit = np.broadcast_to(self.rules[index].matches(columns), (size,))
+            matched = np.where(hit, index, matched)
+        return matched
+
+    @property
+    def adjustments(self):
+        """Adjustment per rule index, with 0 at index -1 for unmatched rows"""
+        if self._adjustments is None:
+            self._adjustments = np.array([rule.adjustment for rule in self.rules] + [0.0])
+        return self._adjustments
+
+
+class RuleTable:
+    """Compiled loan_rules.json"""
+
+    def __init__(self, spec: dict, source: str = None):
+        self.source = source
+        self.min_rate = float(spec["min_rate"])
+        self.default_rate_factor = spec.get("default_rate_factor")
+        self.rate_groups = [RuleGroup(group) for group in spec["rate_adjustments"]]
+        self.gates = [Rule(gate, "reason") for gate in spec.get("eligibility_gates", [])]
+        self.factor_groups = [RuleGroup(group) for group in spec.get("assessment_factors", [])]
+        for group in self.factor_groups:
+            for rule in group.rules:
+                if rule.kind not in ("positive", "risk"):
+                    raise ValueError(f"Assessment factor {rule.text.template!r} needs kind 'positive' or 'risk'")
+
+    def price(self, features: dict, base_rate: float):
+        """(final rate, rate factor texts) for one customer"""
+        rate, rate_factors = base_rate, []
+        for group in self.rate_groups:
+            rule = group.match(features)
+            if rule is not None:
+                rate += rule.adjustment
+                rate_factors.append(rule.text.render(features))
+        if not rate_factors and self.default_rate_factor:
+            rate_factors.append(self.default_rate_factor)
+        return max(rate, self.min_rate), rate_factors
+
+    def price_columns(self, columns: dict, base_rate: float):
+        """(rates array, rate factor texts joined with '; ' per row) for a chunk of customers"""
+        size = len(next(iter(columns.values())))
+        rates = np.full(size, float(base_rate))
+        matches = []
+        for group in self.rate_groups:
+            matched = group.match_columns(columns, size)
+            rates += group.adjustments[matched]
+            matches.append(matched)
+
+        rate_factors = []
+        for i in range(size):
+            row = [group.rules[matched[i]].text.render_row(columns, i)
+                   for group, matched in zip(self.rate_groups, matches) if matched[i] >= 0]
+            if not row and self.default_rate_factor:
+                row.append(self.default_rate_factor)
+            rate_factors.append("; ".join(row))
+        return np.maximum(rates, self.min_rate), rate_factors
+
+    def failed_gate(self, features: dict):
+        """Reason of the first eligibility gate the customer fails, or None"""
+        for gate in self.gates:
+            if gate.matches(features):
+                return gate.text.render(features)
+        return None
+
+    def failed_gate_columns(self, columns: dict):
+        """(passed mask, reason per row - '' where every gate passed) for a chunk of customers"""
+        size = len(next(iter(columns.values())))
+        reasons = np.full(size, "", dtype=object)
+        for gate in reversed(self.gates):
+            for i in np.flatnonzero(np.broadcast_to(gate.matches(columns), (size,))):
+                reasons[i] = gate.text.render_row(columns, i)
+        return reasons == "", reasons
+
+    def assessment_factors(self, features: dict):
+        """(positive factors, risk factors) for one customer"""
+        factors = {"positive": [], "risk": []}
+        for group in self.factor_groups:
+            rule = group.match(features)
+            if rule is not None:
+                factors[rule.kind].append(rule.text.render(features))
+        return factors["positive"], factors["risk"]
+
+
+def load_rule_table(path: str) -> RuleTable:
+    with open(path, encoding="utf-8") as f:
+        return RuleTable(json.load(f), source=path)
+
+
+class RuleBook:
+    """The current RuleTable of a rules file, recompiled when the file changes"""
+
+    def __init__(self, path: str, reload_interval: float = 5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._table = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> RuleTable:
+        now = time.monotonic()
+        if self._table is not None and now - self._checked_at < self.reload_interval:
+            return self._table
+        with self._lock:
+            if self._table is not None and now - self._checked_at < self.reload_interval:
+                return self._table
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._mtime:
+                    # Remember the version even if it is broken so it is reported once, not on every check
+                    self._mtime = mtime
+                    table = load_rule_table(self.path)
+                    if self._table is not None:
+                        print(f"🔄 Reloaded loan rules from {self.path}")
+                    self._table = table
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if self._table is None:
+                    raise
+                print(f"⚠️  Could not reload loan rules from {self.path}, keeping previous rules: {e}")
+            return self._table
+
+
+rule_book = RuleBook(LOAN_RULES_PATH, LOAN_RULES_RELOAD_INTERVAL)
+
+
+def get_rules() -> RuleTable:
+    """Current compiled loan rules"""
+    return rule_book.get()
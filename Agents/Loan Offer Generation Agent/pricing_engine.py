@@ -0,0 +1,125 @@
+"""
+Vectorized loan pricing for the loan offer agent.
+
+price_grid computes EMI, total payment, total interest and upfront costs for
+every combination of loan amount x interest rate x tenure in one NumPy pass,
+so an offer's tenure options and relationship-manager what-if grids of
+thousands of scenarios cost a handful of array operations instead of one
+scalar calculate_loan_details call each. amortization_schedule returns month
+by month interest / principal / balance arrays for one or many loans.
+
+All formulas match calculate_loan_details; a 0% rate degrades to straight-line
+repayment instead of dividing by zero.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class LoanGrid(NamedTuple):
+    """Pricing of an amounts x rates x tenures grid; every array has shape (amounts, rates, tenures)"""
+    loan_amount: np.ndarray
+    interest_rate: np.ndarray
+    tenure_years: np.ndarray
+    tenure_months: np.ndarray
+    emi: np.ndarray
+    total_payment: np.ndarray
+    total_interest: np.ndarray
+    processing_fee: np.ndarray
+    insurance_premium: np.ndarray
+    total_upfront_cost: np.ndarray
+
+    def options(self) -> list:
+        """The grid as calculate_loan_details-style dicts, amounts outermost and tenures innermost"""
+        flat = {field: getattr(self, field).ravel() for field in self._fields}
+        years = [int(y) if float(y).is_integer() else float(y) for y in flat["tenure_years"]]
+        return [
+            {
+                "loan_amount": float(flat["loan_amount"][i]),
+                "interest_rate": float(flat["interest_rate"][i]),
+                "tenure_months": int(flat["tenure_months"][i]),
+                "tenure_years": years[i],
+                "emi": float(flat["emi"][i]),
+                "total_payment": float(flat["total_payment"][i]),
+                "total_interest": float(flat["total_interest"][i]),
+                "processing_fee": float(flat["processing_fee"][i]),
+                "insurance_premium": float(flat["insurance_premium"][i]),
+                "total_upfront_cost": float(flat["total_upfront_cost"][i])
+            }
+            for i in range(flat["emi"].size)
+        ]
+
+
+def emi(loan_amount, interest_rate, tenure_months):
+    """Monthly instalment for broadcastable arrays of amounts, annual rates (%) and tenures (months)"""
+    principal = np.asarray(loan_amount, dtype=float)
+    monthly_rate = np.asarray(interest_rate, dtype=float) / 100 / 12
+    months = np.asarray(tenure_months, dtype=float)
+    growth = np.power(1 + monthly_rate, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortizing = principal * monthly_rate * growth / (growth - 1)
+    return np.where(monthly_rate == 0, principal / months, amortizing)
+
+
+def price_grid(loan_amounts, interest_rates, tenure_years,
+               processing_fee_percent: float = 0.5, insurance_percent: float = 0.25) -> LoanGrid:
+    """Price every amount x rate x tenure combination at once"""
+    amounts = np.asarray(loan_amounts, dtype=float).reshape(-1, 1, 1)
+    rates = np.asarray(interest_rates, dtype=float).reshape(1, -1, 1)
+    years = np.asarray(tenure_years, dtype=float).reshape(1, 1, -1)
+    months = years * 12
+    shape = np.broadcast_shapes(amounts.shape, rates.shape, years.shape)
+
+    instalment = emi(amounts, rates, months)
+    total_payment = instalment * months
+    processing_fee = amounts * processing_fee_percent / 100
+    insurance_premium = amounts * insurance_percent / 100
+    return LoanGrid(
+        loan_amount=np.broadcast_to(amounts, shape),
+        interest_rate=np.broadcast_to(rates, shape),
+        tenure_years=np.broadcast_to(years, shape),
+        tenure_months=np.broadcast_to(months, shape).astype(int),
+        emi=instalment,
+        total_payment=total_payment,
+        total_interest=total_payment - amounts,
+        processing_fee=np.broadcast_to(processing_fee, shape),
+        insurance_premium=np.broadcast_to(insurance_premium, shape),
+        total_upfront_cost=np.broadcast_to(processing_fee + insurance_premium, shape)
+    )
+
+
+def amortization_schedule(loan_amount, interest_rate, tenure_years) -> dict:
+    """Month-by-month schedule as arrays
+
+    loan_amount and interest_rate may be scalars or equal-length arrays of
+    loans sharing one tenure; arrays then have shape (loans, months).
+    Returns month, emi, interest, principal and closing balance.
+    """
+    principal = np.atleast_1d(np.asarray(loan_amount, dtype=float))[:, None]
+    annual_rate = np.atleast_1d(np.asarray(interest_rate, dtype=float))[:, None]
+    monthly_rate = annual_rate / 100 / 12
+    months = int(round(float(tenure_years) * 12))
+    month = np.arange(1, months + 1)
+
+    instalment = emi(principal, annual_rate, months)
+    growth = np.power(1 + monthly_rate, month)
+    # Closed-form balance after k payments: P(1+r)^k - EMI((1+r)^k - 1)/r
+    with np.errstate(divide="ignore", invalid="ignore"):
+        balance = principal * growth - instalment * (growth - 1) / monthly_rate
+    balance = np.where(monthly_rate == 0, principal - instalment * month, balance)
+    balance = np.maximum(balance, 0.0)
+    opening = np.concatenate([principal, balance[:, :-1]], axis=1)
+    interest = opening * monthly_rate
+    principal_paid = opening - balance
+
+    schedule = {
+        "month": month,
+        "emi": np.broadcast_to(instalment, balance.shape),
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance
+    }
+    if np.ndim(loan_amount) == 0 and np.ndim(interest_rate) == 0:
+        schedule = {key: value if key == "month" else value[0] for key, value in schedule.items()}
+    return schedule
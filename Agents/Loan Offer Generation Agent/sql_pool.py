@@ -0,0 +1,130 @@
+"""
+Process-wide pool of Azure SQL (pyodbc) connections for the loan offer agent.
+
+Opening a TLS connection to Azure SQL takes hundreds of milliseconds, so
+connections are kept open and reused instead of being created and closed for
+every query. The pool is bounded (callers wait for a free connection),
+connections idle for longer than the idle timeout are closed, and a
+connection that sat unused for a while is checked with SELECT 1 before it is
+handed out so a dropped connection never reaches the caller.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Bounded, validating pool around a connect() callable"""
+
+    def __init__(self, connect, max_size: int = 5, idle_timeout: float = 300,
+                 validate_after: float = 5, checkout_timeout: float = 30):
+        self.connect = connect
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque()  # (connection, returned_at), most recently returned last
+        self._open = 0
+        self._lock = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _discard(self, connection):
+        self._close(connection)
+        with self._lock:
+            self._open -= 1
+            self.stats["discarded"] += 1
+            self._lock.notify()
+
+    def _is_alive(self, connection) -> bool:
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._lock:
+                self._close_expired()
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    self.stats["reused"] += 1
+                elif self._open < self.max_size:
+                    self._open += 1
+                    connection, returned_at = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"No database connection free after {self.checkout_timeout:.0f}s")
+                    self._lock.wait(remaining)
+                    continue
+
+            if connection is None:
+                try:
+                    connection = self.connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self.stats["created"] += 1
+                return connection
+
+            # Ping connections that have been idle long enough to have been dropped
+            if time.monotonic() - returned_at < self.validate_after or self._is_alive(connection):
+                return connection
+            self._discard(connection)
+
+    def _close_expired(self):
+        """Close idle connections past the idle timeout (caller holds the lock)"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._close(connection)
+            self._open -= 1
+            self._lock.notify()
+
+    def _checkin(self, connection):
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is returned to the pool afterwards, or dropped if it failed"""
+        connection = self._checkout()
+        try:
+            yield connection
+        except BaseException:
+            # The connection may be broken or mid-result; do not hand it out again
+            self._discard(connection)
+            raise
+        else:
+            self._checkin(connection)
+
+    def close(self):
+        """Close every idle connection; borrowed ones are closed as they come back or expire"""
+        with self._lock:
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._close(connection)
+                self._open -= 1
+            self._lock.notify_all()
@@ -9,6 +9,15 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+
+# Share the orchestrator's warm client factory (cached credential token and
+# project client) when running from the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+try:
+    from orch_clients import client_factory
+except ImportError:
+    client_factory = None
+
 instructions_path = os.path.join(os.path.dirname(__file__), "instructions.txt")
 with open(instructions_path, "r", encoding="utf-8") as f:
     instructions = f.read()
@@ -387,9 +396,12 @@ class CreditUnderwritingAgent:
             self.initialize_database_connection()
             
             # Initialize AI agent
-            self.project_client = AIProjectClient.from_connection_string(
-                credential=DefaultAzureCredential(),
-                conn_str="XXXX")
+            if client_factory is not None:
+                self.project_client = client_factory.from_connection_string("XXXX")
+            else:
+                self.project_client = AIProjectClient.from_connection_string(
+                    credential=DefaultAzureCredential(),
+                    conn_str="XXXX")
 
             self.agent = self.project_client.agents.get_agent("XXXX")
             self.session_start_time = datetime.datetime.now()
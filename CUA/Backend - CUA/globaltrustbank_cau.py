@@ -8,10 +8,21 @@ load_dotenv()
 from playwright.sync_api import sync_playwright
 
 import base64
+import os
+import sys
 import time
 from PIL import Image
 from io import BytesIO
 
+# Share the orchestrator's per-deployment rate limiter when running from the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+try:
+    from orch_ratelimit import get_limiter, throttle_signal
+except ImportError:
+    get_limiter = throttle_signal = None
+
+CUA_DEPLOYMENT = "computer-use-preview"
+
 # Azure OpenAI client
 client = AzureOpenAI(
     api_key="...",  # Replace with your actual API key
@@ -88,12 +99,21 @@ def safe_api_call(func, max_retries=5, base_delay=2):
     """
     for attempt in range(max_retries):
         try:
+            if get_limiter is not None:
+                with get_limiter(CUA_DEPLOYMENT).slot_sync():
+                    return func()
             return func()
         except Exception as e:
             error_str = str(e)
             print(f"API call failed (attempt {attempt + 1}/{max_retries}): {error_str}")
             
-            if "503" in error_str or "InternalServerError" in error_str:
+            signal = throttle_signal(e) if throttle_signal is not None else None
+            if signal and signal[1] is not None:
+                # The service said when to come back
+                delay = signal[1]
+                print(f"Throttled (HTTP {signal[0]}). Waiting {delay} seconds as requested before retry...")
+                time.sleep(delay)
+            elif "503" in error_str or "InternalServerError" in error_str:
                 # Server overload - wait longer
                 delay = base_delay * (2 ** attempt)  # Exponential backoff
                 print(f"Server error detected. Waiting {delay} seconds before retry...")
@@ -29,6 +29,13 @@ from agents.audit_agent import create_audit_agent
 from database import get_db, SessionLocal
 from models import MasterCustomerData
 
+# Share the orchestrator's per-deployment rate limiter when running from the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+try:
+    from orch_ratelimit import get_limiter, throttle_signal
+except ImportError:
+    get_limiter = throttle_signal = None
+
 # Azure AI Studio Project Configuration
 AZURE_CONFIG = {
     "model_deployment_name": os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME"),
@@ -153,8 +160,12 @@ class FinalLoanOrchestrator:
                             return response_text
                     return response_text
                 
-                # Apply timeout to the invocation
-                result = await asyncio.wait_for(invoke_with_timeout(), timeout=timeout)
+                # Apply timeout to the invocation, inside the deployment's rate limit window
+                if get_limiter is not None:
+                    async with get_limiter(AZURE_CONFIG["model_deployment_name"] or "default").slot():
+                        result = await asyncio.wait_for(invoke_with_timeout(), timeout=timeout)
+                else:
+                    result = await asyncio.wait_for(invoke_with_timeout(), timeout=timeout)
                 
                 if response_received and result:
                     if not background:  # Only show success for main conversation
@@ -185,7 +196,14 @@ class FinalLoanOrchestrator:
                 if attempt < max_retries:
                     # Check if it's a retryable error
                     error_str = str(e).lower()
-                    if any(keyword in error_str for keyword in ['timeout', 'connection', 'network', 'service', 'polling']):
+                    signal = throttle_signal(e) if throttle_signal is not None else None
+                    if signal:
+                        # Rate limited: wait as long as the service asked, else back off
+                        delay = signal[1] if signal[1] is not None else self.retry_delay * (2 ** attempt)
+                        if not background:
+                            print(f"🚦 {agent_name} rate limited (HTTP {signal[0]}), retrying in {delay:.1f} seconds...")
+                        await asyncio.sleep(delay)
+                    elif any(keyword in error_str for keyword in ['timeout', 'connection', 'network', 'service', 'polling']):
                         delay = self.retry_delay * (2 ** attempt)
                         if not background:
                             print(f"⏳ Retrying in {delay} seconds...")
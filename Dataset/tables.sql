@@ -127,3 +127,20 @@ CREATE TABLE Bank_Employees (
     Employee_Code VARCHAR(20),
     Department VARCHAR(50)
 );
+---------------------------------------------------------------------------------------------------------
+-- Index recommendations for the loan offer agent's customer snapshot query
+-- (Agents/Loan Offer Generation Agent/customer_snapshot.py). The 6-month transaction
+-- aggregate seeks on (Customer_ID, Transaction_Date) and reads Amount from the index;
+-- the Customer_ID indexes turn the per-customer joins into seeks.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Transaction_History_Customer_Date' AND object_id = OBJECT_ID('Transaction_History'))
+    CREATE NONCLUSTERED INDEX IX_Transaction_History_Customer_Date
+        ON Transaction_History (Customer_ID, Transaction_Date) INCLUDE (Amount);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employment_Info_Customer' AND object_id = OBJECT_ID('Employment_Info'))
+    CREATE NONCLUSTERED INDEX IX_Employment_Info_Customer ON Employment_Info (Customer_ID);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Bank_Info_Customer' AND object_id = OBJECT_ID('Bank_Info'))
+    CREATE NONCLUSTERED INDEX IX_Bank_Info_Customer ON Bank_Info (Customer_ID);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Loan_Info_Customer' AND object_id = OBJECT_ID('Loan_Info'))
+    CREATE NONCLUSTERED INDEX IX_Loan_Info_Customer ON Loan_Info (Customer_ID);
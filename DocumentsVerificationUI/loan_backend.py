@@ -4,6 +4,7 @@ Provides REST API endpoints to interact with specialized loan evaluation agents
 """
 
 import asyncio
+import importlib
 import sys
 import json
 import os
@@ -19,12 +20,19 @@ if sys.platform.startswith('win'):
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 # Import the loan evaluation system
 from summary import LoanEvaluationSummary
 
+# The orchestrator (orch.py and its orch_* modules) lives in the repository root
+ORCHESTRATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ORCHESTRATOR_DIR not in sys.path:
+    sys.path.append(ORCHESTRATOR_DIR)
+from orch_metrics import render_prometheus
+
 # FastAPI app configuration
 app = FastAPI(
     title="Loan Evaluation Agents API",
@@ -44,6 +52,11 @@ app.add_middleware(
 # Global evaluation system instance
 evaluation_system: Optional[LoanEvaluationSummary] = None
 
+# Orchestrator client, agents and Cosmos state shared by streamed verifications
+verification_setup: Optional[Dict[str, Any]] = None
+verification_setup_lock = asyncio.Lock()
+verification_tasks = set()
+
 # Pydantic models
 class LoanEvaluationRequest(BaseModel):
     customer_name: str
@@ -66,6 +79,11 @@ class AgentEvaluationResponse(BaseModel):
     result: Dict[str, Any]
     status: str = "success"
 
+class VerificationStreamRequest(BaseModel):
+    customer_id: str
+    run_id: Optional[str] = None  # continue this run from its checkpoint
+    resume: Optional[bool] = None  # continue the customer's latest unfinished run (default PIPELINE_CHECKPOINT_AUTO_RESUME)
+
 class HealthResponse(BaseModel):
     status: str
     agents_status: str
@@ -116,6 +134,14 @@ async def cleanup_evaluation_system():
         if evaluation_system:
             evaluation_system.cleanup()
             evaluation_system = None
+        
+        if verification_setup:
+            orch = verification_setup["orch"]
+            await orch.email_outbox.close()
+            await orch.response_cache.close()
+            await orch.cosmos_service.close()
+            orch.shutdown_agent_executor()
+            orch.client_factory.close()
             
         print("🧹 Evaluation system cleanup completed.")
     except Exception as e:
@@ -129,6 +155,8 @@ async def startup_event():
     print("📝 Agents will process comprehensive loan evaluations")
     # Initialize in background to avoid blocking startup
     asyncio.create_task(initialize_evaluation_system_background())
+    # Warm the orchestrator's Azure clients and agents so the first verification starts hot
+    asyncio.create_task(warm_verification_setup())
 
 async def initialize_evaluation_system_background():
     """Background task to initialize the evaluation system"""
@@ -136,6 +164,14 @@ async def initialize_evaluation_system_background():
     if not success:
         print("⚠️ Warning: Evaluation system initialization failed. Some features may not work.")
 
+async def warm_verification_setup():
+    """Background task to build the verification clients and agents ahead of the first request"""
+    try:
+        await get_verification_setup()
+        print("✅ Verification pipeline warmed up")
+    except Exception as e:
+        print(f"⚠️ Verification pipeline warm-up failed, it will be retried on first request: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup when the FastAPI app shuts down"""
@@ -395,6 +431,85 @@ async def generate_summary_only():
             detail=f"Failed to generate summary: {str(e)}"
         )
 
+async def get_verification_setup() -> Dict[str, Any]:
+    """Import the orchestrator and create its client and agents once
+
+    The import, client and agent creation are blocking, so they run on a
+    worker thread; the lock makes concurrent first requests wait for one setup.
+    """
+    global verification_setup
+    
+    async with verification_setup_lock:
+        if verification_setup is None:
+            orch = await asyncio.to_thread(importlib.import_module, "orch")
+            
+            cosmos_initialized = await orch.cosmos_service.initialize()
+            project_client = await asyncio.to_thread(orch.create_project_client)
+            agents = await asyncio.to_thread(orch.create_verification_agents, project_client)
+            verification_setup = {
+                "orch": orch,
+                "project_client": project_client,
+                "agents": agents,
+                "cosmos_initialized": cosmos_initialized
+            }
+    return verification_setup
+
+@app.post("/api/verification/stream")
+async def stream_verification(request: VerificationStreamRequest):
+    """Run the full verification pipeline for a customer, streaming agent output as Server-Sent Events"""
+    try:
+        setup = await get_verification_setup()
+    except Exception as e:
+        print(f"❌ Failed to initialize verification pipeline: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Verification pipeline unavailable: {str(e)}"
+        )
+    
+    orch = setup["orch"]
+    from orch_streaming import format_sse, iter_events, make_event
+    
+    error = orch.validate_customer_id(request.customer_id)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    run = await orch.resume_or_create_run(request.customer_id, request.run_id, request.resume)
+    queue = run.events.subscribe()
+    
+    async def run_pipeline():
+        try:
+            await orch.run_verification_pipeline(run, setup["project_client"], setup["agents"], setup["cosmos_initialized"])
+            run.events.publish(make_event(run, "final_recommendation", recommendation=run.final_recommendation))
+        except Exception as e:
+            print(f"❌ Streamed verification for {run.customer_id} failed: {e}")
+            run.events.publish(make_event(run, "error", error=str(e)))
+        finally:
+            run.events.close()
+    
+    # Keep a reference so the background run is not garbage collected
+    pipeline_task = asyncio.create_task(run_pipeline())
+    verification_tasks.add(pipeline_task)
+    pipeline_task.add_done_callback(verification_tasks.discard)
+    
+    async def event_source():
+        try:
+            async for event in iter_events(queue):
+                yield format_sse(event)
+        finally:
+            # The pipeline keeps running (and storing results) if the client disconnects
+            run.events.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Run-Id": run.run_id}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Orchestrator stage latency and token histograms in Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/system/diagnostics")
 async def system_diagnostics():
     """Get system diagnostic information"""
@@ -0,0 +1,182 @@
+"""
+Hi/lo customer ID allocation shared by the application API and the orchestrator.
+
+A SQL Server sequence (dbo.Customer_ID_Hi, created by ensure_sql_sequence or
+ensure_dbapi_sequence) hands out "hi" values. Each hi reserves the block of
+BLOCK_SIZE consecutive customer numbers [hi * BLOCK_SIZE, (hi + 1) * BLOCK_SIZE),
+which the process then issues from memory. Allocation is O(1) with one database round trip per
+block, and because every process draws its blocks from the same sequence no
+two callers can ever receive the same number.
+
+All processes must use the same block size (CUSTOMER_ID_BLOCK_SIZE) and prefix
+(DEFAULT_CUSTOMER_ID_PREFIX, the orchestrator's setting). Numbers left over in
+a block when a process exits are simply never used.
+
+A SQLite file can stand in for the sequence in single-host development
+(sqlite_sequence). It only knows the numbers it issued itself and is not
+shared between hosts, so it starts at CUSTOMER_ID_FLOOR and must never be
+used against a database that already holds customers.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable
+
+# Same setting as the orchestrator (orch_config.DEFAULT_CUSTOMER_ID_PREFIX), so both issue identical IDs
+CUSTOMER_ID_PREFIX = os.getenv("DEFAULT_CUSTOMER_ID_PREFIX", "CUST")
+CUSTOMER_ID_BLOCK_SIZE = int(os.getenv("CUSTOMER_ID_BLOCK_SIZE", "50"))
+# Lowest number the allocator may issue. The SQL sequence additionally starts past the
+# highest existing customer number; the local SQLite sequence relies on this floor alone
+CUSTOMER_ID_FLOOR = int(os.getenv("CUSTOMER_ID_FLOOR", "111"))
+
+SEQUENCE_NAME = "dbo.Customer_ID_Hi"
+NEXT_HI_SQL = f"SELECT NEXT VALUE FOR {SEQUENCE_NAME}"
+
+# Creates the sequence once, starting past the highest existing customer number
+# so issued IDs never collide with customers created before the allocator.
+# Expects @prefix and @block_size; ENSURE_SEQUENCE_SQL / ENSURE_SEQUENCE_DBAPI_SQL declare them.
+_ENSURE_SEQUENCE_BODY = """
+IF NOT EXISTS (SELECT 1 FROM sys.sequences WHERE name = 'Customer_ID_Hi' AND schema_id = SCHEMA_ID('dbo'))
+BEGIN
+    DECLARE @max_number BIGINT = (
+        SELECT ISNULL(MAX(TRY_CAST(SUBSTRING(Customer_ID, LEN(@prefix) + 1, 16) AS BIGINT)), 0)
+        FROM Master_Customer_Data
+        WHERE Customer_ID LIKE @prefix + '%'
+    );
+    DECLARE @start BIGINT = @max_number / @block_size + 1;
+    DECLARE @sql NVARCHAR(400) = N'CREATE SEQUENCE dbo.Customer_ID_Hi AS BIGINT START WITH '
+        + CAST(@start AS NVARCHAR(20)) + N' INCREMENT BY 1 CACHE 20';
+    EXEC sp_executesql @sql;
+END
+"""
+ENSURE_SEQUENCE_SQL = "DECLARE @prefix NVARCHAR(20) = :prefix, @block_size BIGINT = :block_size;" + _ENSURE_SEQUENCE_BODY
+ENSURE_SEQUENCE_DBAPI_SQL = "DECLARE @prefix NVARCHAR(20) = ?, @block_size BIGINT = ?;" + _ENSURE_SEQUENCE_BODY
+# SQL Server error "There is already an object named ... in the database"
+OBJECT_EXISTS_ERROR = "2714"
+
+
+def _sequence_already_created(error: Exception) -> bool:
+    """True when CREATE SEQUENCE lost the race against another process creating it"""
+    return OBJECT_EXISTS_ERROR in str(error)
+
+
+class HiLoAllocator:
+    """Thread-safe issuer of customer IDs from blocks reserved through next_hi()"""
+
+    def __init__(self, next_hi: Callable[[], int], block_size: int = None,
+                 prefix: str = None, floor: int = None):
+        self.next_hi = next_hi
+        self.block_size = block_size or CUSTOMER_ID_BLOCK_SIZE
+        self.prefix = prefix or CUSTOMER_ID_PREFIX
+        self.floor = floor if floor is not None else CUSTOMER_ID_FLOOR
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        hi = int(self.next_hi())
+        self._next = hi * self.block_size
+        self._end = self._next + self.block_size
+
+    def next_number(self) -> int:
+        with self._lock:
+            while self._next >= self._end or self._next < self.floor:
+                if self._next >= self._end:
+                    self._reserve_block()
+                else:
+                    # Skip the part of a block that lies below the floor
+                    self._next = min(self.floor, self._end)
+            number = self._next
+            self._next += 1
+            return number
+
+    def next_id(self) -> str:
+        """Next customer ID, e.g. CUST0111"""
+        return f"{self.prefix}{self.next_number():04d}"
+
+
+def sqlalchemy_sequence(engine) -> Callable[[], int]:
+    """next_hi() drawing from the SQL Server sequence through a SQLAlchemy engine"""
+    from sqlalchemy import text
+
+    def next_hi() -> int:
+        with engine.connect() as connection:
+            return connection.execute(text(NEXT_HI_SQL)).scalar()
+
+    return next_hi
+
+
+def ensure_sql_sequence(engine, block_size: int = None, prefix: str = None):
+    """Create dbo.Customer_ID_Hi if it does not exist yet (safe when several workers start together)"""
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(ENSURE_SEQUENCE_SQL), {
+                "prefix": prefix or CUSTOMER_ID_PREFIX,
+                "block_size": block_size or CUSTOMER_ID_BLOCK_SIZE
+            })
+    except DBAPIError as e:
+        if not _sequence_already_created(e):
+            raise
+
+
+def ensure_dbapi_sequence(connection, block_size: int = None, prefix: str = None):
+    """Create dbo.Customer_ID_Hi if it does not exist yet, through a DB-API (pyodbc) connection"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(ENSURE_SEQUENCE_DBAPI_SQL, prefix or CUSTOMER_ID_PREFIX, block_size or CUSTOMER_ID_BLOCK_SIZE)
+        connection.commit()
+    except Exception as e:
+        connection.rollback()
+        if not _sequence_already_created(e):
+            raise
+
+
+def dbapi_sequence(connect: Callable[[], object], ensure: bool = True, block_size: int = None,
+                   prefix: str = None) -> Callable[[], int]:
+    """next_hi() drawing from the SQL Server sequence through a DB-API (pyodbc) connection factory
+
+    With ensure, the first call creates the sequence if it is missing (see ensure_dbapi_sequence).
+    """
+    ensured = not ensure
+
+    def next_hi() -> int:
+        nonlocal ensured
+        connection = connect()
+        try:
+            if not ensured:
+                ensure_dbapi_sequence(connection, block_size, prefix)
+                ensured = True
+            cursor = connection.cursor()
+            cursor.execute(NEXT_HI_SQL)
+            return cursor.fetchone()[0]
+        finally:
+            connection.close()
+
+    return next_hi
+
+
+def sqlite_sequence(path: str, start: int = None) -> Callable[[], int]:
+    """next_hi() backed by a local SQLite file, for single-host development without SQL Server"""
+    start = start if start is not None else CUSTOMER_ID_FLOOR // CUSTOMER_ID_BLOCK_SIZE
+
+    def next_hi() -> int:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        try:
+            connection.execute("CREATE TABLE IF NOT EXISTS hilo (name TEXT PRIMARY KEY, next_hi INTEGER NOT NULL)")
+            # BEGIN IMMEDIATE takes the write lock, so concurrent processes serialise here
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT next_hi FROM hilo WHERE name = 'customer_id'").fetchone()
+            hi = row[0] if row else start
+            connection.execute(
+                "INSERT OR REPLACE INTO hilo (name, next_hi) VALUES ('customer_id', ?)", (hi + 1,)
+            )
+            connection.execute("COMMIT")
+            return hi
+        finally:
+            connection.close()
+
+    return next_hi
@@ -5,6 +5,7 @@ from datetime import datetime, date
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func
 from database import get_db, engine, Base
+from customer_ids import HiLoAllocator, ensure_sql_sequence, sqlalchemy_sequence
 from pydantic import BaseModel, EmailStr, constr
 from models.database_models import (
     MasterCustomerData,
@@ -27,6 +28,10 @@ load_dotenv()
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Customer IDs come from blocks of the shared dbo.Customer_ID_Hi sequence
+ensure_sql_sequence(engine)
+customer_id_allocator = HiLoAllocator(sqlalchemy_sequence(engine))
+
 # Get root_path from environment variable, default to "" for local development
 root_path = os.getenv("ROOT_PATH", "")
 
@@ -460,19 +465,8 @@ async def create_personal_details(
     Returns:
     - Dict: Created customer details with generated customer ID
     """
-    # Get the latest customer ID and increment
-    latest_customer = db.query(MasterCustomerData).order_by(
-        MasterCustomerData.Customer_ID.desc()
-    ).first()
-    
-    # Start from CUST0111 if specified, or determine next number
-    if latest_customer:
-        last_num = int(latest_customer.Customer_ID[4:])
-        new_num = max(last_num + 1, 111)  # Ensure it starts at least from 111
-    else:
-        new_num = 111
-    
-    customer_id = f"CUST{new_num:04d}"
+    # Collision-free ID from the hi/lo allocator (no table scan, safe under concurrency)
+    customer_id = customer_id_allocator.next_id()
       # Create new customer
     new_customer = MasterCustomerData(
         Customer_ID=customer_id,
@@ -1,4 +1,3 @@
-from azure.ai.projects.models import AzureAISearchTool
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
 import sys
@@ -7,26 +6,20 @@ import os
 # Import config variables
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from orch_config import *
+from agents.registry import get_or_create_search_agent
+from orch_prompts import prompt_store
 
 def get_identity_agent_instructions():
-    dir_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    with open(os.path.join(dir_path, 'instructions', 'identity_agent_instructions.txt'), 'r', encoding='utf-8') as f:
-        return f.read()
+    return prompt_store.get('identity_agent_instructions.txt')
 
 def create_identity_agent(client, conn_id, index_name):
-    # Define search tool pointing to your AI Search index
-    tool = AzureAISearchTool(
-        index_connection_id=conn_id,
-        index_name=index_name
-    )
-
-    # Create identity verification agent
-    agent = client.agents.create_agent(
-        model="gpt-4o",
+    # Reuse the registered agent unless the model, instructions or index changed
+    return get_or_create_search_agent(
+        client,
         name="identity_checker",
+        model="gpt-4o",
+        instructions_file="identity_agent_instructions.txt",
         instructions=get_identity_agent_instructions(),
-        tools=tool.definitions,
-        tool_resources=tool.resources
+        conn_id=conn_id,
+        index_name=index_name
     )
-
-    return agent
@@ -1,27 +1,20 @@
-from azure.ai.projects.models import AzureAISearchTool
 from azure.ai.projects import AIProjectClient
 from orch_config import *
+from agents.registry import get_or_create_search_agent
+from orch_prompts import prompt_store
 import os
 
 def get_income_agent_instructions():
-    dir_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    with open(os.path.join(dir_path, 'instructions', 'income_agent_instructions.txt'), 'r', encoding='utf-8') as f:
-        return f.read()
+    return prompt_store.get('income_agent_instructions.txt')
 
 def create_income_agent(client: AIProjectClient, conn_id: str, index_name: str):
-    # Define Azure AI Search tool
-    tool = AzureAISearchTool(
-        index_connection_id=conn_id,
-        index_name=index_name
-    )
-
-    # Create the income verification agent
-    agent = client.agents.create_agent(
-        model="gpt-4o",
+    # Reuse the registered agent unless the model, instructions or index changed
+    return get_or_create_search_agent(
+        client,
         name="income_checker",
+        model="gpt-4o",
+        instructions_file="income_agent_instructions.txt",
         instructions=get_income_agent_instructions(),
-        tools=tool.definitions,
-        tool_resources=tool.resources
+        conn_id=conn_id,
+        index_name=index_name
     )
-
-    return agent
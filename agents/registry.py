@@ -0,0 +1,209 @@
+"""
+Local registry of Azure AI agents so startup reuses existing agent IDs.
+
+Agents are keyed by a hash of their definition (name, model, instructions
+file and content, search connection and index). A matching entry is reused
+without a create_agent call; when a definition changes a new agent is
+created. Superseded agents are left in the project, since other processes
+(or an older deployment) may still be running them.
+
+A registry entry is trusted for AGENT_REGISTRY_VERIFY_TTL seconds. When a run
+fails because its agent no longer exists, recover_agent re-verifies the entry
+and recreates the agent, and current_agent_id maps the missing ID to its
+replacement for the rest of the process.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from azure.ai.projects.models import AzureAISearchTool
+
+from orch_config import AGENT_REGISTRY_ENABLED, AGENT_REGISTRY_FILE, AGENT_REGISTRY_VERIFY_TTL
+
+_lock = threading.Lock()
+_recover_lock = threading.Lock()
+# agent_id -> get_or_create_search_agent arguments, so recover_agent can recreate it
+_definitions = {}
+# Missing agent_id -> ID of the agent that replaced it
+_replacements = {}
+
+
+class RegisteredAgent:
+    """Minimal agent handle for a reused registry entry (only .id is used downstream)"""
+
+    def __init__(self, agent_id: str, name: str):
+        self.id = agent_id
+        self.name = name
+
+    def __repr__(self):
+        return f"RegisteredAgent(id={self.id!r}, name={self.name!r})"
+
+
+def agent_definition_hash(name: str, model: str, instructions_file: str, instructions: str,
+                          conn_id: str, index_name: str) -> str:
+    """Stable hash of everything that defines a search-backed agent"""
+    payload = json.dumps({
+        "name": name,
+        "model": model,
+        "instructions_file": instructions_file,
+        "instructions_sha256": hashlib.sha256(instructions.encode("utf-8")).hexdigest(),
+        "conn_id": conn_id,
+        "index_name": index_name
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_registry(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Agent registry {path} unreadable, starting fresh: {e}")
+        return {}
+
+
+def _save_registry(path: str, registry: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _agent_exists(client, agent_id: str) -> bool:
+    try:
+        client.agents.get_agent(agent_id)
+        return True
+    except Exception:
+        return False
+
+
+def is_agent_not_found(error) -> bool:
+    """True when an SDK error says the agent (or another resource) does not exist"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 404 or type(error).__name__ == "ResourceNotFoundError"
+
+
+def current_agent_id(agent_id: str) -> str:
+    """ID to run for agent_id, following replacements made by recover_agent"""
+    while agent_id in _replacements:
+        agent_id = _replacements[agent_id]
+    return agent_id
+
+
+def invalidate_agent(agent_id: str, registry_path: str = None):
+    """Make the next lookup of agent_id re-verify it with the service instead of trusting the TTL"""
+    path = registry_path or AGENT_REGISTRY_FILE
+    with _lock:
+        registry = _load_registry(path)
+        stale = [entry for entry in registry.values() if entry.get("agent_id") == agent_id]
+        for entry in stale:
+            entry["verified_at"] = 0
+        if stale:
+            _save_registry(path, registry)
+
+
+def recover_agent(agent_id: str):
+    """Re-verify an agent a run could not find and recreate it if it is gone
+
+    Returns the replacement agent ID, or None when the agent was not created
+    by this process or still exists.
+    """
+    with _recover_lock:
+        if agent_id in _replacements:
+            return current_agent_id(agent_id)
+        definition = _definitions.get(agent_id)
+        if definition is None:
+            return None
+        print(f"⚠️ Agent {definition['name']} ({agent_id}) not found - re-verifying")
+        if AGENT_REGISTRY_ENABLED:
+            invalidate_agent(agent_id, definition["registry_path"])
+        elif _agent_exists(definition["client"], agent_id):
+            return None
+        agent = get_or_create_search_agent(**definition)
+        if agent.id == agent_id:
+            return None
+        _replacements[agent_id] = agent.id
+        return agent.id
+
+
+def get_or_create_search_agent(client, name: str, model: str, instructions_file: str,
+                               instructions: str, conn_id: str, index_name: str,
+                               registry_path: str = None):
+    """Return an agent for this definition, reusing a registered one when unchanged"""
+    agent = _get_or_create_search_agent(client, name, model, instructions_file, instructions,
+                                        conn_id, index_name, registry_path)
+    _definitions[agent.id] = {
+        "client": client,
+        "name": name,
+        "model": model,
+        "instructions_file": instructions_file,
+        "instructions": instructions,
+        "conn_id": conn_id,
+        "index_name": index_name,
+        "registry_path": registry_path
+    }
+    return agent
+
+
+def _get_or_create_search_agent(client, name: str, model: str, instructions_file: str,
+                                instructions: str, conn_id: str, index_name: str,
+                                registry_path: str = None):
+    tool = AzureAISearchTool(
+        index_connection_id=conn_id,
+        index_name=index_name
+    )
+
+    def create():
+        return client.agents.create_agent(
+            model=model,
+            name=name,
+            instructions=instructions,
+            tools=tool.definitions,
+            tool_resources=tool.resources
+        )
+
+    if not AGENT_REGISTRY_ENABLED:
+        return create()
+
+    path = registry_path or AGENT_REGISTRY_FILE
+    definition_hash = agent_definition_hash(name, model, instructions_file, instructions, conn_id, index_name)
+
+    with _lock:
+        registry = _load_registry(path)
+        entry = registry.get(definition_hash)
+
+        if entry:
+            now = time.time()
+            if now - entry.get("verified_at", 0) < AGENT_REGISTRY_VERIFY_TTL:
+                print(f"♻️  Reusing agent {name} ({entry['agent_id']})")
+                return RegisteredAgent(entry["agent_id"], name)
+            if _agent_exists(client, entry["agent_id"]):
+                entry["verified_at"] = now
+                _save_registry(path, registry)
+                print(f"♻️  Reusing agent {name} ({entry['agent_id']})")
+                return RegisteredAgent(entry["agent_id"], name)
+            print(f"⚠️ Registered agent {name} ({entry['agent_id']}) no longer exists - recreating")
+            registry.pop(definition_hash, None)
+
+        agent = create()
+        print(f"🆕 Created agent {name} ({agent.id})")
+
+        registry[definition_hash] = {
+            "agent_id": agent.id,
+            "name": name,
+            "model": model,
+            "instructions_file": instructions_file,
+            "index_name": index_name,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "verified_at": time.time()
+        }
+        _save_registry(path, registry)
+        return agent
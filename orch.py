@@ -1,9 +1,11 @@
 
 
 import asyncio
+import copy
 import os
 import json
 import logging
+import re
 import uuid
 import hashlib
 import random
@@ -30,8 +32,6 @@ logging.getLogger('loan_offer_generation_agent').setLevel(logging.ERROR)
 logging.getLogger('root').setLevel(logging.ERROR)
 
 from datetime import datetime, timezone
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import MessageRole
 from azure.cosmos.aio import CosmosClient
 from azure.cosmos import exceptions
@@ -51,10 +51,38 @@ from agents.gua import create_guarantor_agent
 from agents.val_agent import create_valuation_agent
 from agents.insp import create_collateral_inspection_agent
 from agents.underwriting_agent import underwriting_agent
+from orch_scheduler import verification_graph
+from orch_context import ContextBuilder
+from orch_signals import (
+    RISK_KEYWORDS,
+    POSITIVE_KEYWORDS,
+    ISSUE_KEYWORDS,
+    RECOMMENDATION_RISK_KEYWORDS,
+    get_signals,
+)
+from orch_run import VerificationRun
+from orch_prompts import prompt_store
+from orch_cache import AgentResponseCache
+from orch_write_buffer import CosmosWriteBuffer
+from orch_versioning import write_versioned
+from orch_agent_runtime import (
+    FAILED_RUN_STATUSES,
+    execute_agent_run,
+    stream_agent_run,
+    collect_run_metrics,
+    get_last_agent_message,
+    run_status,
+    shutdown_agent_executor,
+)
+from orch_streaming import make_event, print_stream_events
+from orch_metrics import record_stage, stage_timer, start_metrics_server
+from orch_outbox import EmailOutbox, HttpEmailTransport, CallableEmailTransport
+from orch_checkpoint import PipelineCheckpoints, completed_steps, is_reusable
+from orch_clients import client_factory
 import sys
 
 # Import custom template agent functions for email notifications
-sys.path.append(os.path.join(os.path.dirname(__file__), 'Custom Customer Communication Agent'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'Agents', 'Custom Customer Communication Agent'))
 try:
     from custom_agent_functions import send_email_template
     print("✅ Custom template agent functions imported successfully")
@@ -65,6 +93,14 @@ except ImportError as e:
         print(f"📧 [FALLBACK] Would send email to customer {customer_id} for stage {stage}")
         return {"status": "fallback", "message": "Template function not available"}
 
+# Stage emails go through the outbox: a pooled HTTP session to the Logic App when
+# the payload builder is available, otherwise send_email_template in a worker thread
+try:
+    from custom_agent_functions import build_email_template_payload, EMAIL_TEMPLATE_API_URL
+    email_transport = HttpEmailTransport(EMAIL_TEMPLATE_API_URL, build_email_template_payload)
+except ImportError:
+    email_transport = CallableEmailTransport(send_email_template)
+
 # Import loan offer generation agent functions
 sys.path.append(os.path.join(os.path.dirname(__file__), 'Loan Offer Generation Agent'))
 try:
@@ -93,6 +129,45 @@ except ImportError as e:
 
 
 
+def run_underwriting_analysis(customer_id: str, verification_results: dict) -> dict:
+    """Blocking underwriting on its own copy of the agent and its own database connection
+
+    Runs in a worker thread (asyncio.to_thread), so concurrent customers never share a
+    connection and never block the event loop.
+    """
+    agent = copy.copy(underwriting_agent)
+    agent.initialize_database_connection()
+    try:
+        return agent.perform_underwriting_analysis(customer_id=customer_id, verification_results=verification_results)
+    finally:
+        agent.close_connection()
+
+
+# Customer IDs come from the application API's hi/lo allocator
+sys.path.append(os.path.join(os.path.dirname(__file__), 'RestAPI', 'applicationAPI'))
+from customer_ids import HiLoAllocator, dbapi_sequence, sqlite_sequence
+
+def _connect_customer_id_database():
+    import pyodbc
+    return pyodbc.connect(CUSTOMER_ID_SQL_CONNECTION_STRING)
+
+def _no_customer_id_sequence() -> int:
+    raise RuntimeError(
+        "No customer ID sequence configured: set CUSTOMER_ID_SQL_CONNECTION_STRING "
+        "(or CUSTOMER_ID_LOCAL_SEQUENCE=true for single-host development)"
+    )
+
+if CUSTOMER_ID_SQL_CONNECTION_STRING:
+    # The first block reservation creates dbo.Customer_ID_Hi past the highest existing customer if needed
+    customer_id_allocator = HiLoAllocator(
+        dbapi_sequence(_connect_customer_id_database, prefix=DEFAULT_CUSTOMER_ID_PREFIX),
+        prefix=DEFAULT_CUSTOMER_ID_PREFIX
+    )
+elif CUSTOMER_ID_LOCAL_SEQUENCE:
+    customer_id_allocator = HiLoAllocator(sqlite_sequence(CUSTOMER_ID_SQLITE_PATH), prefix=DEFAULT_CUSTOMER_ID_PREFIX)
+else:
+    customer_id_allocator = HiLoAllocator(_no_customer_id_sequence, prefix=DEFAULT_CUSTOMER_ID_PREFIX)
+
 # Azure config - using config values
 ENDPOINT = ENDPOINT
 RESOURCE_GROUP = RESOURCE_GROUP
@@ -113,18 +188,6 @@ COSMOS_DB_CONTAINER_NAME = COSMOS_DB_CONTAINER_NAME
 # Customer ID generation settings - from config
 DEFAULT_CUSTOMER_ID_PREFIX = DEFAULT_CUSTOMER_ID_PREFIX
 
-agent_results = {}
-shared_context = {
-    "applicant_name": "",
-    "applicant_details": {},
-    "risk_factors": [],
-    "supporting_evidence": [],
-    "recommendations": []
-}
-
-# Global customer tracking
-current_customer_id = None
-
 # --- Cosmos DB Service Class ---
 class CosmosDBService:
     """Service class for managing Cosmos DB operations for loan verification data"""
@@ -137,6 +200,7 @@ class CosmosDBService:
         self.cosmos_client = None
         self.database = None
         self.container = None
+        self.write_buffer = None
         
     async def initialize(self):
         """Initialize Cosmos DB client, database, and container"""
@@ -156,6 +220,12 @@ class CosmosDBService:
                 offer_throughput=400
             )
             
+            # Agent results are written behind the pipeline in per-customer batches
+            if COSMOS_WRITE_BUFFER_ENABLED and self.write_buffer is None:
+                self.write_buffer = CosmosWriteBuffer(self.container)
+                self.write_buffer.start()
+                await self.write_buffer.replay_spill()
+            
             print(f"✅ Cosmos DB initialized successfully!")
             return True
             
@@ -164,8 +234,14 @@ class CosmosDBService:
             return False
     
     async def store_agent_result(self, customer_id: str, agent_name: str, agent_result: dict, 
-                               applicant_name: str = None, additional_metadata: dict = None):
-        """Store individual agent result to Cosmos DB with enhanced structure for underwriting data"""
+                               applicant_name: str = None, additional_metadata: dict = None,
+                               run_id: str = None, run_started_at: str = None):
+        """Store individual agent result to Cosmos DB with enhanced structure for underwriting data
+        
+        The document ID is deterministic per customer and agent, so a re-run
+        replaces the previous result (versioned, ETag-guarded) instead of
+        keeping the stale one or adding another document.
+        """
         try:
             if not self.container:
                 print("❌ Cosmos DB not initialized")
@@ -173,7 +249,7 @@ class CosmosDBService:
             
             # Create base document structure
             document = {
-                "id": f"{customer_id}_{agent_name}",
+                "id": self.agent_result_id(customer_id, agent_name),
                 "customer_id": customer_id,
                 "agent_name": agent_name,
                 "applicant_name": applicant_name or "Unknown",
@@ -183,7 +259,9 @@ class CosmosDBService:
                 "full_response": agent_result.get("full_response", ""),
                 "processing_time_ms": agent_result.get("processing_time_ms", 0),
                 "metadata": additional_metadata or {},
-                "document_type": "agent_result"
+                "document_type": "agent_result",
+                "run_id": run_id,
+                "run_started_at": run_started_at
             }
             
             # Add specialized fields for underwriting analysis
@@ -209,18 +287,44 @@ class CosmosDBService:
                     }
                 })
             
-            # Store document
-            await self.container.create_item(body=document)
-            print(f"✅ Stored {agent_name} result for customer {customer_id}")
-            return True
+            # Store document (queued for a batched write when the buffer is enabled)
+            if self.write_buffer:
+                await self.write_buffer.enqueue(document)
+                print(f"✅ Queued {agent_name} result for customer {customer_id}")
+                return True
             
-        except exceptions.CosmosResourceExistsError:
-            print(f"⚠️ Document already exists for {agent_name} - {customer_id}")
+            action = await write_versioned(self.container, document)
+            if action == "skip":
+                print(f"⏭️  {agent_name} result for customer {customer_id} already up to date")
+            else:
+                print(f"✅ Stored {agent_name} result for customer {customer_id}")
             return True
+            
         except Exception as e:
             print(f"❌ Failed to store {agent_name} result: {str(e)}")
             return False
     
+    def agent_result_id(self, customer_id: str, agent_name: str) -> str:
+        """Deterministic document ID of an agent result"""
+        return f"{customer_id}_{agent_name}"
+    
+    async def store_run_result(self, run: VerificationRun, agent_name: str, agent_result: dict,
+                               additional_metadata: dict = None):
+        """Store an agent result for the customer and run tracked by a VerificationRun"""
+        with stage_timer("cosmos_write", run, agent_name):
+            stored = await self.store_agent_result(
+                run.customer_id,
+                agent_name,
+                agent_result,
+                run.applicant_name,
+                additional_metadata,
+                run_id=run.run_id,
+                run_started_at=run.started_at.isoformat()
+            )
+        if stored:
+            run.result_documents[agent_name] = self.agent_result_id(run.customer_id, agent_name)
+        return stored
+    
     def _get_risk_score_range(self, risk_score: float) -> str:
         """Categorize risk score into ranges"""
         if risk_score >= 80: return "low_risk"
@@ -236,22 +340,37 @@ class CosmosDBService:
         elif monthly_income >= 25000: return "lower_middle_income"
         else: return "low_income"
     
-    async def store_final_recommendation(self, customer_id: str, final_recommendation: dict, 
-                                       all_agent_results: dict, shared_context: dict):
-        """Store comprehensive final recommendation"""
+    def latest_pointer_id(self, customer_id: str) -> str:
+        """Deterministic ID of the small per-customer pointer to the latest run"""
+        return f"{customer_id}_latest"
+    
+    async def store_final_recommendation(self, run: VerificationRun, final_recommendation: dict):
+        """Store comprehensive final recommendation for a verification run
+        
+        One document per run (replays of the same run rewrite it in place)
+        plus the customer's "latest" pointer, which is only moved forward.
+        """
+        customer_id = run.customer_id
+        all_agent_results = run.agent_results
+        shared_context = run.shared_context
         try:
             if not self.container:
                 print("❌ Cosmos DB not initialized")
                 return False
             
             document = {
-                "id": f"{customer_id}_final_recommendation_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}",
+                "id": f"{customer_id}_final_recommendation_{run.run_id}",
                 "customer_id": customer_id,
+                "run_id": run.run_id,
+                "run_started_at": run.started_at.isoformat(),
                 "applicant_name": shared_context.get("applicant_name", "Unknown"),
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "document_type": "final_recommendation",
                 "recommendation": final_recommendation,
-                "all_agent_results": all_agent_results,
+                # Agent responses are already stored as agent_result documents;
+                # reference them by ID instead of embedding them a second time
+                "agent_result_refs": dict(run.result_documents),
+                "agent_statuses": {key: result.get("status") for key, result in all_agent_results.items()},
                 "shared_context": shared_context,
                 "total_agents": len(all_agent_results),
                 "successful_agents": sum(1 for r in all_agent_results.values() if r.get("status") == "passed"),
@@ -259,7 +378,24 @@ class CosmosDBService:
                 "evidence_count": len(shared_context.get("supporting_evidence", []))
             }
             
-            await self.container.create_item(body=document)
+            latest = {
+                "id": self.latest_pointer_id(customer_id),
+                "customer_id": customer_id,
+                "document_type": "latest_pointer",
+                "run_id": run.run_id,
+                "run_started_at": run.started_at.isoformat(),
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "final_recommendation_id": document["id"],
+                "recommendation": final_recommendation.get("recommendation"),
+                "agent_result_refs": dict(run.result_documents)
+            }
+            
+            with stage_timer("cosmos_write", run, "Final Recommendation"):
+                for doc in (document, latest):
+                    if self.write_buffer:
+                        await self.write_buffer.enqueue(doc)
+                    else:
+                        await write_versioned(self.container, doc)
             print(f"✅ Stored final recommendation for customer {customer_id}")
             return True
             
@@ -267,21 +403,45 @@ class CosmosDBService:
             print(f"❌ Failed to store final recommendation: {str(e)}")
             return False
     
-    async def get_customer_results(self, customer_id: str):
-        """Retrieve all results for a specific customer"""
+    # Fields needed by summary views (skips the large full_response bodies)
+    SUMMARY_FIELDS = ["id", "document_type", "agent_name", "status", "timestamp",
+                      "processing_time_ms", "summary", "recommendation", "run_id"]
+    
+    def _build_customer_query(self, fields=None, document_type: str = None):
+        """Build a single-partition query for a customer's documents with an optional projection"""
+        if fields:
+            for field in fields:
+                if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", field):
+                    raise ValueError(f"Invalid projection field: {field}")
+            select = ", ".join(f"c.{field}" for field in fields)
+        else:
+            select = "*"
+        query = f"SELECT {select} FROM c WHERE c.customer_id = @customer_id"
+        if document_type:
+            query += " AND c.document_type = @document_type"
+        return query + " ORDER BY c.timestamp DESC"
+    
+    def _customer_query_parameters(self, customer_id: str, document_type: str = None):
+        parameters = [{"name": "@customer_id", "value": customer_id}]
+        if document_type:
+            parameters.append({"name": "@document_type", "value": document_type})
+        return parameters
+    
+    async def get_customer_results(self, customer_id: str, fields=None, document_type: str = None):
+        """Retrieve all results for a specific customer from its own partition"""
         try:
             if not self.container:
                 print("❌ Cosmos DB not initialized")
                 return None
             
-            query = "SELECT * FROM c WHERE c.customer_id = @customer_id ORDER BY c.timestamp DESC"
-            parameters = [{"name": "@customer_id", "value": customer_id}]
+            # Make documents still sitting in the write buffer visible to the read
+            await self.flush()
             
             items = []
             async for item in self.container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
+                query=self._build_customer_query(fields, document_type),
+                parameters=self._customer_query_parameters(customer_id, document_type),
+                partition_key=customer_id
             ):
                 items.append(item)
             
@@ -291,180 +451,401 @@ class CosmosDBService:
             print(f"❌ Failed to retrieve customer results: {str(e)}")
             return None
     
+    async def iter_customer_results(self, customer_id: str, fields=None, document_type: str = None,
+                                    page_size: int = 100, continuation_token: str = None):
+        """Yield (items, continuation_token) pages of a customer's documents from its own partition
+        
+        Pass the returned continuation token back in to resume from the next page.
+        """
+        if not self.container:
+            print("❌ Cosmos DB not initialized")
+            return
+        
+        await self.flush()
+        pages = self.container.query_items(
+            query=self._build_customer_query(fields, document_type),
+            parameters=self._customer_query_parameters(customer_id, document_type),
+            partition_key=customer_id,
+            max_item_count=page_size
+        ).by_page(continuation_token)
+        
+        async for page in pages:
+            items = [item async for item in page]
+            yield items, pages.continuation_token
+    
+    async def read_agent_result(self, customer_id: str, agent_name: str):
+        """Point-read one agent result by its deterministic ID (1 RU for small documents)"""
+        try:
+            if not self.container:
+                print("❌ Cosmos DB not initialized")
+                return None
+            
+            await self.flush()
+            return await self.container.read_item(
+                item=self.agent_result_id(customer_id, agent_name),
+                partition_key=customer_id
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        except Exception as e:
+            print(f"❌ Failed to read {agent_name} result: {str(e)}")
+            return None
+    
+    async def get_latest_run(self, customer_id: str):
+        """Point-read the customer's latest-run pointer document"""
+        try:
+            if not self.container:
+                print("❌ Cosmos DB not initialized")
+                return None
+            
+            await self.flush()
+            return await self.container.read_item(
+                item=self.latest_pointer_id(customer_id),
+                partition_key=customer_id
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        except Exception as e:
+            print(f"❌ Failed to read latest run for {customer_id}: {str(e)}")
+            return None
+    
+    async def read_agent_results(self, customer_id: str, agent_names):
+        """Point-read several agent results concurrently; missing ones are omitted"""
+        documents = await asyncio.gather(
+            *(self.read_agent_result(customer_id, agent_name) for agent_name in agent_names)
+        )
+        return {name: doc for name, doc in zip(agent_names, documents) if doc is not None}
+    
+    async def flush(self):
+        """Write any buffered documents now"""
+        if self.write_buffer:
+            await self.write_buffer.flush()
+    
     async def close(self):
-        """Close Cosmos DB client"""
+        """Flush buffered writes and close Cosmos DB client"""
+        if self.write_buffer:
+            await self.write_buffer.close()
+            self.write_buffer = None
         if self.cosmos_client:
             await self.cosmos_client.close()
 
 # Global Cosmos DB service instance
 cosmos_service = CosmosDBService()
 
+# Opt-in cache of verification agent responses (AGENT_CACHE_ENABLED)
+response_cache = AgentResponseCache(cosmos_service=cosmos_service)
+
+# Deduplicated background delivery of stage emails
+email_outbox = EmailOutbox(email_transport, cosmos_service=cosmos_service)
+
+# Per-step checkpoints so restarted runs skip the steps that already completed
+checkpoints = PipelineCheckpoints(cosmos_service=cosmos_service)
+
 # --- Utility Functions ---
 def load_instruction_from_file(filename: str) -> str:
-    """Load instruction text from a file in the instructions directory"""
+    """Load instruction text from the shared prompt store (re-read only when the file changes)"""
     try:
-        instructions_dir = os.path.join(os.path.dirname(__file__), 'instructions')
-        file_path = os.path.join(instructions_dir, filename)
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read().strip()
+        return prompt_store.get(filename).strip()
     except Exception as e:
         print(f"⚠️ Warning: Could not load instruction file {filename}: {e}")
         return f"Default instruction for {filename}"
 
 def generate_customer_id(applicant_name: str = None) -> str:
-    """Generate a unique customer ID in format CUST0001, CUST0002, etc."""
-    import random
-    
-    # Generate a simple 4-digit sequential number
-    customer_number = random.randint(1, 9999)
-    customer_id = f"{DEFAULT_CUSTOMER_ID_PREFIX}{customer_number:04d}"
+    """Generate a unique customer ID in format CUST0111, CUST0112, etc.
     
-    return customer_id
+    Numbers are issued from blocks of the shared dbo.Customer_ID_Hi sequence
+    (or, with CUSTOMER_ID_LOCAL_SEQUENCE, a local development sequence). Raises
+    RuntimeError when neither is configured.
+    """
+    if not CUSTOMER_ID_SQL_CONNECTION_STRING and CUSTOMER_ID_LOCAL_SEQUENCE:
+        print("⚠️ CUSTOMER_ID_SQL_CONNECTION_STRING not set - using the local development customer ID sequence")
+    return customer_id_allocator.next_id()
 
-def set_customer_id(customer_id: str = None, applicant_name: str = None):
-    """Set the global customer ID for the current session"""
-    global current_customer_id
-    if customer_id:
-        current_customer_id = customer_id
-    else:
-        current_customer_id = generate_customer_id(applicant_name)
-    
-    print(f"🆔 Customer ID set to: {current_customer_id}")
-    return current_customer_id
+def create_verification_run(customer_id: str = None, applicant_name: str = None) -> VerificationRun:
+    """Start a verification run for a customer, generating an ID if none is given"""
+    run = VerificationRun(customer_id or generate_customer_id(applicant_name))
+    print(f"🆔 Customer ID set to: {run.customer_id} (run {run.run_id})")
+    return run
+
+async def resume_or_create_run(customer_id: str, run_id: str = None, resume: bool = None) -> VerificationRun:
+    """Resume run_id from its checkpoint, else start a new run
+
+    Without a run ID a new run is started unless resume (default
+    PIPELINE_CHECKPOINT_AUTO_RESUME) asks for the customer's latest unfinished run.
+    """
+    resume = PIPELINE_CHECKPOINT_AUTO_RESUME if resume is None else resume
+    if not run_id and resume:
+        run_id = await checkpoints.find_incomplete_run(customer_id)
+        if run_id:
+            print(f"🔁 Resuming unfinished run {run_id} for customer {customer_id}")
+    if not run_id:
+        return create_verification_run(customer_id)
+    run = VerificationRun(customer_id, run_id=run_id)
+    if not await checkpoints.restore(run):
+        print(f"ℹ️ No resumable checkpoint for run {run_id}, starting it from the first step")
+    return run
 
 # --- Semantic Kernel based Agent Runner ---
 class AzureProjectAgentFunction:
     """Wrapper class to integrate Azure AI Project agents with Semantic Kernel"""
     
-    def __init__(self, agent_id, project_client, name, key):
+    def __init__(self, agent_id, project_client, name, key, run: VerificationRun, prompt_file: str = None):
         self.agent_id = agent_id
         self.project_client = project_client
         self.name = name
         self.key = key
+        self.run = run
+        self.prompt_file = prompt_file
+    
+    @property
+    def audit_metadata(self) -> dict:
+        """Prompt provenance recorded with every stored agent result"""
+        if not self.prompt_file:
+            return {}
+        return {"prompt_file": self.prompt_file, "prompt_hash": prompt_store.content_hash(self.prompt_file)}
         
     async def invoke(self, prompt):
-        """Invoke the agent with the given prompt and store results in Cosmos DB"""
+        """Invoke the agent with the given prompt and store results in Cosmos DB
+        
+        While anyone follows the run's events (or AGENT_STREAMING_ENABLED is
+        set) the run is streamed and every event is published to run.events.
+        """
+        if AGENT_STREAMING_ENABLED or self.run.events.active:
+            result = {"success": False, "response": ""}
+            async for event in self.stream(prompt):
+                self.run.events.publish(event)
+                if event["type"] == "agent_completed":
+                    result = {"success": event["success"], "response": event["response"]}
+            return result
+        
         start_time = datetime.now()
         print(f"\n🤖 {self.name} Agent Starting...")
         print(f"📝 Query: {prompt[:150]}..." if len(prompt) > 150 else f"📝 Query: {prompt}")
         
+        # Reuse a cached answer when prompt, agent and index documents are unchanged
+        cache_key = None
+        if response_cache.enabled:
+            cache_key = await response_cache.key_for(self.run.customer_id, self.key, self.agent_id, prompt)
+            cached = await response_cache.get(cache_key)
+            if cached:
+                return await self._complete_from_cache(cached, cache_key, start_time)
+        
         try:
-            thread = self.project_client.agents.create_thread()
-            _ = self.project_client.agents.create_message(
-                thread_id=thread.id,
-                role=MessageRole.USER,
-                content=prompt
-            )
-            
-            run = self.project_client.agents.create_and_process_run(
-                thread_id=thread.id, 
-                agent_id=self.agent_id
+            # Thread, message and run calls go through the agent thread pool
+            # (or the async client) and the run is polled with backoff, so the
+            # event loop stays free for Cosmos writes and other customers
+            thread, run = await execute_agent_run(
+                self.project_client, self.agent_id, prompt,
+                verification_run=self.run, agent_name=self.name
             )
             
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            full_response = None
+            if run_status(run) not in FAILED_RUN_STATUSES:
+                response = await get_last_agent_message(self.project_client, thread.id)
+                if response:
+                    full_response = "\n".join(msg.text.value for msg in response.text_messages)
             
-            if run.status == "failed":
-                print(f"❌ {self.name} Agent failed")
-                agent_result = {
-                    "status": "failed", 
-                    "summary": "Agent run failed or no response.",
-                    "full_response": "",
-                    "processing_time_ms": processing_time
-                }
-                agent_results[self.key] = agent_result
-                
-                # Store to Cosmos DB
-                if current_customer_id:
-                    await cosmos_service.store_agent_result(
-                        current_customer_id, 
-                        self.name, 
-                        agent_result,
-                        shared_context.get("applicant_name"),
-                        {"run_status": run.status, "thread_id": thread.id}
-                    )
-                
-                return {"success": False, "response": ""}
-            
-            response = self.project_client.agents.list_messages(
-                thread_id=thread.id
-            ).get_last_message_by_role(MessageRole.AGENT)
-            
-            if response:
-                texts = [msg.text.value for msg in response.text_messages]
-                full_response = "\n".join(texts)
-                
-                print(f"💬 {self.name} Agent Response:")
-                print("-" * 60)
-                print(full_response)
-                print("-" * 60)
-                
-                agent_result = {
-                    "status": "passed", 
-                    "summary": full_response,
-                    "full_response": full_response,
-                    "processing_time_ms": processing_time
-                }
-                agent_results[self.key] = agent_result
-                update_shared_context(self.key, full_response)
-                
-                # Store to Cosmos DB
-                if current_customer_id:
-                    await cosmos_service.store_agent_result(
-                        current_customer_id, 
-                        self.name, 
-                        agent_result,
-                        shared_context.get("applicant_name"),
-                        {"run_status": run.status, "thread_id": thread.id, "response_length": len(full_response)}
-                    )
-                
-                return {"success": True, "response": full_response}
-            else:
-                print(f"❌ {self.name} Agent: No response received")
-                agent_result = {
-                    "status": "no_response", 
-                    "summary": "No message returned.",
-                    "full_response": "",
-                    "processing_time_ms": processing_time
-                }
-                agent_results[self.key] = agent_result
-                
-                # Store to Cosmos DB
-                if current_customer_id:
-                    await cosmos_service.store_agent_result(
-                        current_customer_id, 
-                        self.name, 
-                        agent_result,
-                        shared_context.get("applicant_name"),
-                        {"run_status": run.status, "thread_id": thread.id}
-                    )
-                
-                return {"success": False, "response": ""}
+            return await self._record_run_outcome(thread, run, full_response, start_time, cache_key)
                 
         except Exception as e:
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
-            print(f"❌ {self.name} Agent error: {str(e)}")
+            return await self._record_error(e, start_time)
+
+    async def stream(self, prompt):
+        """Run the agent and yield its output as events while it is generated
+        
+        Yields agent_started, token, partial and message events, then
+        agent_completed once the result has been stored exactly as invoke()
+        stores it.
+        """
+        start_time = datetime.now()
+        print(f"\n🤖 {self.name} Agent Starting (streaming)...")
+        yield self._event("agent_started", start_time)
+        
+        cache_key = None
+        if response_cache.enabled:
+            cache_key = await response_cache.key_for(self.run.customer_id, self.key, self.agent_id, prompt)
+            cached = await response_cache.get(cache_key)
+            if cached:
+                result = await self._complete_from_cache(cached, cache_key, start_time)
+                yield self._event("message", start_time, text=result["response"], cached=True)
+                yield self._event("agent_completed", start_time, **result)
+                return
+        
+        thread = run = None
+        messages, current = [], []
+        last_partial = start_time
+        stream_start = time.perf_counter()
+        first_token = True
+        try:
+            async for kind, payload in stream_agent_run(self.project_client, self.agent_id, prompt,
+                                                        verification_run=self.run, agent_name=self.name):
+                if kind == "thread":
+                    thread = payload
+                    stream_start = time.perf_counter()
+                elif kind == "status":
+                    run = payload
+                elif kind == "delta":
+                    if first_token:
+                        first_token = False
+                        record_stage(self.run, "first_token", time.perf_counter() - stream_start, self.name)
+                    current.append(payload)
+                    yield self._event("token", start_time, text=payload)
+                    now = datetime.now()
+                    if (now - last_partial).total_seconds() >= AGENT_STREAM_PARTIAL_INTERVAL:
+                        last_partial = now
+                        yield self._event("partial", start_time, text="".join(current))
+                elif kind == "message":
+                    messages.append(payload)
+                    current = []
+                    yield self._event("message", start_time, text=payload)
+                elif kind == "error":
+                    raise RuntimeError(payload)
             
+            if run is None:
+                raise RuntimeError("Stream ended without a run status")
+            record_stage(self.run, "run_stream", time.perf_counter() - stream_start, self.name)
+            full_response = messages[-1] if messages and run_status(run) not in FAILED_RUN_STATUSES else None
+            result = await self._record_run_outcome(thread, run, full_response, start_time, cache_key)
+        except Exception as e:
+            result = await self._record_error(e, start_time)
+        
+        yield self._event("agent_completed", start_time, **result)
+
+    def _event(self, event_type: str, start_time: datetime, **fields) -> dict:
+        elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+        return make_event(self.run, event_type, agent=self.name, agent_key=self.key,
+                          elapsed_ms=elapsed_ms, **fields)
+
+    async def _record_run_outcome(self, thread, run, full_response, start_time: datetime, cache_key: str = None):
+        """Record a finished agent run (failed, answered or silent) as this run's result"""
+        processing_time = (datetime.now() - start_time).total_seconds() * 1000
+        record_stage(self.run, "agent_call", processing_time / 1000, self.name)
+        await collect_run_metrics(self.project_client, thread.id, run, self.run, self.name)
+        
+        if run_status(run) in FAILED_RUN_STATUSES:
+            print(f"❌ {self.name} Agent failed")
             agent_result = {
-                "status": "error", 
-                "summary": f"Error occurred: {str(e)}",
+                "status": "failed", 
+                "summary": "Agent run failed or no response.",
                 "full_response": "",
                 "processing_time_ms": processing_time
             }
-            agent_results[self.key] = agent_result
+            self.run.agent_results[self.key] = agent_result
             
-            # Store error to Cosmos DB
-            if current_customer_id:
-                await cosmos_service.store_agent_result(
-                    current_customer_id, 
+            # Store to Cosmos DB
+            if self.run.customer_id:
+                await cosmos_service.store_run_result(
+                    self.run, 
                     self.name, 
                     agent_result,
-                    shared_context.get("applicant_name"),
-                    {"error": str(e)}
+                    {**self.audit_metadata, "run_status": run.status, "thread_id": thread.id}
                 )
             
             return {"success": False, "response": ""}
+        
+        if full_response:
+            print(f"💬 {self.name} Agent Response:")
+            print("-" * 60)
+            print(full_response)
+            print("-" * 60)
+            
+            agent_result = {
+                "status": "passed", 
+                "summary": full_response,
+                "full_response": full_response,
+                "processing_time_ms": processing_time
+            }
+            self.run.agent_results[self.key] = agent_result
+            update_shared_context(self.run, self.key, full_response)
+            
+            if cache_key:
+                await response_cache.set(cache_key, {"full_response": full_response, "thread_id": thread.id})
+            
+            # Store to Cosmos DB
+            if self.run.customer_id:
+                await cosmos_service.store_run_result(
+                    self.run, 
+                    self.name, 
+                    agent_result,
+                    {**self.audit_metadata, "run_status": run.status, "thread_id": thread.id, "response_length": len(full_response)}
+                )
+            
+            return {"success": True, "response": full_response}
+        
+        print(f"❌ {self.name} Agent: No response received")
+        agent_result = {
+            "status": "no_response", 
+            "summary": "No message returned.",
+            "full_response": "",
+            "processing_time_ms": processing_time
+        }
+        self.run.agent_results[self.key] = agent_result
+        
+        # Store to Cosmos DB
+        if self.run.customer_id:
+            await cosmos_service.store_run_result(
+                self.run, 
+                self.name, 
+                agent_result,
+                {**self.audit_metadata, "run_status": run.status, "thread_id": thread.id}
+            )
+        
+        return {"success": False, "response": ""}
 
-async def run_agent_check_with_context(agent, base_prompt: str, name: str, key: str, project_client, previous_context=""):
+    async def _record_error(self, error: Exception, start_time: datetime):
+        """Record an agent call that raised as this run's result"""
+        processing_time = (datetime.now() - start_time).total_seconds() * 1000
+        record_stage(self.run, "agent_call", processing_time / 1000, self.name)
+        print(f"❌ {self.name} Agent error: {str(error)}")
+        
+        agent_result = {
+            "status": "error", 
+            "summary": f"Error occurred: {str(error)}",
+            "full_response": "",
+            "processing_time_ms": processing_time
+        }
+        self.run.agent_results[self.key] = agent_result
+        
+        # Store error to Cosmos DB
+        if self.run.customer_id:
+            await cosmos_service.store_run_result(
+                self.run, 
+                self.name, 
+                agent_result,
+                {**self.audit_metadata, "error": str(error)}
+            )
+        
+        return {"success": False, "response": ""}
+
+    async def _complete_from_cache(self, cached: dict, cache_key: str, start_time: datetime):
+        """Record a cached agent response as this run's result"""
+        full_response = cached["full_response"]
+        processing_time = (datetime.now() - start_time).total_seconds() * 1000
+        print(f"♻️  {self.name} Agent: using cached response")
+        
+        agent_result = {
+            "status": "passed", 
+            "summary": full_response,
+            "full_response": full_response,
+            "processing_time_ms": processing_time
+        }
+        self.run.agent_results[self.key] = agent_result
+        update_shared_context(self.run, self.key, full_response)
+        
+        # Store to Cosmos DB
+        if self.run.customer_id:
+            await cosmos_service.store_run_result(
+                self.run, 
+                self.name, 
+                agent_result,
+                {**self.audit_metadata, "cache_hit": True, "cache_key": cache_key,
+                 "source_thread_id": cached.get("thread_id"), "response_length": len(full_response)}
+            )
+        
+        return {"success": True, "response": full_response}
+
+async def run_agent_check_with_context(run: VerificationRun, agent, base_prompt: str, name: str, key: str, project_client, previous_context="",
+                                       prompt_file: str = None):
     """Legacy function maintained for compatibility"""
     
     # Build enhanced prompt with previous agent findings
@@ -473,6 +854,7 @@ async def run_agent_check_with_context(agent, base_prompt: str, name: str, key:
         context_prompt = f"\n\n--- PREVIOUS AGENT FINDINGS ---\n{previous_context}\n--- END PREVIOUS FINDINGS ---\n\n"
     
     # Add shared context information
+    shared_context = run.shared_context
     shared_info = ""
     if shared_context["applicant_name"]:
         shared_info += f"Applicant Name: {shared_context['applicant_name']}\n"
@@ -487,14 +869,14 @@ async def run_agent_check_with_context(agent, base_prompt: str, name: str, key:
     enhanced_prompt = f"{base_prompt}{context_prompt}Please also consider the above context in your analysis and provide insights that might be relevant for subsequent verification steps."
     
     # Create agent function wrapper for this specific agent
-    agent_func = AzureProjectAgentFunction(agent.id, project_client, name, key)
+    agent_func = AzureProjectAgentFunction(agent.id, project_client, name, key, run, prompt_file)
     result = await agent_func.invoke(enhanced_prompt)
     
     return result["success"], result.get("response", "")
 
-def update_shared_context(agent_key: str, response: str):
-    """Update shared context based on agent findings"""
-    response_lower = response.lower()
+def update_shared_context(run: VerificationRun, agent_key: str, response: str):
+    """Update the run's shared context based on agent findings"""
+    shared_context = run.shared_context
     
     # Extract applicant name if found
     if agent_key == "identity" and not shared_context["applicant_name"]:
@@ -506,39 +888,25 @@ def update_shared_context(agent_key: str, response: str):
                     shared_context["applicant_name"] = potential_name
                     break
     
-    # Identify risk factors
-    risk_keywords = ['discrepancy', 'inconsistent', 'missing', 'insufficient', 'concern', 'risk', 'issue']
-    for keyword in risk_keywords:
-        if keyword in response_lower:
-            risk_factor = f"{agent_key.title()}: {keyword} identified"
-            if risk_factor not in shared_context["risk_factors"]:
-                shared_context["risk_factors"].append(risk_factor)
-    
-    # Identify supporting evidence
-    positive_keywords = ['verified', 'consistent', 'adequate', 'sufficient', 'valid', 'authentic']
-    for keyword in positive_keywords:
-        if keyword in response_lower:
-            evidence = f"{agent_key.title()}: {keyword} documentation"
-            if evidence not in shared_context["supporting_evidence"]:
-                shared_context["supporting_evidence"].append(evidence)
-
-def build_context_summary(up_to_agent: str):
-    """Build summary of all previous agent findings for the next agent"""
-    agent_order = ["identity", "income", "guarantor", "inspection", "valuation"]
-    current_index = agent_order.index(up_to_agent)
+    # Identify risk factors and supporting evidence in one scan of the response
+    signals = get_signals(run, agent_key, response)
+    known_risks = set(shared_context["risk_factors"])
+    for keyword in signals.found(RISK_KEYWORDS):
+        risk_factor = f"{agent_key.title()}: {keyword} identified"
+        if risk_factor not in known_risks:
+            known_risks.add(risk_factor)
+            shared_context["risk_factors"].append(risk_factor)
     
-    context_summary = ""
-    for i in range(current_index):
-        agent_key = agent_order[i]
-        if agent_key in agent_results:
-            context_summary += f"\n{agent_key.upper()} AGENT FINDINGS:\n"
-            context_summary += f"{agent_results[agent_key]['summary']}\n"
-            context_summary += "-" * 50 + "\n"
-    
-    return context_summary
+    known_evidence = set(shared_context["supporting_evidence"])
+    for keyword in signals.found(POSITIVE_KEYWORDS):
+        evidence = f"{agent_key.title()}: {keyword} documentation"
+        if evidence not in known_evidence:
+            known_evidence.add(evidence)
+            shared_context["supporting_evidence"].append(evidence)
 
 # --- Summarize previous agent outputs and flag issues ---
-def summarize_previous_agents(up_to_agent: str):
+def summarize_previous_agents(run: VerificationRun, up_to_agent: str):
+    agent_results = run.agent_results
     agent_order = ["identity", "income", "guarantor", "inspection", "valuation"]
     current_index = agent_order.index(up_to_agent)
     summary_lines = []
@@ -549,9 +917,7 @@ def summarize_previous_agents(up_to_agent: str):
             res = agent_results[agent_key]
             status = res['status'].lower()
             # Look for risk/issue keywords in summary
-            summary_text = res['summary'].lower()
-            risk_keywords = ['discrepancy', 'inconsistent', 'missing', 'insufficient', 'concern', 'risk', 'issue', 'fail', 'no_response']
-            found_risk = any(kw in summary_text for kw in risk_keywords) or status != 'passed'
+            found_risk = get_signals(run, agent_key, res['summary']).any_of(ISSUE_KEYWORDS) or status != 'passed'
             if found_risk:
                 issue_found = True
             summary_lines.append(f"{agent_key.title()} Check: {res['status'].capitalize()} - {'Issue found' if found_risk else 'No major issues'}.")
@@ -564,9 +930,10 @@ def summarize_previous_agents(up_to_agent: str):
 class LoanVerificationPlugin:
     """A plugin for the Semantic Kernel containing functions for loan verification"""
     
-    def __init__(self, project_client, agents):
+    def __init__(self, project_client, agents, run: VerificationRun):
         self.project_client = project_client
         self.agents = agents
+        self.run = run
     
     @kernel_function(
         description="Verify the identity of the loan applicant",
@@ -580,7 +947,8 @@ class LoanVerificationPlugin:
             prompt = f"{prompt}\n\nPrevious context: {context}"
         
         agent_func = AzureProjectAgentFunction(
-            self.agents["Identity"].id, self.project_client, "Identity Check", "identity"
+            self.agents["Identity"].id, self.project_client, "Identity Check", "identity", self.run,
+            prompt_file="identity_verification_prompt.txt"
         )
         result = await agent_func.invoke(prompt)
         
@@ -598,7 +966,8 @@ class LoanVerificationPlugin:
             prompt = f"{prompt}\n\nIdentity verification context: {identity_context}"
         
         agent_func = AzureProjectAgentFunction(
-            self.agents["Income"].id, self.project_client, "Income Check", "income"
+            self.agents["Income"].id, self.project_client, "Income Check", "income", self.run,
+            prompt_file="income_verification_prompt.txt"
         )
         result = await agent_func.invoke(prompt)
         
@@ -616,7 +985,8 @@ class LoanVerificationPlugin:
             prompt = f"{prompt}\n\nPrevious verification context: {previous_context}"
         
         agent_func = AzureProjectAgentFunction(
-            self.agents["Guarantor"].id, self.project_client, "Guarantor Check", "guarantor"
+            self.agents["Guarantor"].id, self.project_client, "Guarantor Check", "guarantor", self.run,
+            prompt_file="guarantor_verification_prompt.txt"
         )
         result = await agent_func.invoke(prompt)
         
@@ -634,7 +1004,8 @@ class LoanVerificationPlugin:
             prompt = f"{prompt}\n\nPrevious verification findings: {verification_context}"
         
         agent_func = AzureProjectAgentFunction(
-            self.agents["Inspection"].id, self.project_client, "Collateral Inspection Check", "inspection"
+            self.agents["Inspection"].id, self.project_client, "Collateral Inspection Check", "inspection", self.run,
+            prompt_file="collateral_inspection_prompt.txt"
         )
         result = await agent_func.invoke(prompt)
         
@@ -652,7 +1023,8 @@ class LoanVerificationPlugin:
             prompt = f"{prompt}\n\nAll previous verification findings: {all_context}"
         
         agent_func = AzureProjectAgentFunction(
-            self.agents["Valuation"].id, self.project_client, "Valuation Check", "valuation"
+            self.agents["Valuation"].id, self.project_client, "Valuation Check", "valuation", self.run,
+            prompt_file="valuation_verification_prompt.txt"
         )
         result = await agent_func.invoke(prompt)
         
@@ -664,6 +1036,9 @@ class LoanVerificationPlugin:
     )
     async def generate_final_recommendation(self, all_results: str = "") -> str:
         """Generate final loan recommendation based on all verification results"""
+        agent_results = self.run.agent_results
+        shared_context = self.run.shared_context
+        customer_id = self.run.customer_id
         
         # Collect all agent results including underwriting and loan offer
         summary_parts = []
@@ -679,7 +1054,7 @@ class LoanVerificationPlugin:
                 
                 # Count issues (skip loan_offer from issue counting since it's dependent on previous results)
                 if agent_key != "loan_offer" and (result['status'] != 'passed' and result['status'] != 'completed' or 
-                    any(risk_word in result['summary'].lower() for risk_word in ['risk', 'issue', 'concern', 'discrepancy', 'missing', 'failed', 'error'])):
+                    get_signals(self.run, agent_key, result['summary']).any_of(RECOMMENDATION_RISK_KEYWORDS)):
                     total_issues += 1
         
         # Check underwriting decision for final recommendation
@@ -715,7 +1090,7 @@ class LoanVerificationPlugin:
         
         final_summary = {
             "applicant_name": shared_context.get("applicant_name", "Not identified"),
-            "customer_id": current_customer_id,
+            "customer_id": customer_id,
             "recommendation": recommendation,
             "total_issues": total_issues,
             "underwriting_approved": underwriting_approved,
@@ -735,28 +1110,27 @@ class LoanVerificationPlugin:
     )
     async def perform_underwriting(self, verification_context: str = "") -> str:
         """Perform underwriting analysis using all verification results"""
+        agent_results = self.run.agent_results
+        customer_id = self.run.customer_id
         print("\n🏦 Starting Underwriting Analysis...")
         
         try:
-            # Initialize underwriting agent database connection
-            underwriting_agent.initialize_database_connection()
-            
-            # Perform comprehensive underwriting analysis
-            underwriting_result = underwriting_agent.perform_underwriting_analysis(
-                customer_id=current_customer_id,
-                verification_results=agent_results
-            )
+            # Perform comprehensive underwriting analysis (blocking database work, off the event loop)
+            with stage_timer("underwriting", self.run, "Underwriting Analysis") as timing:
+                underwriting_result = await asyncio.to_thread(
+                    run_underwriting_analysis, customer_id, dict(agent_results)
+                )
             
             # Store underwriting result in agent_results for consistency
             agent_results["underwriting"] = {
                 "status": "completed",
                 "summary": f"Underwriting Decision: {underwriting_result['underwriting_decision']['decision']} (Risk Score: {underwriting_result['risk_assessment']['risk_score']}/100)",
                 "full_response": json.dumps(underwriting_result, indent=2),
-                "processing_time_ms": 0
+                "processing_time_ms": timing.ms
             }
             
             # Store to Cosmos DB with enhanced metadata
-            if current_customer_id:
+            if customer_id:
                 try:
                     # Enhanced metadata for underwriting analysis
                     enhanced_metadata = {
@@ -782,15 +1156,14 @@ class LoanVerificationPlugin:
                     }
                     
                     # Store regular agent result
-                    await cosmos_service.store_agent_result(
-                        current_customer_id,
+                    await cosmos_service.store_run_result(
+                        self.run,
                         "Underwriting Analysis",
                         agent_results["underwriting"],
-                        shared_context.get("applicant_name"),
                         enhanced_metadata
                     )
                     
-                    print(f"✅ Stored Underwriting Analysis for customer {current_customer_id}")
+                    print(f"✅ Stored Underwriting Analysis for customer {customer_id}")
                 except Exception as e:
                     print(f"⚠️ Failed to store underwriting result: {str(e)}")
             
@@ -831,10 +1204,6 @@ class LoanVerificationPlugin:
             agent_results["underwriting"] = fallback_result
             
             return json.dumps({"error": str(e), "status": "failed"})
-        
-        finally:
-            # Close underwriting agent database connection
-            underwriting_agent.close_connection()
     
     @kernel_function(
         description="Generate comprehensive loan offer based on all verification and underwriting results",
@@ -842,6 +1211,8 @@ class LoanVerificationPlugin:
     )
     async def generate_loan_offer_with_context(self, underwriting_context: str = "") -> str:
         """Generate final loan offer based on all verification and underwriting results"""
+        agent_results = self.run.agent_results
+        customer_id = self.run.customer_id
         print("\n💰 Starting Loan Offer Generation...")
         
         try:
@@ -862,7 +1233,7 @@ class LoanVerificationPlugin:
                     "full_response": json.dumps({
                         "offer_status": "REJECTED",
                         "reason": "Application did not pass underwriting requirements",
-                        "customer_id": current_customer_id
+                        "customer_id": customer_id
                     }),
                     "processing_time_ms": 0
                 }
@@ -873,39 +1244,39 @@ class LoanVerificationPlugin:
             print(f"✅ Underwriting approved - proceeding with loan offer generation")
             
             # Call the loan offer generation function
-            if LOAN_OFFER_AVAILABLE:
-                print("🔗 Using full loan offer generation system...")
-                loan_offer_result = generate_loan_offer(current_customer_id)
-            else:
-                print("🔗 Using fallback loan offer generation...")
-                loan_offer_result = generate_loan_offer(current_customer_id)
+            with stage_timer("loan_offer", self.run, "Loan Offer Generation") as timing:
+                if LOAN_OFFER_AVAILABLE:
+                    print("🔗 Using full loan offer generation system...")
+                else:
+                    print("🔗 Using fallback loan offer generation...")
+                # Blocking SQL / HTTP work, off the event loop
+                loan_offer_result = await asyncio.to_thread(generate_loan_offer, customer_id)
             
             if loan_offer_result:
                 offer_summary = {
                     "status": "completed",
-                    "summary": f"Loan offer generated successfully for customer {current_customer_id}",
+                    "summary": f"Loan offer generated successfully for customer {customer_id}",
                     "offer_details": {
-                        "customer_id": current_customer_id,
+                        "customer_id": customer_id,
                         "eligibility": loan_offer_result.get("eligibility", {}),
                         "loan_options": loan_offer_result.get("loan_options", []),
                         "final_rate": loan_offer_result.get("final_rate", 0),
                         "collateral_info": loan_offer_result.get("collateral_info", {}),
                         "offer_summary": loan_offer_result.get("offer_summary", "")
                     },
-                    "processing_time_ms": 0
+                    "processing_time_ms": timing.ms
                 }
                 
                 # Store loan offer result
                 agent_results["loan_offer"] = offer_summary
                 
                 # Store to Cosmos DB
-                if current_customer_id:
+                if customer_id:
                     try:
-                        await cosmos_service.store_agent_result(
-                            current_customer_id,
+                        await cosmos_service.store_run_result(
+                            self.run,
                             "Loan Offer Generation",
                             offer_summary,
-                            shared_context.get("applicant_name"),
                             {
                                 "offer_status": "APPROVED",
                                 "eligibility_status": loan_offer_result.get("eligibility", {}).get("eligible", False),
@@ -917,7 +1288,7 @@ class LoanVerificationPlugin:
                                 "generation_timestamp": datetime.now().isoformat()
                             }
                         )
-                        print(f"✅ Stored Loan Offer Generation result for customer {current_customer_id}")
+                        print(f"✅ Stored Loan Offer Generation result for customer {customer_id}")
                     except Exception as e:
                         print(f"⚠️ Failed to store loan offer result to Cosmos DB: {str(e)}")
                 
@@ -927,7 +1298,7 @@ class LoanVerificationPlugin:
             else:
                 error_result = {
                     "status": "error",
-                    "summary": f"Failed to generate loan offer for customer {current_customer_id}",
+                    "summary": f"Failed to generate loan offer for customer {customer_id}",
                     "full_response": "",
                     "processing_time_ms": 0
                 }
@@ -948,32 +1319,17 @@ class LoanVerificationPlugin:
             
             return json.dumps({"error": str(e), "status": "failed"})
 
-# --- Main async function with Semantic Kernel Orchestrator ---
-async def main():
-    # Get customer ID from user input
-    global current_customer_id
-    current_customer_id = await get_customer_id()
-    
-    # Initialize Cosmos DB first
-    print("\n🔧 Initializing Cosmos DB...")
-    cosmos_initialized = await cosmos_service.initialize()
-    if not cosmos_initialized:
-        print("⚠️ Continuing without Cosmos DB storage...")
+# --- Project client and agent setup ---
+def create_project_client():
+    """Azure AI Project client from configuration, shared through the warm client factory"""
+    return client_factory.get_project_client()
 
-    print(f"\n🎯 Starting verification process for Customer: {current_customer_id}")
-    print("=" * 60)
+def create_verification_agents(project_client):
+    """Create the five document verification agents against their search indexes"""
+    print(f"📚 Loaded {prompt_store.load_all()} prompt files")
     
-    creds = DefaultAzureCredential()
-    project_client = AIProjectClient(
-        endpoint=ENDPOINT,
-        resource_group_name=RESOURCE_GROUP,
-        subscription_id=SUBSCRIPTION_ID,
-        project_name=PROJECT_NAME,
-        credential=creds,
-    )
-
-    # Get Cognitive Search connection ID
-    conn_id = next(conn.id for conn in project_client.connections.list() if conn.connection_type == "CognitiveSearch")
+    # Cognitive Search connection ID (resolved once and cached by the client factory)
+    conn_id = client_factory.connection_id(project_client, "CognitiveSearch")
 
     # Create agents
     print("🔧 Creating agents...")
@@ -985,7 +1341,59 @@ async def main():
         "Valuation": create_valuation_agent(project_client, conn_id, VALUATION_INDEX),
     }
     print("✅ All agents created.")
+    return agents
 
+# --- Main async function with Semantic Kernel Orchestrator ---
+async def main(customer_id: str = None, run_id: str = None, resume: bool = None):
+    # Get customer ID from user input
+    customer_id = customer_id or await get_customer_id()
+    
+    # Warm the Azure clients in the background while Cosmos DB initializes
+    client_warmup = asyncio.create_task(asyncio.to_thread(client_factory.warm))
+
+    # Initialize Cosmos DB first
+    print("\n🔧 Initializing Cosmos DB...")
+    cosmos_initialized = await cosmos_service.initialize()
+    if not cosmos_initialized:
+        print("⚠️ Continuing without Cosmos DB storage...")
+    
+    # A new run, unless a run ID or resume asks to continue an unfinished one
+    run = await resume_or_create_run(customer_id, run_id, resume)
+
+    print(f"\n🎯 Starting verification process for Customer: {run.customer_id}")
+    print("=" * 60)
+    
+    await client_warmup
+    project_client = create_project_client()
+    agents = create_verification_agents(project_client)
+    start_metrics_server()
+
+    # Follow streamed agent output on the console while the pipeline runs
+    stream_printer = None
+    if AGENT_STREAMING_ENABLED:
+        stream_printer = asyncio.create_task(print_stream_events(run.events.subscribe()))
+
+    try:
+        with stage_timer("pipeline", run):
+            await run_verification_pipeline(run, project_client, agents, cosmos_initialized)
+    finally:
+        run.events.close()
+        if stream_printer:
+            await stream_printer
+
+    # Display final results
+    await display_final_results(run)
+
+    # Deliver queued emails, close Cosmos DB connection and release agent worker threads
+    await email_outbox.close()
+    await response_cache.close()
+    await cosmos_service.close()
+    shutdown_agent_executor()
+    client_factory.close()
+    print("✅ Process completed")
+
+async def run_verification_pipeline(run: VerificationRun, project_client, agents, cosmos_initialized: bool = True):
+    """Run the full verification, underwriting and offer pipeline for one customer run"""
     # Initialize Semantic Kernel with proper autonomous orchestration
     try:
         print("\n🔧 Initializing Semantic Kernel...")
@@ -1000,7 +1408,7 @@ async def main():
         kernel.add_service(ai_service)
         
         # Create and register the Loan Verification Plugin
-        loan_verification_plugin = LoanVerificationPlugin(project_client, agents)
+        loan_verification_plugin = LoanVerificationPlugin(project_client, agents, run)
         kernel.add_plugin(loan_verification_plugin, plugin_name="loan_verification")
         
         print("✅ Semantic Kernel initialized.")
@@ -1013,56 +1421,58 @@ async def main():
             # Get the plugin from kernel  
             loan_plugin = kernel.get_plugin("loan_verification")
             
-            # Execute functions in sequence with context passing
-            context = ""
-            
-            print("1️⃣ Identity Verification...")
-            identity_result = await kernel.invoke(loan_plugin["verify_identity"], context=context)
-            context += f"Identity Verification: {identity_result}\n\n"
-            print("✅ Identity completed\n")
-            
-            print("2️⃣ Income Verification...")
-            income_result = await kernel.invoke(loan_plugin["verify_income"], context=context)
-            context += f"Income Verification: {income_result}\n\n" 
-            print("✅ Income completed\n")
-            
-            print("3️⃣ Guarantor Verification...")
-            guarantor_result = await kernel.invoke(loan_plugin["verify_guarantor"], previous_context=context)
-            context += f"Guarantor Verification: {guarantor_result}\n\n"
-            print("✅ Guarantor completed\n")
-            
-            print("4️⃣ Collateral Inspection...")
-            inspection_result = await kernel.invoke(loan_plugin["inspect_collateral"], verification_context=context)
-            context += f"Inspection: {inspection_result}\n\n"
-            print("✅ Inspection completed\n")
-            
-            print("5️⃣ Property Valuation...")
-            valuation_result = await kernel.invoke(loan_plugin["verify_valuation"], all_context=context)
-            context += f"Valuation: {valuation_result}\n\n"
-            print("✅ Valuation completed\n")
-            
+            # Execute verification steps from the dependency graph; independent
+            # steps run concurrently and only receive their upstream context
+            print(f"🔀 Document Verification (critical path: {' → '.join(verification_graph.critical_path())})...")
+
+            # Later stages get token-budgeted fact digests, not the raw upstream responses
+            context_builder = ContextBuilder(run, verification_graph)
+
+            async def invoke_verification_step(step, step_context):
+                result = await kernel.invoke(loan_plugin[step.function_name], **{step.context_arg: step_context})
+                await checkpoints.save(run, step.key)
+                return result
+
+            # Steps restored from a checkpoint are not executed again
+            restored = completed_steps(run, verification_graph)
+            await verification_graph.run(
+                invoke_verification_step,
+                build_context=lambda step, _: context_builder.for_step(step),
+                run=run,
+                completed={
+                    key: json.dumps({"success": True, "response": result["full_response"]})
+                    for key, result in restored.items()
+                }
+            )
+
             # Send Stage 4 Email: Document Approval (All verifications completed)
             try:
-                print("📧 Sending Stage 4 Email: Document Approval...")
-                email_result = send_email_template(current_customer_id, "document_approval")
-                print(f"✅ Stage 4 email sent: {email_result.get('status', 'unknown')}")
+                print("📧 Queueing Stage 4 Email: Document Approval...")
+                email_result = await email_outbox.enqueue(run, "document_approval")
+                print(f"✅ Stage 4 email {email_result.get('status', 'unknown')}")
             except Exception as e:
                 print(f"⚠️ Failed to send Stage 4 email: {str(e)}")
             
             print("6️⃣ Underwriting Analysis...")
-            underwriting_result = await kernel.invoke(loan_plugin["perform_underwriting"], verification_context=context)
-            context += f"Underwriting: {underwriting_result}\n\n"
-            print("✅ Underwriting completed\n")
+            if is_reusable("underwriting", run.agent_results.get("underwriting")):
+                print("♻️  Underwriting restored from checkpoint\n")
+            else:
+                await kernel.invoke(
+                    loan_plugin["perform_underwriting"],
+                    verification_context=context_builder.summary("underwriting")
+                )
+                await checkpoints.save(run, "underwriting")
+                print("✅ Underwriting completed\n")
             
             # Send Stage 5 Email: Approval (Only if underwriting is approved)
             try:
                 # Check if underwriting was approved before sending approval email
-                if "underwriting" in agent_results:
-                    underwriting_summary = agent_results["underwriting"]["summary"].lower()
+                if "underwriting" in run.agent_results:
+                    underwriting_summary = run.agent_results["underwriting"]["summary"].lower()
                     if "approved" in underwriting_summary or "conditional" in underwriting_summary:
-                        print("📧 Sending Stage 5 Email: Loan Approval...")
-                        email_result = send_email_template(current_customer_id, "approval")
-                        print(f"✅ Stage 5 email sent: {email_result.get('status', 'unknown')}")
+                        print("📧 Queueing Stage 5 Email: Loan Approval...")
+                        email_result = await email_outbox.enqueue(run, "approval")
+                        print(f"✅ Stage 5 email {email_result.get('status', 'unknown')}")
                     else:
                         print("⚠️ Stage 5 email not sent - underwriting not approved")
                 else:
@@ -1071,19 +1481,25 @@ async def main():
                 print(f"⚠️ Failed to send Stage 5 email: {str(e)}")
             
             print("7️⃣ Loan Offer Generation...")
-            loan_offer_result = await kernel.invoke(loan_plugin["generate_loan_offer_with_context"], underwriting_context=context)
-            context += f"Loan Offer: {loan_offer_result}\n\n"
-            print("✅ Loan Offer Generation completed\n")
+            if is_reusable("loan_offer", run.agent_results.get("loan_offer")):
+                print("♻️  Loan offer restored from checkpoint\n")
+            else:
+                await kernel.invoke(
+                    loan_plugin["generate_loan_offer_with_context"],
+                    underwriting_context=context_builder.summary("loan_offer")
+                )
+                await checkpoints.save(run, "loan_offer")
+                print("✅ Loan Offer Generation completed\n")
             
             # Send Stage 6 Email: Loan Application Number (Only if loan offer was generated successfully)
             try:
                 # Check if loan offer was generated successfully before sending final email
-                if "loan_offer" in agent_results:
-                    loan_offer_status = agent_results["loan_offer"]["status"].lower()
-                    if "completed" in loan_offer_status and "generated successfully" in agent_results["loan_offer"]["summary"].lower():
-                        print("📧 Sending Stage 6 Email: Loan Application Number...")
-                        email_result = send_email_template(current_customer_id, "loan_application_number")
-                        print(f"✅ Stage 6 email sent: {email_result.get('status', 'unknown')}")
+                if "loan_offer" in run.agent_results:
+                    loan_offer_status = run.agent_results["loan_offer"]["status"].lower()
+                    if "completed" in loan_offer_status and "generated successfully" in run.agent_results["loan_offer"]["summary"].lower():
+                        print("📧 Queueing Stage 6 Email: Loan Application Number...")
+                        email_result = await email_outbox.enqueue(run, "loan_application_number")
+                        print(f"✅ Stage 6 email {email_result.get('status', 'unknown')}")
                     else:
                         print("⚠️ Stage 6 email not sent - loan offer not generated successfully")
                 else:
@@ -1092,24 +1508,30 @@ async def main():
                 print(f"⚠️ Failed to send Stage 6 email: {str(e)}")
             
             print("8️⃣ Final Recommendation...")
-            final_result = await kernel.invoke(loan_plugin["generate_final_recommendation"], all_results=context)
+            final_result = await kernel.invoke(
+                loan_plugin["generate_final_recommendation"],
+                all_results=context_builder.summary("final_recommendation")
+            )
             print("✅ Recommendation completed")
+            try:
+                run.final_recommendation = json.loads(str(final_result))
+            except json.JSONDecodeError:
+                run.final_recommendation = None
             
             
             # Store final recommendation to Cosmos DB
-            if cosmos_initialized and current_customer_id:
+            if cosmos_initialized and run.customer_id:
                 try:
                     final_recommendation_data = json.loads(str(final_result))
-                    await cosmos_service.store_final_recommendation(
-                        current_customer_id,
-                        final_recommendation_data,
-                        agent_results,
-                        shared_context
-                    )
-                    print(f"✅ Final recommendation stored to Cosmos DB for customer {current_customer_id}")
+                    await cosmos_service.store_final_recommendation(run, final_recommendation_data)
+                    print(f"✅ Final recommendation stored to Cosmos DB for customer {run.customer_id}")
                 except Exception as e:
                     print(f"⚠️ Failed to store final recommendation to Cosmos DB: {str(e)}")
             
+            # A run with failed verification steps stays resumable; a restart
+            # re-executes only those steps
+            if len(completed_steps(run, verification_graph)) == len(verification_graph.steps):
+                await checkpoints.complete(run)
             
             print("\n✅ Autonomous orchestration completed!")
             print(f"\n📋 FINAL RECOMMENDATION:")
@@ -1180,155 +1602,146 @@ async def main():
         except Exception as e:
             print(f"❌ Error: {str(e)}")
             print("🔄 Fallback to legacy processing...")
-            await legacy_sequential_processing(agents, project_client)
+            await legacy_sequential_processing(run, agents, project_client)
             
     except Exception as e:
         print(f"❌ Kernel setup error: {str(e)}")
         print("🔄 Fallback to legacy processing...")
-        await legacy_sequential_processing(agents, project_client)
-
-    # Display final results
-    await display_final_results()
+        await legacy_sequential_processing(run, agents, project_client)
 
-    # Close Cosmos DB connection
-    await cosmos_service.close()
-    print("✅ Process completed")
 
-async def legacy_sequential_processing(agents, project_client):
+async def legacy_sequential_processing(run: VerificationRun, agents, project_client):
     """Legacy sequential processing as final fallback"""
     print("\n🔄 LEGACY PROCESSING")
     
-    # Execute agents sequentially with context
-    success, _ = await run_agent_check_with_context(
-        agents["Identity"],
-        load_instruction_from_file("identity_verification_prompt.txt"), 
-        "Identity Check", "identity", project_client
+    # Execute agents one at a time along the verification graph, passing each
+    # agent only the declared findings of the steps it depends on
+    context_builder = ContextBuilder(run, verification_graph)
+
+    async def invoke_legacy_step(step, step_context):
+        result = await run_agent_check_with_context(
+            run,
+            agents[step.agent],
+            load_instruction_from_file(step.prompt_file),
+            step.name, step.key, project_client, step_context,
+            prompt_file=step.prompt_file
+        )
+        await checkpoints.save(run, step.key)
+        return result
+    
+    # Steps that already passed (restored, or finished before the pipeline failed) are reused
+    outputs = await verification_graph.run(
+        invoke_legacy_step,
+        max_concurrency=1,
+        is_success=lambda result: result[0],
+        build_context=lambda step, _: context_builder.for_step(step),
+        run=run,
+        completed={
+            key: (True, result["full_response"])
+            for key, result in completed_steps(run, verification_graph).items()
+        }
     )
+    success = len(outputs) == len(verification_graph.steps) and all(ok for ok, _ in outputs.values())
     
     if success:
-        context = build_context_summary("income")
-        success, _ = await run_agent_check_with_context(
-            agents["Income"],
-            load_instruction_from_file("income_verification_prompt.txt"),
-            "Income Check", "income", project_client, context
-        )
+        # Send Stage 4 Email: Document Approval (All verifications completed)
+        try:
+            print("📧 Queueing Stage 4 Email: Document Approval...")
+            email_result = await email_outbox.enqueue(run, "document_approval")
+            print(f"✅ Stage 4 email {email_result.get('status', 'unknown')}")
+        except Exception as e:
+            print(f"⚠️ Failed to send Stage 4 email: {str(e)}")
         
-        if success:
-            context = build_context_summary("guarantor")
-            success, _ = await run_agent_check_with_context(
-                agents["Guarantor"],
-                load_instruction_from_file("guarantor_verification_prompt.txt"),
-                "Guarantor Check", "guarantor", project_client, context
-            )
+        # Perform underwriting analysis
+        print("\n🏦 Performing Underwriting Analysis...")
+        if is_reusable("underwriting", run.agent_results.get("underwriting")):
+            print("♻️  Underwriting restored from checkpoint")
+        else:
+            try:
+                # Blocking database work runs in a thread with its own connection
+                with stage_timer("underwriting", run, "Underwriting Analysis") as timing:
+                    underwriting_result = await asyncio.to_thread(
+                        run_underwriting_analysis, run.customer_id, dict(run.agent_results)
+                    )
             
-            if success:
-                context = build_context_summary("inspection")
-                success, _ = await run_agent_check_with_context(
-                    agents["Inspection"],
-                    "You are an expert in property inspection for loan applications. Review the provided inspection video or images and assess whether the house is maintained well or not. Focus on the overall maintenance status, structural condition, and any visible damages or deterioration.",
-                    "Collateral Inspection Check", "inspection", project_client, context
-                )
+                run.agent_results["underwriting"] = {
+                    "status": "completed",
+                    "summary": f"Underwriting Decision: {underwriting_result['underwriting_decision']['decision']}",
+                    "full_response": json.dumps(underwriting_result, indent=2),
+                    "processing_time_ms": timing.ms
+                }
+            
+                print(f"✅ Underwriting Complete: {underwriting_result['underwriting_decision']['decision']}")
+            
+                # Send Stage 5 Email: Approval (Only if underwriting is approved)
+                try:
+                    underwriting_summary = run.agent_results["underwriting"]["summary"].lower()
+                    if "approved" in underwriting_summary or "conditional" in underwriting_summary:
+                        print("📧 Queueing Stage 5 Email: Loan Approval...")
+                        email_result = await email_outbox.enqueue(run, "approval")
+                        print(f"✅ Stage 5 email {email_result.get('status', 'unknown')}")
+                    else:
+                        print("⚠️ Stage 5 email not sent - underwriting not approved")
+                except Exception as e:
+                    print(f"⚠️ Failed to send Stage 5 email: {str(e)}")
+            
+            except Exception as e:
+                print(f"⚠️ Underwriting failed: {str(e)}")
+                run.agent_results["underwriting"] = {
+                    "status": "error",
+                    "summary": f"Underwriting failed: {str(e)}",
+                    "full_response": "",
+                    "processing_time_ms": 0
+                }
+            await checkpoints.save(run, "underwriting")
+        
+        # Generate loan offer (if underwriting approved)
+        if is_reusable("loan_offer", run.agent_results.get("loan_offer")):
+            print("♻️  Loan offer restored from checkpoint")
+        elif "underwriting" in run.agent_results and "approved" in run.agent_results["underwriting"]["summary"].lower():
+            try:
+                print("\n💰 Generating Loan Offer...")
+                with stage_timer("loan_offer", run, "Loan Offer Generation") as timing:
+                    # Full or fallback generator; blocking SQL / HTTP work, off the event loop
+                    loan_offer_result = await asyncio.to_thread(generate_loan_offer, run.customer_id)
                 
-                if success:
-                    context = build_context_summary("valuation")
-                    success, _ = await run_agent_check_with_context(
-                        agents["Valuation"],
-                        "You are an expert in property valuation for loan applications. Analyze the sale deed and any supporting documents. Estimate the property's market value using an 11% annual appreciation from the last sale year. Consider the applicant's income, inspection findings, and overall risk profile when providing your valuation assessment.",
-                        "Valuation Check", "valuation", project_client, context
-                    )
+                if loan_offer_result:
+                    run.agent_results["loan_offer"] = {
+                        "status": "completed",
+                        "summary": f"Loan offer generated successfully for customer {run.customer_id}",
+                        "offer_details": loan_offer_result,
+                        "processing_time_ms": timing.ms
+                    }
+                    await checkpoints.save(run, "loan_offer")
                     
-                    if success:
-                        # Send Stage 4 Email: Document Approval (All verifications completed)
-                        try:
-                            print("📧 Sending Stage 4 Email: Document Approval...")
-                            email_result = send_email_template(current_customer_id, "document_approval")
-                            print(f"✅ Stage 4 email sent: {email_result.get('status', 'unknown')}")
-                        except Exception as e:
-                            print(f"⚠️ Failed to send Stage 4 email: {str(e)}")
-                        
-                        # Perform underwriting analysis
-                        print("\n🏦 Performing Underwriting Analysis...")
-                        try:
-                            underwriting_agent.initialize_database_connection()
-                            underwriting_result = underwriting_agent.perform_underwriting_analysis(
-                                customer_id=current_customer_id,
-                                verification_results=agent_results
-                            )
-                            
-                            agent_results["underwriting"] = {
-                                "status": "completed",
-                                "summary": f"Underwriting Decision: {underwriting_result['underwriting_decision']['decision']}",
-                                "full_response": json.dumps(underwriting_result, indent=2),
-                                "processing_time_ms": 0
-                            }
-                            
-                            print(f"✅ Underwriting Complete: {underwriting_result['underwriting_decision']['decision']}")
-                            
-                            # Send Stage 5 Email: Approval (Only if underwriting is approved)
-                            try:
-                                underwriting_summary = agent_results["underwriting"]["summary"].lower()
-                                if "approved" in underwriting_summary or "conditional" in underwriting_summary:
-                                    print("📧 Sending Stage 5 Email: Loan Approval...")
-                                    email_result = send_email_template(current_customer_id, "approval")
-                                    print(f"✅ Stage 5 email sent: {email_result.get('status', 'unknown')}")
-                                else:
-                                    print("⚠️ Stage 5 email not sent - underwriting not approved")
-                            except Exception as e:
-                                print(f"⚠️ Failed to send Stage 5 email: {str(e)}")
-                            
-                        except Exception as e:
-                            print(f"⚠️ Underwriting failed: {str(e)}")
-                            agent_results["underwriting"] = {
-                                "status": "error",
-                                "summary": f"Underwriting failed: {str(e)}",
-                                "full_response": "",
-                                "processing_time_ms": 0
-                            }
-                        finally:
-                            underwriting_agent.close_connection()
-                        
-                        # Generate loan offer (if underwriting approved)
-                        if "underwriting" in agent_results and "approved" in agent_results["underwriting"]["summary"].lower():
-                            try:
-                                print("\n💰 Generating Loan Offer...")
-                                if LOAN_OFFER_AVAILABLE:
-                                    loan_offer_result = generate_loan_offer(current_customer_id)
-                                else:
-                                    loan_offer_result = generate_loan_offer(current_customer_id)  # Fallback
-                                
-                                if loan_offer_result:
-                                    agent_results["loan_offer"] = {
-                                        "status": "completed",
-                                        "summary": f"Loan offer generated successfully for customer {current_customer_id}",
-                                        "offer_details": loan_offer_result,
-                                        "processing_time_ms": 0
-                                    }
-                                    
-                                    # Send Stage 6 Email: Loan Application Number
-                                    try:
-                                        print("📧 Sending Stage 6 Email: Loan Application Number...")
-                                        email_result = send_email_template(current_customer_id, "loan_application_number")
-                                        print(f"✅ Stage 6 email sent: {email_result.get('status', 'unknown')}")
-                                    except Exception as e:
-                                        print(f"⚠️ Failed to send Stage 6 email: {str(e)}")
-                                        
-                                    print(f"✅ Loan Offer Generated Successfully!")
-                                else:
-                                    print("⚠️ Loan offer generation failed")
-                                    
-                            except Exception as e:
-                                print(f"⚠️ Loan offer generation failed: {str(e)}")
+                    # Send Stage 6 Email: Loan Application Number
+                    try:
+                        print("📧 Queueing Stage 6 Email: Loan Application Number...")
+                        email_result = await email_outbox.enqueue(run, "loan_application_number")
+                        print(f"✅ Stage 6 email {email_result.get('status', 'unknown')}")
+                    except Exception as e:
+                        print(f"⚠️ Failed to send Stage 6 email: {str(e)}")
                         
-                        print("\n✅ Legacy processing completed!")
+                    print(f"✅ Loan Offer Generated Successfully!")
+                else:
+                    print("⚠️ Loan offer generation failed")
+                    
+            except Exception as e:
+                print(f"⚠️ Loan offer generation failed: {str(e)}")
+        
+        await checkpoints.complete(run)
+        print("\n✅ Legacy processing completed!")
 
-async def display_final_results():
-    """Display comprehensive final results"""
+async def display_final_results(run: VerificationRun):
+    """Display comprehensive final results for a verification run"""
+    agent_results = run.agent_results
+    shared_context = run.shared_context
     print("\n" + "=" * 70)
     print("📊 COMPREHENSIVE FINAL RESULTS")
     print("=" * 70)
     
-    if current_customer_id:
-        print(f"\n🆔 Customer ID: {current_customer_id}")
+    if run.customer_id:
+        print(f"\n🆔 Customer ID: {run.customer_id}")
     
     # Agent results summary
     print("\n📋 VERIFICATION SUMMARY")
@@ -1407,6 +1820,14 @@ async def display_final_results():
         print(f"Name: {shared_context['applicant_name']}")
         print(f"Risk Score: {total_risks}/10")
         print(f"Evidence Score: {total_evidence}/10")
+    
+    if run.stage_timings:
+        print(f"\n⏱️ STAGE TIMINGS")
+        print("-" * 40)
+        for stage, timing in sorted(run.stage_timings.items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"{stage}: {timing['total_ms'] / 1000:.2f}s ({timing['count']}x)")
+        for agent_name, usage in run.token_usage.items():
+            print(f"🔢 {agent_name}: {usage.get('prompt_tokens', 0)} prompt / {usage.get('completion_tokens', 0)} completion tokens")
 
 # --- Utility function to retrieve customer data from Cosmos DB ---
 async def retrieve_customer_data(customer_id: str):
@@ -1418,7 +1839,7 @@ async def retrieve_customer_data(customer_id: str):
         print("❌ Could not connect to Cosmos DB")
         return
     
-    results = await cosmos_service.get_customer_results(customer_id)
+    results = await cosmos_service.get_customer_results(customer_id, fields=CosmosDBService.SUMMARY_FIELDS)
     
     if not results:
         print("❌ No data found for this customer")
@@ -1450,6 +1871,24 @@ async def retrieve_customer_data(customer_id: str):
     await cosmos_service.close()
     return results
 
+def validate_customer_id(customer_id: str) -> str:
+    """Return an error message for a malformed customer ID, or an empty string if valid"""
+    if not customer_id:
+        return "Customer ID cannot be empty. Please try again."
+    
+    if len(customer_id) < 4:
+        return "Customer ID too short. Please use format CUSTXXXX."
+    
+    if not customer_id.startswith("CUST"):
+        return "Customer ID must start with 'CUST'. Please use format CUSTXXXX."
+    
+    # Validate the numeric part
+    numeric_part = customer_id[4:]
+    if not numeric_part.isdigit():
+        return "Customer ID must end with numbers. Please use format CUSTXXXX."
+    
+    return ""
+
 async def get_customer_id():
     """Get customer ID from user input"""
     print("🏦 LOAN VERIFICATION SYSTEM")
@@ -1460,22 +1899,9 @@ async def get_customer_id():
     while True:
         customer_id = input("\n🆔 Please enter Customer ID (format: CUSTXXXX, e.g., CUST1234): ").strip().upper()
         
-        if not customer_id:
-            print("❌ Customer ID cannot be empty. Please try again.")
-            continue
-        
-        if len(customer_id) < 4:
-            print("❌ Customer ID too short. Please use format CUSTXXXX.")
-            continue
-            
-        if not customer_id.startswith("CUST"):
-            print("❌ Customer ID must start with 'CUST'. Please use format CUSTXXXX.")
-            continue
-        
-        # Validate the numeric part
-        numeric_part = customer_id[4:]
-        if not numeric_part.isdigit():
-            print("❌ Customer ID must end with numbers. Please use format CUSTXXXX.")
+        error = validate_customer_id(customer_id)
+        if error:
+            print(f"❌ {error}")
             continue
         
         # Confirm with user
@@ -1505,11 +1931,17 @@ if __name__ == "__main__":
                     asyncio.run(retrieve_customer_data(customer_id))
                 else:
                     print("❌ No Customer ID provided. Exiting.")
+        elif sys.argv[1] == "resume" and len(sys.argv) > 2:
+            # Resume a specific run, or the customer's latest unfinished one
+            run_id = sys.argv[3] if len(sys.argv) > 3 else None
+            asyncio.run(main(sys.argv[2].upper(), run_id, resume=True))
         else:
             print("Usage:")
             print("  python integrated_try.py                     - Run main agent workflow")
             print("  python integrated_try.py retrieve            - Retrieve customer data (interactive)")
             print("  python integrated_try.py retrieve CUST5410   - Retrieve specific customer data")
+            print("  python integrated_try.py resume CUST5410 [RUN_ID] - Resume an unfinished run from its checkpoint")
+            print("  python orch_batch.py customer_ids.txt        - Verify many customers in one process")
     else:
         # Run main workflow
         asyncio.run(main())
\ No newline at end of file
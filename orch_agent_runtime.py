@@ -0,0 +1,390 @@
+"""
+Non-blocking execution helpers for Azure AI Project agent calls.
+
+The synchronous AIProjectClient is driven through a bounded thread pool so
+that agent runs never block the event loop; an async client
+(azure.ai.projects.aio) is awaited directly. Run completion is detected by
+polling the run status with exponential backoff instead of the blocking
+create_and_process_run helper. stream_agent_run streams a run instead, pumping
+the synchronous SDK stream from a pool thread into the event loop.
+
+Agent runs are admitted through the model deployment's adaptive rate limiter
+(orch_ratelimit), which shrinks the number of concurrent runs when Azure
+OpenAI answers 429/503 and grows it again while runs succeed.
+
+A run whose agent no longer exists in the project (404) has the agent
+re-verified and recreated through the agent registry; execute_agent_run then
+retries once with the replacement.
+"""
+
+import asyncio
+import contextvars
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from azure.ai.projects.models import MessageRole
+
+from orch_config import (
+    AGENT_THREAD_POOL_SIZE,
+    AGENT_POLL_INITIAL_DELAY,
+    AGENT_POLL_MAX_DELAY,
+    AGENT_POLL_BACKOFF,
+    AGENT_RUN_TIMEOUT,
+    METRICS_TOOL_TIMING,
+    AGENT_MODEL_DEPLOYMENT,
+    RATE_LIMIT_MAX_RETRIES,
+)
+from agents.registry import current_agent_id, is_agent_not_found, recover_agent
+from orch_metrics import record_stage, record_token_usage, stage_timer
+from orch_ratelimit import get_limiter, throttle_signal, run_throttle_signal, backoff_delay
+
+# Run states after which polling stops
+TERMINAL_RUN_STATUSES = {"completed", "failed", "cancelled", "expired", "requires_action"}
+# Status given to a run that exceeded its timeout (not a service status)
+TIMED_OUT = "timed_out"
+# Final states in which the agent produced no usable answer. The verification
+# agents have no function tools, so a run asking for tool outputs is cancelled
+# and counts as failed
+FAILED_RUN_STATUSES = {"failed", "cancelled", "expired", "requires_action", TIMED_OUT}
+
+_executor = None
+
+
+def get_agent_executor() -> ThreadPoolExecutor:
+    """Return the process-wide bounded pool used for synchronous SDK calls"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=AGENT_THREAD_POOL_SIZE,
+            thread_name_prefix="azure-agent"
+        )
+    return _executor
+
+
+def shutdown_agent_executor(wait: bool = True):
+    """Shut down the shared thread pool (safe to call more than once)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+async def call_agent_api(func, *args, **kwargs):
+    """Call an SDK method without blocking the event loop
+
+    Coroutine functions (async project client) are awaited directly; plain
+    functions run on the bounded agent thread pool, in a copy of the caller's
+    context like asyncio.to_thread.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    result = await loop.run_in_executor(get_agent_executor(), partial(context.run, func, *args, **kwargs))
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def run_status(run) -> str:
+    """Normalise a run's RunStatus enum or string to a lowercase string"""
+    return str(getattr(run.status, "value", run.status)).lower()
+
+
+class FinalRun:
+    """A run whose final status was decided by the orchestrator, not reported by the service"""
+
+    def __init__(self, run, status: str):
+        self._run = run
+        self.status = status
+
+    def __getattr__(self, name):
+        return getattr(self._run, name)
+
+
+async def cancel_run(project_client, thread_id: str, run):
+    """Cancel a run so it does not stay active on its thread; failures are logged, not raised"""
+    try:
+        await call_agent_api(project_client.agents.cancel_run, thread_id=thread_id, run_id=run.id)
+    except Exception as e:
+        print(f"⚠️ Failed to cancel run {run.id}: {str(e)}")
+
+
+async def wait_for_run(project_client, thread_id: str, run,
+                       initial_delay: float = None, max_delay: float = None,
+                       backoff: float = None, timeout: float = None):
+    """Poll a run until it reaches a terminal status, backing off between polls
+
+    A run that exceeds the timeout is cancelled and returned with status
+    TIMED_OUT, whatever the service reports for it (typically "cancelling").
+    A run stopped at requires_action is cancelled as well.
+    """
+    delay = initial_delay if initial_delay is not None else AGENT_POLL_INITIAL_DELAY
+    max_delay = max_delay if max_delay is not None else AGENT_POLL_MAX_DELAY
+    backoff = backoff if backoff is not None else AGENT_POLL_BACKOFF
+    timeout = timeout if timeout is not None else AGENT_RUN_TIMEOUT
+
+    deadline = time.monotonic() + timeout
+    while run_status(run) not in TERMINAL_RUN_STATUSES:
+        if time.monotonic() >= deadline:
+            print(f"⏱️ Run {run.id} exceeded {timeout:.0f}s - cancelling")
+            await cancel_run(project_client, thread_id, run)
+            return FinalRun(run, TIMED_OUT)
+
+        await asyncio.sleep(delay)
+        delay = min(delay * backoff, max_delay)
+        run = await call_agent_api(
+            project_client.agents.get_run, thread_id=thread_id, run_id=run.id
+        )
+
+    if run_status(run) == "requires_action":
+        print(f"⚠️ Run {run.id} requested tool outputs - cancelling")
+        await cancel_run(project_client, thread_id, run)
+    return run
+
+
+async def execute_agent_run(project_client, agent_id: str, prompt: str,
+                            verification_run=None, agent_name: str = "", deployment: str = None,
+                            **poll_options):
+    """Create a thread, post the prompt, start a run and wait for it to finish
+
+    Returns (thread, run). Thread creation, rate limiter wait, run start and
+    polling are timed as pipeline stages of verification_run. A run rejected
+    with 429/503, or failing with rate_limit_exceeded, is retried on the same
+    thread after the service's Retry-After (or a backoff). A run whose agent
+    was not found is retried once with the agent recovered by the registry.
+    """
+    agent_id = current_agent_id(agent_id)
+    with stage_timer("thread_create", verification_run, agent_name):
+        thread = await call_agent_api(project_client.agents.create_thread)
+        await call_agent_api(
+            project_client.agents.create_message,
+            thread_id=thread.id,
+            role=MessageRole.USER,
+            content=prompt
+        )
+
+    limiter = get_limiter(deployment or AGENT_MODEL_DEPLOYMENT)
+    attempt = 0
+    recovered = False
+    while True:
+        attempt += 1
+        wait_start = time.perf_counter()
+        async with limiter.slot() as slot:
+            record_stage(verification_run, "rate_limit_wait", time.perf_counter() - wait_start, agent_name)
+            try:
+                with stage_timer("run_start", verification_run, agent_name):
+                    run = await call_agent_api(
+                        project_client.agents.create_run,
+                        thread_id=thread.id,
+                        agent_id=agent_id
+                    )
+            except Exception as e:
+                signal = throttle_signal(e)
+                if signal is None and not recovered and is_agent_not_found(e):
+                    recovered = True
+                    replacement = await call_agent_api(recover_agent, agent_id)
+                    if replacement:
+                        print(f"🔁 {agent_name or agent_id} retrying with recreated agent {replacement}")
+                        agent_id = replacement
+                        attempt -= 1
+                        continue
+                if signal is None or attempt > RATE_LIMIT_MAX_RETRIES:
+                    raise
+            else:
+                with stage_timer("run_poll", verification_run, agent_name):
+                    run = await wait_for_run(project_client, thread.id, run, **poll_options)
+                signal = run_throttle_signal(run)
+                if signal is None:
+                    return thread, run
+                if attempt > RATE_LIMIT_MAX_RETRIES:
+                    slot.throttled(*signal)
+                    return thread, run
+            slot.throttled(*signal)
+
+        delay = backoff_delay(attempt, signal[1])
+        print(f"🔁 {agent_name or agent_id} rate limited (HTTP {signal[0]}), "
+              f"retry {attempt}/{RATE_LIMIT_MAX_RETRIES} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _seconds_between(start, end) -> float:
+    """Seconds between two run step timestamps (datetimes or epoch seconds)"""
+    if hasattr(start, "timestamp"):
+        start = start.timestamp()
+    if hasattr(end, "timestamp"):
+        end = end.timestamp()
+    return max(0.0, float(end) - float(start))
+
+
+async def collect_run_metrics(project_client, thread_id: str, run, verification_run=None, agent_name: str = ""):
+    """Record token usage and search tool time of a finished run
+
+    Tool time is the summed duration of the run's tool_calls steps and needs
+    one extra list_run_steps call (METRICS_TOOL_TIMING). Never raises.
+    """
+    try:
+        record_token_usage(verification_run, agent_name, getattr(run, "usage", None))
+        if not METRICS_TOOL_TIMING:
+            return
+        steps = await call_agent_api(project_client.agents.list_run_steps, thread_id=thread_id, run_id=run.id)
+        tool_seconds = 0.0
+        for step in getattr(steps, "data", None) or []:
+            step_type = str(getattr(step.type, "value", step.type)).lower()
+            if step_type == "tool_calls" and step.created_at and step.completed_at:
+                tool_seconds += _seconds_between(step.created_at, step.completed_at)
+        record_stage(verification_run, "agent_tool", tool_seconds, agent_name)
+    except Exception as e:
+        print(f"⚠️ Could not collect run metrics for {agent_name or run.id}: {str(e)}")
+
+
+async def get_last_agent_message(project_client, thread_id: str):
+    """Fetch the latest agent message of a thread without blocking"""
+    messages = await call_agent_api(project_client.agents.list_messages, thread_id=thread_id)
+    return messages.get_last_message_by_role(MessageRole.AGENT)
+
+
+def _event_name(event_type) -> str:
+    return str(getattr(event_type, "value", event_type))
+
+
+def _delta_text(delta) -> str:
+    """Text carried by a MessageDeltaChunk"""
+    text = getattr(delta, "text", None)
+    if isinstance(text, str):
+        return text
+    parts = []
+    for content in getattr(getattr(delta, "delta", None), "content", None) or []:
+        value = getattr(getattr(content, "text", None), "value", None)
+        if value:
+            parts.append(value)
+    return "".join(parts)
+
+
+def _message_text(message) -> str:
+    """Text of a completed ThreadMessage"""
+    return "\n".join(msg.text.value for msg in getattr(message, "text_messages", None) or [])
+
+
+def _normalize_stream_event(event_type, data):
+    """Map an SDK stream event to a (kind, payload) tuple, or None to ignore it"""
+    name = _event_name(event_type)
+    if name == "thread.message.delta":
+        text = _delta_text(data)
+        return ("delta", text) if text else None
+    if name == "thread.message.completed":
+        return "message", _message_text(data)
+    if name.startswith("thread.run."):
+        return "status", data
+    if name == "error":
+        return "error", str(data)
+    return None
+
+
+async def stream_agent_run(project_client, agent_id: str, prompt: str, timeout: float = None,
+                           verification_run=None, agent_name: str = "", deployment: str = None):
+    """Create a thread, post the prompt and stream the agent's run
+
+    Yields (kind, payload) tuples as they arrive:
+    ("thread", thread), ("delta", text), ("message", text), ("status", run)
+    and ("error", message). A run that exceeds the timeout is cancelled.
+    The stream holds a slot of the deployment's rate limiter; throttled
+    streams shrink its window but are not retried, since output has
+    already been yielded.
+    """
+    timeout = timeout if timeout is not None else AGENT_RUN_TIMEOUT
+    agent_id = current_agent_id(agent_id)
+    with stage_timer("thread_create", verification_run, agent_name):
+        thread = await call_agent_api(project_client.agents.create_thread)
+        await call_agent_api(
+            project_client.agents.create_message,
+            thread_id=thread.id,
+            role=MessageRole.USER,
+            content=prompt
+        )
+    yield "thread", thread
+
+    wait_start = time.perf_counter()
+    async with get_limiter(deployment or AGENT_MODEL_DEPLOYMENT).slot() as slot:
+        record_stage(verification_run, "rate_limit_wait", time.perf_counter() - wait_start, agent_name)
+        async for event in _stream_run_events(project_client, thread, agent_id, timeout, slot):
+            yield event
+
+
+async def _stream_run_events(project_client, thread, agent_id: str, timeout: float, slot):
+    """Events of one streamed run; marks the limiter slot throttled when the service pushed back"""
+    create_stream = project_client.agents.create_stream
+    if inspect.iscoroutinefunction(create_stream):
+        # Async project client streams natively
+        last_run = None
+        try:
+            async with await create_stream(thread_id=thread.id, agent_id=agent_id) as stream:
+                async for event_type, data, _ in stream:
+                    event = _normalize_stream_event(event_type, data)
+                    if event:
+                        signal = None
+                        if event[0] == "status":
+                            last_run = event[1]
+                            signal = run_throttle_signal(last_run)
+                        if signal:
+                            slot.throttled(*signal)
+                        yield event
+        except Exception as e:
+            signal = throttle_signal(e)
+            if signal:
+                slot.throttled(*signal)
+            elif is_agent_not_found(e):
+                # Streamed runs are not retried; the next call uses the recreated agent
+                await call_agent_api(recover_agent, agent_id)
+            raise
+        if last_run is not None and run_status(last_run) == "requires_action":
+            await cancel_run(project_client, thread.id, last_run)
+        return
+
+    # The sync SDK stream blocks while iterating, so drain it on the agent
+    # thread pool and hand events to the loop through a queue
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def pump():
+        try:
+            with create_stream(thread_id=thread.id, agent_id=agent_id) as stream:
+                for event_type, data, _ in stream:
+                    event = _normalize_stream_event(event_type, data)
+                    if event:
+                        loop.call_soon_threadsafe(queue.put_nowait, event)
+        except Exception as e:
+            signal = throttle_signal(e)
+            if signal:
+                slot.throttled(*signal)
+            elif is_agent_not_found(e):
+                recover_agent(agent_id)
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", str(e)))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(get_agent_executor(), contextvars.copy_context().run, pump)
+    deadline = time.monotonic() + timeout
+    last_run = None
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            if last_run is not None:
+                print(f"⏱️ Run {last_run.id} exceeded {timeout:.0f}s - cancelling")
+                await cancel_run(project_client, thread.id, last_run)
+            yield "error", f"Run exceeded {timeout:.0f}s"
+            return
+        if event is done:
+            if last_run is not None and run_status(last_run) == "requires_action":
+                await cancel_run(project_client, thread.id, last_run)
+            return
+        if event[0] == "status":
+            last_run = event[1]
+            signal = run_throttle_signal(last_run)
+            if signal:
+                slot.throttled(*signal)
+        yield event
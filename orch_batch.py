@@ -0,0 +1,212 @@
+"""
+Batch verification entry point for the loan orchestrator.
+
+Reads customer IDs from a file (or stdin), creates the project client and the
+verification agents once, and processes the queue with a pool of asyncio
+workers that share them. One JSON line is written per customer and a
+throughput summary is printed (and appended to the results file) at the end.
+
+Usage:
+    python orch_batch.py customer_ids.txt [--workers 4] [--output results.jsonl] [--resume]
+    cat customer_ids.txt | python orch_batch.py - --workers 8
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+from orch_config import BATCH_WORKERS, BATCH_RESULTS_FILE
+import orch
+from orch_run import VerificationRun
+from orch_metrics import record_stage, stage_timer, start_metrics_server
+
+
+def read_customer_ids(source: str):
+    """Yield normalised, de-duplicated customer IDs from a file path or '-' for stdin"""
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    seen = set()
+    try:
+        for line in stream:
+            customer_id = line.split("#", 1)[0].strip().upper()
+            if not customer_id or customer_id in seen:
+                continue
+            error = orch.validate_customer_id(customer_id)
+            if error:
+                print(f"⚠️ Skipping '{customer_id}': {error}")
+                continue
+            seen.add(customer_id)
+            yield customer_id
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def build_result_record(run: VerificationRun, duration_ms: float, error: str = None) -> dict:
+    """Compact per-customer JSONL record for a finished run"""
+    recommendation = run.final_recommendation or {}
+    return {
+        "customer_id": run.customer_id,
+        "run_id": run.run_id,
+        "status": "error" if error else ("completed" if recommendation else "incomplete"),
+        "error": error,
+        "recommendation": recommendation.get("recommendation"),
+        "underwriting_approved": recommendation.get("underwriting_approved"),
+        "loan_offer_generated": recommendation.get("loan_offer_generated"),
+        "agent_statuses": {key: result.get("status") for key, result in run.agent_results.items()},
+        "context_tokens": dict(run.context_tokens),
+        "stage_timings": dict(run.stage_timings),
+        "token_usage": dict(run.token_usage),
+        "duration_ms": round(duration_ms, 1),
+        "started_at": run.started_at.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def run_batch(customer_ids, workers: int = None, output_path: str = None, resume: bool = None):
+    """Verify every customer ID with shared agents and a bounded worker pool
+
+    customer_ids may be any iterable (e.g. the read_customer_ids generator); it is
+    consumed lazily into a bounded queue, so large inputs are never held in memory.
+    """
+    workers = workers or BATCH_WORKERS
+    output_path = output_path or BATCH_RESULTS_FILE
+
+    print("\n🔧 Initializing Cosmos DB...")
+    cosmos_initialized = await orch.cosmos_service.initialize()
+    if not cosmos_initialized:
+        print("⚠️ Continuing without Cosmos DB storage...")
+
+    # One-time setup shared by every run in the batch
+    setup_start = time.perf_counter()
+    project_client = orch.create_project_client()
+    agents = orch.create_verification_agents(project_client)
+    setup_ms = (time.perf_counter() - setup_start) * 1000
+    start_metrics_server()
+
+    workers = max(1, workers)
+    queue = asyncio.Queue(maxsize=workers * 2)
+    total = 0
+    print(f"\n📦 Batch verification: {workers} workers → {output_path}")
+
+    async def feed():
+        """Move customer IDs from the (possibly blocking) iterator into the queue, then stop the workers"""
+        nonlocal total
+        iterator = iter(customer_ids)
+        try:
+            while True:
+                # Reading the next line of a file or stdin can block, so it happens in a thread
+                customer_id = await asyncio.to_thread(next, iterator, None)
+                if customer_id is None:
+                    break
+                total += 1
+                await queue.put((customer_id, time.perf_counter()))
+        finally:
+            for _ in range(workers):
+                await queue.put(None)
+
+    durations = []
+    counts = {"completed": 0, "incomplete": 0, "error": 0}
+    write_lock = asyncio.Lock()
+    batch_start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        async def worker(worker_id: int):
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                customer_id, queued_at = item
+                # With resume, customers with an unfinished run continue it from its checkpoint
+                run = await orch.resume_or_create_run(customer_id, resume=resume)
+                record_stage(run, "batch_queue_wait", time.perf_counter() - queued_at)
+                error = None
+                start = time.perf_counter()
+                try:
+                    with stage_timer("pipeline", run):
+                        await orch.run_verification_pipeline(run, project_client, agents, cosmos_initialized)
+                except Exception as e:
+                    error = str(e)
+                    print(f"❌ [worker {worker_id}] {customer_id} failed: {error}")
+                duration_ms = (time.perf_counter() - start) * 1000
+
+                record = build_result_record(run, duration_ms, error)
+                async with write_lock:
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    durations.append(duration_ms)
+                    counts[record["status"]] += 1
+                    print(f"📊 [{len(durations)}] {customer_id}: {record['status']} ({duration_ms:.0f}ms)")
+
+        await asyncio.gather(feed(), *(worker(i + 1) for i in range(workers)))
+
+        wall_s = time.perf_counter() - batch_start
+        summary = {
+            "document_type": "batch_summary",
+            "total": total,
+            **counts,
+            "workers": workers,
+            "setup_ms": round(setup_ms, 1),
+            "wall_time_s": round(wall_s, 2),
+            "throughput_per_min": round(total / wall_s * 60, 2) if wall_s > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(durations, 50), 1),
+                "p95": round(_percentile(durations, 95), 1),
+                "max": round(max(durations), 1) if durations else 0.0
+            },
+            "finished_at": datetime.now(timezone.utc).isoformat()
+        }
+        output.write(json.dumps(summary) + "\n")
+
+    await orch.email_outbox.close()
+    await orch.response_cache.close()
+    await orch.cosmos_service.close()
+    orch.shutdown_agent_executor()
+    orch.client_factory.close()
+
+    print("\n" + "=" * 60)
+    print("📦 BATCH SUMMARY")
+    print("=" * 60)
+    print(f"✅ Completed: {counts['completed']}  ⚠️ Incomplete: {counts['incomplete']}  ❌ Errors: {counts['error']}")
+    print(f"⏱️  Wall time: {summary['wall_time_s']}s (setup {summary['setup_ms']:.0f}ms)")
+    print(f"🚀 Throughput: {summary['throughput_per_min']} customers/min")
+    print(f"📈 Latency p50/p95/max: {summary['latency_ms']['p50']:.0f} / {summary['latency_ms']['p95']:.0f} / {summary['latency_ms']['max']:.0f} ms")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify many customer IDs in one process")
+    parser.add_argument("source", help="File with one customer ID per line, or '-' for stdin")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Concurrent customer runs")
+    parser.add_argument("--output", default=BATCH_RESULTS_FILE, help="JSONL file for per-customer results")
+    parser.add_argument("--resume", action="store_true", default=None,
+                        help="Continue each customer's latest unfinished run instead of starting a new one")
+    args = parser.parse_args(argv)
+
+    customer_ids = read_customer_ids(args.source)
+    first = next(customer_ids, None)
+    if first is None:
+        print("❌ No valid customer IDs provided. Exiting.")
+        return 1
+
+    # The rest of the input is streamed into the worker queue as the batch runs
+    asyncio.run(run_batch(itertools.chain([first], customer_ids), args.workers, args.output, args.resume))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
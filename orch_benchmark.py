@@ -0,0 +1,318 @@
+"""
+Offline benchmark for the loan verification orchestrator.
+
+Runs run_verification_pipeline and/or legacy_sequential_processing for N
+synthetic customers against the in-process fakes from orch_fakes.py (Azure AI
+Project agents, Cosmos DB, email, underwriting and loan offer generation), so
+orchestration changes can be measured without network access or credentials.
+Latency medians/p95s and failure rates of every fake are configurable, and a
+--time-scale below 1 compresses simulated service time (and the agent run
+polling intervals) for quick runs. Every synthetic customer draws its
+latencies and failures from its own seeded stream, so a given --seed
+simulates the same services on every run.
+
+Each mode is run --repeat times and the report gives the median of the
+repeats' end-to-end p50/p95/p99 latency, throughput and failure rate, plus
+mean per-stage time and peak RSS. With --baseline, the run fails (exit code 1)
+when the median p95 latency or throughput regress by more than
+--max-regression compared to an earlier report, for use as a CI gate.
+
+Usage:
+    python orch_benchmark.py --customers 50 --concurrency 8 --mode both --output bench.json
+    python orch_benchmark.py --time-scale 0.05 --repeat 5 --baseline bench.json --max-regression 0.15
+    python orch_benchmark.py --latency agent_run=4000:12000 --failure-rate email=0.1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timezone
+
+# The orchestrator reads its configuration at import time: no registry or
+# response cache (every run must reach the fakes), no metrics port, a private
+# spill file and placeholder credentials for the Semantic Kernel service.
+for _name, _value in {
+    "AGENT_REGISTRY_ENABLED": "false",
+    "AGENT_CACHE_ENABLED": "false",
+    "METRICS_PORT": "0",
+    "COSMOS_WRITE_SPILL_FILE": os.path.join(tempfile.gettempdir(), f"orch_benchmark_spill_{os.getpid()}.jsonl"),
+    "AZURE_OPENAI_DEPLOYMENT_NAME": "benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://benchmark.invalid",
+    "AZURE_OPENAI_API_KEY": "benchmark",
+    "COSMOS_DB_ENDPOINT": "https://benchmark.invalid",
+    "COSMOS_DB_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from orch_fakes import (
+    current_customer,
+    Latency,
+    FakeProfile,
+    FakeProjectClient,
+    FakeCosmosClient,
+    FakeEmailSender,
+    FakeUnderwritingAgent,
+    fake_loan_offer,
+)
+from orch_outbox import CallableEmailTransport
+
+MODES = ("pipeline", "legacy")
+# Metrics compared against a baseline, and whether higher values are better
+GATED_METRICS = {"p95_ms": False, "throughput_per_min": True}
+# Per-repeat metrics reported as their median across repeats
+REPEATED_METRICS = ("wall_time_s", "throughput_per_min", "p50_ms", "p95_ms", "p99_ms", "max_ms", "failure_rate")
+
+
+def load_orchestrator(profile: FakeProfile):
+    """Import orch with every external integration replaced by a fake"""
+    underwriting = FakeUnderwritingAgent(profile)
+    try:
+        import agents.underwriting_agent  # noqa: F401
+    except ImportError:
+        # The database-backed underwriting agent is not importable offline
+        module = types.ModuleType("agents.underwriting_agent")
+        module.underwriting_agent = underwriting
+        sys.modules["agents.underwriting_agent"] = module
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import orch
+
+    orch.CosmosClient = lambda endpoint, key, **kwargs: FakeCosmosClient(profile)
+    orch.send_email_template = FakeEmailSender(profile)
+    orch.email_outbox.transport = CallableEmailTransport(orch.send_email_template)
+    orch.underwriting_agent = underwriting
+    orch.generate_loan_offer = fake_loan_offer(profile)
+
+    # Polling sleeps in real time, so it is compressed along with the simulated latencies
+    import orch_agent_runtime
+    orch_agent_runtime.AGENT_POLL_INITIAL_DELAY *= profile.time_scale
+    orch_agent_runtime.AGENT_POLL_MAX_DELAY *= profile.time_scale
+    return orch
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_succeeded(run, mode: str) -> bool:
+    if mode == "pipeline":
+        return bool(run.final_recommendation)
+    verification_keys = ("identity", "income", "guarantor", "inspection", "valuation")
+    return all(run.agent_results.get(key, {}).get("status") == "passed" for key in verification_keys)
+
+
+async def run_mode(orch, mode: str, customers: int, concurrency: int, project_client, agents,
+                   cosmos_initialized: bool, verbose: bool = False, repeat: int = 1) -> dict:
+    """Process synthetic customers through one orchestration mode and summarise the latencies
+
+    repeat numbers the customer IDs, so every repeat has its own customers
+    (and draws) while the same repeat of another run gets the same ones.
+    """
+    from orch_batch import _percentile
+    from orch_run import VerificationRun
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    durations, failures, errors = [], 0, 0
+    stage_totals = {}
+
+    async def process(index: int):
+        nonlocal failures, errors
+        # Distinct IDs per mode and repeat, so the email outbox does not suppress later emails
+        run = VerificationRun(f"BENCH{mode[0].upper()}{repeat}{index:06d}")
+        current_customer.set(run.customer_id)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if mode == "pipeline":
+                    await orch.run_verification_pipeline(run, project_client, agents, cosmos_initialized)
+                else:
+                    await orch.legacy_sequential_processing(run, agents, project_client)
+            except Exception as e:
+                errors += 1
+                print(f"❌ {run.customer_id} raised: {str(e)}", file=sys.__stdout__)
+            durations.append((time.perf_counter() - start) * 1000)
+        if not _run_succeeded(run, mode):
+            failures += 1
+        for stage, timing in run.stage_timings.items():
+            totals = stage_totals.setdefault(stage, [0, 0.0])
+            totals[0] += timing["count"]
+            totals[1] += timing["total_ms"]
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    wall_start = time.perf_counter()
+    with output:
+        await asyncio.gather(*(process(i + 1) for i in range(customers)))
+        # Stage emails leave the critical path but still count towards throughput
+        await orch.email_outbox.drain()
+    wall_s = time.perf_counter() - wall_start
+
+    return {
+        "customers": customers,
+        "concurrency": concurrency,
+        "wall_time_s": round(wall_s, 2),
+        "throughput_per_min": round(customers / wall_s * 60, 2) if wall_s > 0 else 0.0,
+        "p50_ms": round(_percentile(durations, 50), 1),
+        "p95_ms": round(_percentile(durations, 95), 1),
+        "p99_ms": round(_percentile(durations, 99), 1),
+        "max_ms": round(max(durations), 1) if durations else 0.0,
+        "failure_rate": round(failures / customers, 4) if customers else 0.0,
+        "errors": errors,
+        "stage_mean_ms": {
+            stage: round(total_ms / count, 1)
+            for stage, (count, total_ms) in sorted(stage_totals.items()) if count
+        },
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def median_of_repeats(runs: list) -> dict:
+    """Summary of a mode's repeats: the median of each REPEATED_METRICS value, the rest from the last repeat"""
+    summary = dict(runs[-1])
+    for metric in REPEATED_METRICS:
+        summary[metric] = round(statistics.median(run[metric] for run in runs), 4 if metric == "failure_rate" else 2)
+    summary["repeats"] = [{metric: run[metric] for metric in REPEATED_METRICS} for run in runs]
+    return summary
+
+
+async def run_benchmark(modes, customers: int, concurrency: int, profile: FakeProfile, verbose: bool = False,
+                        repeats: int = 1) -> dict:
+    """Benchmark each mode repeats times against one shared set of fakes"""
+    orch = load_orchestrator(profile)
+    project_client = FakeProjectClient(profile)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cosmos_initialized = await orch.cosmos_service.initialize()
+        agents = orch.create_verification_agents(project_client)
+
+    results = {}
+    try:
+        for mode in modes:
+            print(f"⏱️  Benchmarking {mode}: {customers} customers, concurrency {concurrency}, "
+                  f"{repeats} repeat(s)...")
+            runs = []
+            for repeat in range(1, repeats + 1):
+                runs.append(await run_mode(
+                    orch, mode, customers, concurrency, project_client, agents, cosmos_initialized,
+                    verbose, repeat
+                ))
+            results[mode] = median_of_repeats(runs)
+            print_mode_summary(mode, results[mode])
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await orch.email_outbox.close()
+            await orch.response_cache.close()
+            await orch.cosmos_service.close()
+            orch.shutdown_agent_executor()
+
+    return {
+        "document_type": "benchmark_report",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "time_scale": profile.time_scale,
+        "seed": profile.seed,
+        "repeats": repeats,
+        "latencies": {kind: [latency.median_ms, latency.p95_ms] for kind, latency in profile.latencies.items()},
+        "failure_rates": dict(profile.failure_rates),
+        "agent_api_calls": project_client.agents.calls,
+        "emails": dict(orch.email_outbox.counts),
+        "results": results
+    }
+
+
+def print_mode_summary(mode: str, result: dict):
+    print(f"📈 {mode}: p50/p95/p99 {result['p50_ms']:.0f} / {result['p95_ms']:.0f} / {result['p99_ms']:.0f} ms, "
+          f"{result['throughput_per_min']} customers/min, failure rate {result['failure_rate']:.1%}, "
+          f"peak RSS {result['peak_rss_mb']} MB")
+    slowest = sorted(result["stage_mean_ms"].items(), key=lambda item: item[1], reverse=True)[:5]
+    for stage, mean_ms in slowest:
+        print(f"   {stage}: {mean_ms:.0f}ms mean")
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_regression: float):
+    """List of regressions beyond max_regression (as a fraction) for modes present in both reports"""
+    regressions = []
+    for mode, result in report["results"].items():
+        previous = baseline.get("results", {}).get(mode)
+        if not previous:
+            continue
+        for metric, higher_is_better in GATED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > max_regression:
+                regressions.append(f"{mode} {metric}: {old} → {new} ({change:.1%} worse)")
+    return regressions
+
+
+def _parse_overrides(values, parse):
+    overrides = {}
+    for value in values or []:
+        kind, _, setting = value.partition("=")
+        overrides[kind.strip()] = parse(setting)
+    return overrides
+
+
+def _parse_latency(setting: str) -> Latency:
+    median, _, p95 = setting.partition(":")
+    return Latency(float(median), float(p95) if p95 else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the orchestrator against in-process fakes")
+    parser.add_argument("--customers", type=int, default=20, help="Synthetic customers per mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="Customers processed at once")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="pipeline")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiplier applied to every simulated latency")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for latency and failure draws")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the report and gate use their medians")
+    parser.add_argument("--latency", action="append", metavar="KIND=MEDIAN_MS[:P95_MS]",
+                        help="Override a latency distribution (agent_api, agent_run, agent_tool, cosmos, email, underwriting, loan_offer)")
+    parser.add_argument("--failure-rate", action="append", metavar="KIND=RATE", help="Override a failure rate")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report to gate against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed p95/throughput regression against the baseline (fraction)")
+    parser.add_argument("--verbose", action="store_true", help="Show the orchestrator's own output")
+    args = parser.parse_args(argv)
+
+    profile = FakeProfile(
+        latencies=_parse_overrides(args.latency, _parse_latency),
+        failure_rates=_parse_overrides(args.failure_rate, float),
+        time_scale=args.time_scale,
+        seed=args.seed
+    )
+    modes = MODES if args.mode == "both" else (args.mode,)
+    report = asyncio.run(run_benchmark(modes, args.customers, args.concurrency, profile, args.verbose,
+                                       max(1, args.repeat)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Regression beyond {args.max_regression:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"   • {regression}")
+            return 1
+        print(f"✅ Within {args.max_regression:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
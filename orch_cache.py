@@ -0,0 +1,363 @@
+"""
+Opt-in response cache for verification agent calls.
+
+Entries are keyed by customer, agent key, agent ID, a hash of the exact prompt
+sent and the version of the agent's search index, so a cached answer is only
+reused while neither the prompt nor the underlying documents changed. The
+index version is read from the search service's index statistics (document
+count and storage size), so re-indexing documents invalidates the entries;
+without a search endpoint to read it from the cache stays disabled. Three
+backends are available: local SQLite (default), an on-disk LRU directory and
+a Cosmos DB container. All of them honour a TTL and a maximum entry count,
+evicting the least recently used entries first.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from azure.cosmos import exceptions
+
+try:
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents.indexes import SearchIndexClient
+except ImportError:
+    SearchIndexClient = None
+
+from orch_config import (
+    AGENT_CACHE_ENABLED,
+    AGENT_CACHE_BACKEND,
+    AGENT_CACHE_PATH,
+    AGENT_CACHE_TTL,
+    AGENT_CACHE_MAX_ENTRIES,
+    AGENT_CACHE_SEARCH_ENDPOINT,
+    AGENT_CACHE_SEARCH_KEY,
+    AGENT_CACHE_INDEX_VERSION_TTL,
+    AGENT_CACHE_COSMOS_CONTAINER,
+    IDENTITY_INDEX,
+    INCOME_INDEX,
+    GUARANTOR_INDEX,
+    INSPECTION_INDEX,
+    VALUATION_INDEX,
+)
+
+# Search index each cached agent answers from
+AGENT_INDEXES = {
+    "identity": IDENTITY_INDEX,
+    "income": INCOME_INDEX,
+    "guarantor": GUARANTOR_INDEX,
+    "inspection": INSPECTION_INDEX,
+    "valuation": VALUATION_INDEX,
+}
+
+
+def prompt_hash(prompt: str) -> str:
+    """SHA-256 of the prompt text exactly as sent to the agent"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(customer_id: str, agent_key: str, agent_id: str, prompt: str, index_version: str) -> str:
+    """Cache key for one agent call"""
+    payload = json.dumps({
+        "customer_id": customer_id,
+        "agent_key": agent_key,
+        "agent_id": agent_id,
+        "prompt_sha256": prompt_hash(prompt),
+        "index_version": index_version
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchIndexVersions:
+    """Document version of search indexes, derived from their statistics
+
+    The version changes whenever documents are added, removed or re-indexed
+    with different content size. It is reused for ttl seconds, so a run reads
+    each index's statistics about once.
+    """
+
+    def __init__(self, endpoint: str, key: str = None, ttl: float = None, credential_factory=None):
+        self.endpoint = endpoint
+        self.key = key
+        self.ttl = ttl if ttl is not None else AGENT_CACHE_INDEX_VERSION_TTL
+        self.credential_factory = credential_factory
+        self._client = None
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                if self.key:
+                    credential = AzureKeyCredential(self.key)
+                elif self.credential_factory is not None:
+                    credential = self.credential_factory()
+                else:
+                    from azure.identity import DefaultAzureCredential
+                    credential = DefaultAzureCredential()
+                self._client = SearchIndexClient(endpoint=self.endpoint, credential=credential)
+            return self._client
+
+    def version(self, index_name: str) -> str:
+        """Current version of index_name (blocking; call it from a worker thread)"""
+        with self._lock:
+            cached = self._versions.get(index_name)
+            if cached and time.monotonic() - cached[1] < self.ttl:
+                return cached[0]
+        stats = self._get_client().get_index_statistics(index_name)
+        version = f"{stats['document_count']}:{stats['storage_size']}"
+        with self._lock:
+            self._versions[index_name] = (version, time.monotonic())
+        return version
+
+
+class SQLiteResponseCache:
+    """Response cache stored in a local SQLite database (queries run on worker threads)"""
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS agent_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_cache_access ON agent_cache(last_access)")
+        self._conn.commit()
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: dict):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+    def _get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM agent_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM agent_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE agent_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO agent_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now)
+            )
+            self._conn.execute("DELETE FROM agent_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM agent_cache WHERE key IN ("
+                " SELECT key FROM agent_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def _close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DiskLRUResponseCache:
+    """Response cache kept as one JSON file per entry, evicted by file access time (file I/O runs on worker threads)"""
+
+    def __init__(self, directory: str, ttl: float, max_entries: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: dict):
+        await asyncio.to_thread(self._set, key, value)
+
+    def _get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get("expires_at", 0) <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Touch the file so it counts as recently used
+        os.utime(path, None)
+        return entry["value"]
+
+    def _set(self, key: str, value: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"value": value, "expires_at": time.time() + self.ttl}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".json")
+            ]
+            excess = len(entries) - self.max_entries
+            if excess <= 0:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:excess]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    async def close(self):
+        pass
+
+
+class CosmosResponseCache:
+    """Response cache in a Cosmos DB container (per-item TTL, partitioned by key)"""
+
+    def __init__(self, cosmos_service, container_name: str, ttl: float):
+        self.cosmos_service = cosmos_service
+        self.container_name = container_name
+        self.ttl = ttl
+        self.container = None
+
+    async def _container(self):
+        if self.container is None:
+            self.container = await self.cosmos_service.database.create_container_if_not_exists(
+                id=self.container_name,
+                partition_key="/id",
+                default_ttl=int(self.ttl)
+            )
+        return self.container
+
+    async def get(self, key: str):
+        try:
+            container = await self._container()
+            item = await container.read_item(item=key, partition_key=key)
+            return item["value"]
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    async def set(self, key: str, value: dict):
+        container = await self._container()
+        await container.upsert_item({"id": key, "value": value, "ttl": int(self.ttl)})
+
+    async def close(self):
+        pass
+
+
+class AgentResponseCache:
+    """Front door used by AzureProjectAgentFunction; a no-op unless enabled"""
+
+    def __init__(self, enabled: bool = None, backend: str = None, path: str = None,
+                 ttl: float = None, max_entries: int = None, index_versions: SearchIndexVersions = None,
+                 agent_indexes: dict = None, cosmos_service=None):
+        self.enabled = AGENT_CACHE_ENABLED if enabled is None else enabled
+        self.backend_name = (backend or AGENT_CACHE_BACKEND).lower()
+        self.path = path or AGENT_CACHE_PATH
+        if path is None and self.backend_name == "disk":
+            # The disk backend needs a directory rather than a database file
+            self.path = os.path.splitext(self.path)[0]
+        self.ttl = ttl if ttl is not None else AGENT_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else AGENT_CACHE_MAX_ENTRIES
+        self.agent_indexes = agent_indexes if agent_indexes is not None else AGENT_INDEXES
+        self.index_versions = index_versions
+        if self.enabled and self.index_versions is None:
+            if not AGENT_CACHE_SEARCH_ENDPOINT or SearchIndexClient is None:
+                print("⚠️ Agent cache disabled: it needs AGENT_CACHE_SEARCH_ENDPOINT and azure-search-documents "
+                      "to detect re-indexed documents")
+                self.enabled = False
+            else:
+                self.index_versions = SearchIndexVersions(AGENT_CACHE_SEARCH_ENDPOINT, AGENT_CACHE_SEARCH_KEY)
+        self.cosmos_service = cosmos_service
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_backend(self):
+        if self._backend is None:
+            if self.backend_name == "sqlite":
+                self._backend = SQLiteResponseCache(self.path, self.ttl, self.max_entries)
+            elif self.backend_name == "disk":
+                self._backend = DiskLRUResponseCache(self.path, self.ttl, self.max_entries)
+            elif self.backend_name == "cosmos":
+                self._backend = CosmosResponseCache(self.cosmos_service, AGENT_CACHE_COSMOS_CONTAINER, self.ttl)
+            else:
+                raise ValueError(f"Unknown AGENT_CACHE_BACKEND '{self.backend_name}'")
+        return self._backend
+
+    async def index_version(self, agent_key: str):
+        """Document version of the agent's search index; None when it cannot be read"""
+        index_name = self.agent_indexes.get(agent_key)
+        if not index_name:
+            return None
+        try:
+            return await asyncio.to_thread(self.index_versions.version, index_name)
+        except Exception as e:
+            print(f"⚠️ Could not read the version of index {index_name}, not caching: {str(e)}")
+            return None
+
+    async def key_for(self, customer_id: str, agent_key: str, agent_id: str, prompt: str):
+        """Cache key for an agent call, or None when the call must not be cached"""
+        if not self.enabled:
+            return None
+        index_version = await self.index_version(agent_key)
+        if index_version is None:
+            return None
+        return make_cache_key(customer_id, agent_key, agent_id, prompt, index_version)
+
+    async def get(self, key: str):
+        if not self.enabled or key is None:
+            return None
+        try:
+            value = await self._get_backend().get(key)
+        except Exception as e:
+            print(f"⚠️ Agent cache read failed: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict):
+        if not self.enabled or key is None:
+            return
+        try:
+            await self._get_backend().set(key, value)
+        except Exception as e:
+            print(f"⚠️ Agent cache write failed: {str(e)}")
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
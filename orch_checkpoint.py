@@ -0,0 +1,317 @@
+"""
+Resumable per-step checkpoints for verification runs.
+
+After every verification step, underwriting and loan offer generation the
+run's reusable results (passed verifications, completed underwriting / offer)
+are saved in a checkpoint keyed by run ID, together with the shared context
+and the Cosmos result document references. A restarted run - or the legacy
+fallback after the kernel pipeline failed midway - restores the checkpoint
+and only executes the steps that have not completed yet.
+
+Checkpoints live in the customer's partition of the Cosmos container
+("run_checkpoint" documents, written through the Cosmos write buffer) or,
+without Cosmos, as one JSON state file per run in PIPELINE_CHECKPOINT_DIR.
+In Cosmos a step whose result is already stored as an agent_result document
+is checkpointed as a reference to that document (ID and run ID) instead of a
+second copy of the response; on restore the reference only counts while the
+document still holds this run's result.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from azure.cosmos import exceptions
+
+from orch_versioning import write_versioned
+from orch_config import (
+    PIPELINE_CHECKPOINT_ENABLED,
+    PIPELINE_CHECKPOINT_BACKEND,
+    PIPELINE_CHECKPOINT_DIR,
+    PIPELINE_CHECKPOINT_MAX_AGE,
+)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# Result status that makes a step's stored output safe to reuse
+REUSABLE_STATUSES = {
+    "identity": "passed",
+    "income": "passed",
+    "guarantor": "passed",
+    "inspection": "passed",
+    "valuation": "passed",
+    "underwriting": "completed",
+    "loan_offer": "completed",
+}
+
+
+# Cosmos agent_result document name of each step's result (see CosmosDBService.store_run_result)
+RESULT_DOCUMENT_NAMES = {
+    "identity": "Identity Check",
+    "income": "Income Check",
+    "guarantor": "Guarantor Check",
+    "inspection": "Collateral Inspection Check",
+    "valuation": "Valuation Check",
+    "underwriting": "Underwriting Analysis",
+    "loan_offer": "Loan Offer Generation",
+}
+# Result fields an agent_result document keeps; results with other fields are checkpointed inline
+STORED_RESULT_FIELDS = ("status", "summary", "full_response", "processing_time_ms")
+
+
+def is_reusable(key: str, result: dict) -> bool:
+    """True if a step result can be restored instead of executing the step again"""
+    return bool(result) and REUSABLE_STATUSES.get(key) == result.get("status")
+
+
+def checkpoint_id(customer_id: str, run_id: str) -> str:
+    return f"{customer_id}_checkpoint_{run_id}"
+
+
+class FileCheckpointBackend:
+    """One JSON state file per run in a local directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def _read(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write(self, document: dict):
+        path = self._path(document["run_id"])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, default=str)
+        os.replace(temp_path, path)
+
+    def _find_incomplete(self, customer_id: str, not_before: str):
+        candidates = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                document = self._read(os.path.join(self.directory, name))
+                if (document and document.get("customer_id") == customer_id
+                        and document.get("status") == IN_PROGRESS
+                        and document.get("updated_at", "") >= not_before):
+                    candidates.append(document)
+        return max(candidates, key=lambda document: document["updated_at"], default=None)
+
+    def step_entries(self, run, steps: dict) -> dict:
+        """The file holds the step results themselves"""
+        return steps
+
+    async def load_steps(self, run, entries: dict) -> dict:
+        return entries
+
+    async def get(self, customer_id: str, run_id: str):
+        document = await asyncio.to_thread(self._read, self._path(run_id))
+        return document if document and document.get("customer_id") == customer_id else None
+
+    async def put(self, document: dict):
+        await asyncio.to_thread(self._write, document)
+
+    async def finish(self, document: dict):
+        """A completed run needs no state file"""
+        try:
+            await asyncio.to_thread(os.remove, self._path(document["run_id"]))
+        except FileNotFoundError:
+            pass
+
+    async def find_incomplete(self, customer_id: str, not_before: str):
+        return await asyncio.to_thread(self._find_incomplete, customer_id, not_before)
+
+
+class CosmosCheckpointBackend:
+    """run_checkpoint documents in the customer's partition of the results container"""
+
+    def __init__(self, cosmos_service):
+        self.cosmos_service = cosmos_service
+
+    def step_entries(self, run, steps: dict) -> dict:
+        """References to results already stored as agent_result documents, other results inline"""
+        entries = {}
+        for key, result in steps.items():
+            document_id = run.result_documents.get(RESULT_DOCUMENT_NAMES.get(key))
+            if document_id and set(result) <= set(STORED_RESULT_FIELDS):
+                entries[key] = {"document_id": document_id, "run_id": run.run_id, "status": result.get("status")}
+            else:
+                entries[key] = {"result": result}
+        return entries
+
+    async def load_steps(self, run, entries: dict) -> dict:
+        """Step results of a checkpoint; references whose document moved on to another run are dropped"""
+        steps = {}
+        for key, entry in entries.items():
+            if "document_id" not in entry:
+                # Inline result (or a checkpoint written before references were used)
+                steps[key] = entry.get("result", entry)
+                continue
+            try:
+                document = await self.cosmos_service.container.read_item(
+                    item=entry["document_id"],
+                    partition_key=run.customer_id
+                )
+            except exceptions.CosmosResourceNotFoundError:
+                continue
+            if document.get("run_id") == entry["run_id"] and document.get("status") == entry["status"]:
+                steps[key] = {field: document.get(field) for field in STORED_RESULT_FIELDS}
+        return steps
+
+    async def get(self, customer_id: str, run_id: str):
+        await self.cosmos_service.flush()
+        try:
+            return await self.cosmos_service.container.read_item(
+                item=checkpoint_id(customer_id, run_id),
+                partition_key=customer_id
+            )
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    async def put(self, document: dict):
+        if self.cosmos_service.write_buffer:
+            await self.cosmos_service.write_buffer.enqueue(document)
+        else:
+            await write_versioned(self.cosmos_service.container, document)
+
+    async def finish(self, document: dict):
+        await self.put(document)
+
+    async def find_incomplete(self, customer_id: str, not_before: str):
+        await self.cosmos_service.flush()
+        query = (
+            "SELECT * FROM c WHERE c.customer_id = @customer_id AND c.document_type = @document_type"
+            " AND c.status = @status AND c.updated_at >= @not_before ORDER BY c.updated_at DESC"
+        )
+        parameters = [
+            {"name": "@customer_id", "value": customer_id},
+            {"name": "@document_type", "value": "run_checkpoint"},
+            {"name": "@status", "value": IN_PROGRESS},
+            {"name": "@not_before", "value": not_before},
+        ]
+        async for item in self.cosmos_service.container.query_items(
+            query=query, parameters=parameters, partition_key=customer_id
+        ):
+            return item
+        return None
+
+
+class PipelineCheckpoints:
+    """Save, restore and complete per-step checkpoints of verification runs"""
+
+    def __init__(self, cosmos_service=None, enabled: bool = None, backend: str = None,
+                 directory: str = None, max_age_hours: float = None):
+        self.cosmos_service = cosmos_service
+        self.enabled = PIPELINE_CHECKPOINT_ENABLED if enabled is None else enabled
+        self.backend_name = (backend or PIPELINE_CHECKPOINT_BACKEND).lower()
+        self.directory = directory or PIPELINE_CHECKPOINT_DIR
+        self.max_age_hours = max_age_hours if max_age_hours is not None else PIPELINE_CHECKPOINT_MAX_AGE
+        self._file_backend = None
+        self._locks = {}
+
+    def _get_backend(self):
+        cosmos_ready = getattr(self.cosmos_service, "container", None) is not None
+        if self.backend_name == "cosmos" or (self.backend_name == "auto" and cosmos_ready):
+            return CosmosCheckpointBackend(self.cosmos_service)
+        if self.backend_name not in ("auto", "file"):
+            raise ValueError(f"Unknown PIPELINE_CHECKPOINT_BACKEND '{self.backend_name}'")
+        if self._file_backend is None:
+            self._file_backend = FileCheckpointBackend(self.directory)
+        return self._file_backend
+
+    def _document(self, run, backend, status: str = IN_PROGRESS) -> dict:
+        steps = {key: result for key, result in run.agent_results.items() if is_reusable(key, result)}
+        return {
+            "id": checkpoint_id(run.customer_id, run.run_id),
+            "customer_id": run.customer_id,
+            "document_type": "run_checkpoint",
+            "run_id": run.run_id,
+            "run_started_at": run.started_at.isoformat(),
+            "status": status,
+            "steps": backend.step_entries(run, steps),
+            "shared_context": run.shared_context,
+            "result_documents": dict(run.result_documents),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    async def _write(self, run, status: str):
+        # One writer per run at a time so an older snapshot never lands last
+        lock = self._locks.setdefault(run.run_id, asyncio.Lock())
+        async with lock:
+            backend = self._get_backend()
+            document = self._document(run, backend, status)
+            if status == COMPLETED:
+                await backend.finish(document)
+                self._locks.pop(run.run_id, None)
+            else:
+                await backend.put(document)
+
+    async def save(self, run, key: str):
+        """Checkpoint the run after a step; only reusable results are kept"""
+        if not self.enabled or not is_reusable(key, run.agent_results.get(key)):
+            return
+        try:
+            await self._write(run, IN_PROGRESS)
+        except Exception as e:
+            print(f"⚠️ Failed to checkpoint {key} for run {run.run_id}: {str(e)}")
+
+    async def complete(self, run):
+        """Mark the run finished so it is never resumed"""
+        if not self.enabled:
+            return
+        try:
+            await self._write(run, COMPLETED)
+        except Exception as e:
+            print(f"⚠️ Failed to complete checkpoint for run {run.run_id}: {str(e)}")
+
+    async def find_incomplete_run(self, customer_id: str):
+        """Run ID of the customer's most recent unfinished run, if it is recent enough to resume"""
+        if not self.enabled:
+            return None
+        not_before = (datetime.now(timezone.utc) - timedelta(hours=self.max_age_hours)).isoformat()
+        try:
+            document = await self._get_backend().find_incomplete(customer_id, not_before)
+        except Exception as e:
+            print(f"⚠️ Failed to look up checkpoints for {customer_id}: {str(e)}")
+            return None
+        return document["run_id"] if document else None
+
+    async def restore(self, run):
+        """Load the run's checkpoint into it; returns the restored step keys"""
+        if not self.enabled:
+            return []
+        backend = self._get_backend()
+        try:
+            document = await backend.get(run.customer_id, run.run_id)
+            if not document or document.get("status") != IN_PROGRESS:
+                return []
+            steps = await backend.load_steps(run, document.get("steps", {}))
+        except Exception as e:
+            print(f"⚠️ Failed to read checkpoint for run {run.run_id}: {str(e)}")
+            return []
+
+        # Keep the original start time so versioned result writes treat this as the same run
+        if document.get("run_started_at"):
+            run.started_at = datetime.fromisoformat(document["run_started_at"])
+        run.agent_results.update(steps)
+        run.shared_context.update(document.get("shared_context", {}))
+        run.result_documents.update(document.get("result_documents", {}))
+        restored = list(steps)
+        print(f"♻️  Restored {len(restored)} completed step(s) of run {run.run_id}: {', '.join(restored)}")
+        return restored
+
+
+def completed_steps(run, graph):
+    """Verification steps of a run whose results can be reused, keyed by step key"""
+    return {
+        key: run.agent_results[key] for key in graph.order
+        if is_reusable(key, run.agent_results.get(key))
+    }
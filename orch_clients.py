@@ -0,0 +1,167 @@
+"""
+Long-lived Azure client factory shared by the orchestrator, the verification
+API backend and the underwriting agent.
+
+Building DefaultAzureCredential, the AIProjectClient and walking
+connections.list() for the CognitiveSearch connection used to happen on every
+run and dominated cold start. The factory keeps one credential per process
+whose access tokens are cached per scope and refreshed shortly before they
+expire, one project client per project, and the resolved connection IDs
+(re-listed after CLIENT_CONNECTION_TTL seconds or on invalidate()).
+"""
+
+import threading
+import time
+
+from azure.identity import DefaultAzureCredential
+from azure.ai.projects import AIProjectClient
+
+from orch_config import (
+    ENDPOINT,
+    RESOURCE_GROUP,
+    SUBSCRIPTION_ID,
+    PROJECT_NAME,
+    CLIENT_TOKEN_REFRESH_MARGIN,
+    CLIENT_CONNECTION_TTL,
+)
+
+
+class CachedTokenCredential:
+    """Token credential that reuses access tokens until they are about to expire
+
+    DefaultAzureCredential may fall through to the Azure CLI or another slow
+    credential on every get_token call; this wrapper only asks it again once
+    the cached token is within refresh_margin seconds of expiring.
+    """
+
+    def __init__(self, credential, refresh_margin: float = None):
+        self.credential = credential
+        self.refresh_margin = refresh_margin if refresh_margin is not None else CLIENT_TOKEN_REFRESH_MARGIN
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        key = (scopes, kwargs.get("claims"), kwargs.get("tenant_id"))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self.refresh_margin <= time.time():
+                token = self.credential.get_token(*scopes, **kwargs)
+                self._tokens[key] = token
+            return token
+
+    def invalidate(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def close(self):
+        self.invalidate()
+        close = getattr(self.credential, "close", None)
+        if close:
+            close()
+
+
+class ClientFactory:
+    """Process-wide cache of the credential, project clients and connection IDs"""
+
+    def __init__(self, credential_factory=None, connection_ttl: float = None):
+        self.credential_factory = credential_factory or DefaultAzureCredential
+        self.connection_ttl = connection_ttl if connection_ttl is not None else CLIENT_CONNECTION_TTL
+        self._credential = None
+        self._clients = {}
+        self._connections = {}
+        self._lock = threading.RLock()
+
+    def get_credential(self) -> CachedTokenCredential:
+        with self._lock:
+            if self._credential is None:
+                self._credential = CachedTokenCredential(self.credential_factory())
+            return self._credential
+
+    def get_project_client(self, endpoint: str = None, resource_group_name: str = None,
+                           subscription_id: str = None, project_name: str = None):
+        """Project client for the configured (or given) project, built once"""
+        key = (
+            endpoint or ENDPOINT,
+            resource_group_name or RESOURCE_GROUP,
+            subscription_id or SUBSCRIPTION_ID,
+            project_name or PROJECT_NAME,
+        )
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = AIProjectClient(
+                    endpoint=key[0],
+                    resource_group_name=key[1],
+                    subscription_id=key[2],
+                    project_name=key[3],
+                    credential=self.get_credential(),
+                )
+                self._clients[key] = client
+            return client
+
+    def from_connection_string(self, conn_str: str):
+        """Project client for a project connection string, built once"""
+        key = ("conn_str", conn_str)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = AIProjectClient.from_connection_string(
+                    credential=self.get_credential(),
+                    conn_str=conn_str
+                )
+                self._clients[key] = client
+            return client
+
+    def connection_id(self, project_client, connection_type: str = "CognitiveSearch") -> str:
+        """ID of the project's first connection of a type, cached for connection_ttl seconds"""
+        key = (project_client, connection_type)
+        with self._lock:
+            cached = self._connections.get(key)
+            if cached and time.monotonic() - cached[1] < self.connection_ttl:
+                return cached[0]
+        # List outside the lock so other client lookups don't wait on the network call
+        conn_id = next(
+            (conn.id for conn in project_client.connections.list() if conn.connection_type == connection_type),
+            None
+        )
+        if conn_id is None:
+            raise LookupError(f"No {connection_type} connection found in the AI project")
+        with self._lock:
+            self._connections[key] = (conn_id, time.monotonic())
+        return conn_id
+
+    def warm(self, connection_types=("CognitiveSearch",)):
+        """Build the default project client and resolve connection IDs ahead of the first run"""
+        start = time.perf_counter()
+        try:
+            client = self.get_project_client()
+            for connection_type in connection_types:
+                self.connection_id(client, connection_type)
+            print(f"🔥 Azure clients warmed in {time.perf_counter() - start:.2f}s")
+            return True
+        except Exception as e:
+            print(f"⚠️ Azure client warm-up failed, clients will be built on first use: {str(e)}")
+            return False
+
+    def invalidate(self):
+        """Drop cached tokens and connection IDs (e.g. after an authentication error)"""
+        with self._lock:
+            self._connections.clear()
+            if self._credential is not None:
+                self._credential.invalidate()
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+            self._connections.clear()
+            if self._credential is not None:
+                self._credential.close()
+                self._credential = None
+
+
+client_factory = ClientFactory()
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -29,3 +30,124 @@ INCOME_INDEX = os.getenv("INCOME_INDEX")
 GUARANTOR_INDEX = os.getenv("GUARANTOR_INDEX")
 INSPECTION_INDEX = os.getenv("INSPECTION_INDEX")
 VALUATION_INDEX = os.getenv("VALUATION_INDEX")
+
+# Verification Scheduler Configuration
+VERIFICATION_MAX_CONCURRENCY = int(os.getenv("VERIFICATION_MAX_CONCURRENCY", "3"))
+
+# Agent Run Execution Configuration
+AGENT_THREAD_POOL_SIZE = int(os.getenv("AGENT_THREAD_POOL_SIZE", "8"))
+AGENT_POLL_INITIAL_DELAY = float(os.getenv("AGENT_POLL_INITIAL_DELAY", "0.5"))
+AGENT_POLL_MAX_DELAY = float(os.getenv("AGENT_POLL_MAX_DELAY", "5.0"))
+AGENT_POLL_BACKOFF = float(os.getenv("AGENT_POLL_BACKOFF", "1.5"))
+AGENT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "600"))
+
+# Batch Verification Configuration
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_RESULTS_FILE = os.getenv("BATCH_RESULTS_FILE", "batch_results.jsonl")
+
+# Agent Registry Configuration
+AGENT_REGISTRY_ENABLED = os.getenv("AGENT_REGISTRY_ENABLED", "true").lower() == "true"
+AGENT_REGISTRY_FILE = os.getenv(
+    "AGENT_REGISTRY_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_registry.json")
+)
+AGENT_REGISTRY_VERIFY_TTL = float(os.getenv("AGENT_REGISTRY_VERIFY_TTL", "86400"))
+
+# Prompt Store Configuration (seconds between on-disk change checks per file)
+PROMPT_RELOAD_CHECK_INTERVAL = float(os.getenv("PROMPT_RELOAD_CHECK_INTERVAL", "2.0"))
+
+# Agent Response Cache Configuration (opt-in)
+AGENT_CACHE_ENABLED = os.getenv("AGENT_CACHE_ENABLED", "false").lower() == "true"
+AGENT_CACHE_BACKEND = os.getenv("AGENT_CACHE_BACKEND", "sqlite")  # sqlite | disk | cosmos
+AGENT_CACHE_PATH = os.getenv(
+    "AGENT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_cache.sqlite")
+)
+AGENT_CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", str(7 * 24 * 3600)))
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "10000"))
+# Search service whose index statistics version the cached answers; without an
+# endpoint the cache stays disabled. No key means Azure AD (DefaultAzureCredential)
+AGENT_CACHE_SEARCH_ENDPOINT = os.getenv("AGENT_CACHE_SEARCH_ENDPOINT", os.getenv("AZURE_SEARCH_ENDPOINT"))
+AGENT_CACHE_SEARCH_KEY = os.getenv("AGENT_CACHE_SEARCH_KEY", os.getenv("AZURE_SEARCH_KEY"))
+# Seconds an index version is reused before the statistics are read again
+AGENT_CACHE_INDEX_VERSION_TTL = float(os.getenv("AGENT_CACHE_INDEX_VERSION_TTL", "60"))
+AGENT_CACHE_COSMOS_CONTAINER = os.getenv("AGENT_CACHE_COSMOS_CONTAINER", "agent_cache")
+
+# Cosmos DB Write-Behind Buffer Configuration
+COSMOS_WRITE_BUFFER_ENABLED = os.getenv("COSMOS_WRITE_BUFFER_ENABLED", "true").lower() == "true"
+COSMOS_WRITE_BATCH_SIZE = int(os.getenv("COSMOS_WRITE_BATCH_SIZE", "10"))
+COSMOS_WRITE_FLUSH_INTERVAL = float(os.getenv("COSMOS_WRITE_FLUSH_INTERVAL", "2.0"))
+COSMOS_WRITE_SPILL_FILE = os.getenv(
+    "COSMOS_WRITE_SPILL_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cosmos_spill.jsonl")
+)
+COSMOS_WRITE_MAX_RETRIES = int(os.getenv("COSMOS_WRITE_MAX_RETRIES", "3"))
+
+# Prompt Context Configuration (token budgets for upstream findings)
+CONTEXT_TOKEN_CAP = int(os.getenv("CONTEXT_TOKEN_CAP", "600"))
+CONTEXT_SUMMARY_TOKEN_CAP = int(os.getenv("CONTEXT_SUMMARY_TOKEN_CAP", "1200"))
+CONTEXT_MAX_FACTS = int(os.getenv("CONTEXT_MAX_FACTS", "15"))
+CONTEXT_TOKENIZER_ENCODING = os.getenv("CONTEXT_TOKENIZER_ENCODING", "o200k_base")
+
+# Agent Response Streaming Configuration
+# Runs always stream while someone subscribes to a run's events; this also
+# streams (and prints progress) for console runs
+AGENT_STREAMING_ENABLED = os.getenv("AGENT_STREAMING_ENABLED", "false").lower() == "true"
+AGENT_STREAM_PARTIAL_INTERVAL = float(os.getenv("AGENT_STREAM_PARTIAL_INTERVAL", "0.5"))
+AGENT_STREAM_QUEUE_SIZE = int(os.getenv("AGENT_STREAM_QUEUE_SIZE", "1000"))
+
+# Pipeline Metrics Configuration
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the /metrics listener
+METRICS_TOOL_TIMING = os.getenv("METRICS_TOOL_TIMING", "true").lower() == "true"  # list run steps for search tool time
+
+# Stage Email Outbox Configuration
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "true").lower() == "true"  # false sends inline
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "2"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_BACKOFF_BASE = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE", "1.0"))
+EMAIL_OUTBOX_BACKOFF_MAX = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX", "30"))
+EMAIL_OUTBOX_HTTP_TIMEOUT = float(os.getenv("EMAIL_OUTBOX_HTTP_TIMEOUT", "15"))
+EMAIL_OUTBOX_POOL_SIZE = int(os.getenv("EMAIL_OUTBOX_POOL_SIZE", "10"))
+EMAIL_OUTBOX_CLAIM_TTL = float(os.getenv("EMAIL_OUTBOX_CLAIM_TTL", "300"))  # seconds before an unfinished claim can be retaken
+EMAIL_OUTBOX_DRAIN_TIMEOUT = float(os.getenv("EMAIL_OUTBOX_DRAIN_TIMEOUT", "60"))
+
+# Pipeline Checkpoint Configuration
+PIPELINE_CHECKPOINT_ENABLED = os.getenv("PIPELINE_CHECKPOINT_ENABLED", "true").lower() == "true"
+PIPELINE_CHECKPOINT_BACKEND = os.getenv("PIPELINE_CHECKPOINT_BACKEND", "auto")  # auto (Cosmos when connected) | cosmos | file
+PIPELINE_CHECKPOINT_DIR = os.getenv(
+    "PIPELINE_CHECKPOINT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".checkpoints")
+)
+PIPELINE_CHECKPOINT_MAX_AGE = float(os.getenv("PIPELINE_CHECKPOINT_MAX_AGE", "24"))  # hours an unfinished run stays resumable
+# Continue a customer's latest unfinished run when no run ID is given; off by default so a
+# new verification request never reuses step results from an earlier run
+PIPELINE_CHECKPOINT_AUTO_RESUME = os.getenv("PIPELINE_CHECKPOINT_AUTO_RESUME", "false").lower() == "true"
+
+# Customer ID Allocation Configuration (hi/lo blocks, RestAPI/applicationAPI/customer_ids.py)
+# ODBC connection string of the SQL database holding dbo.Customer_ID_Hi (created on first use)
+CUSTOMER_ID_SQL_CONNECTION_STRING = os.getenv("CUSTOMER_ID_SQL_CONNECTION_STRING", "")
+# Development only: without the SQL connection, issue IDs from a local SQLite sequence starting at
+# CUSTOMER_ID_FLOOR. It is unaware of existing customers and not shared between hosts, so it is off by default
+CUSTOMER_ID_LOCAL_SEQUENCE = os.getenv("CUSTOMER_ID_LOCAL_SEQUENCE", "false").lower() == "true"
+CUSTOMER_ID_SQLITE_PATH = os.getenv(
+    "CUSTOMER_ID_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".customer_ids.sqlite3")
+)
+
+# Azure Client Factory Configuration (shared credential, project client and connection IDs)
+CLIENT_TOKEN_REFRESH_MARGIN = float(os.getenv("CLIENT_TOKEN_REFRESH_MARGIN", "300"))  # seconds before expiry a token is refreshed
+CLIENT_CONNECTION_TTL = float(os.getenv("CLIENT_CONNECTION_TTL", "3600"))  # seconds a resolved connection ID is reused
+
+# Rate Limit Configuration (AIMD concurrency window per model deployment, orch_ratelimit.py)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+AGENT_MODEL_DEPLOYMENT = os.getenv("AGENT_MODEL_DEPLOYMENT", "gpt-4o")  # deployment behind the verification agents
+RATE_LIMIT_INITIAL_CONCURRENCY = float(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "4"))
+RATE_LIMIT_MIN_CONCURRENCY = float(os.getenv("RATE_LIMIT_MIN_CONCURRENCY", "1"))
+RATE_LIMIT_MAX_CONCURRENCY = float(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "32"))
+RATE_LIMIT_INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", "1"))  # window growth per window of successful calls
+RATE_LIMIT_DECREASE = float(os.getenv("RATE_LIMIT_DECREASE", "0.5"))  # window multiplier on 429/503
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "2.0"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+# JSON map of deployment -> window bounds, e.g. {"gpt-4o": {"initial": 8, "max": 24}}
+RATE_LIMIT_DEPLOYMENT_LIMITS = json.loads(os.getenv("RATE_LIMIT_DEPLOYMENT_LIMITS", "{}"))
@@ -0,0 +1,209 @@
+"""
+Structured, token-budgeted context for downstream agent prompts.
+
+Instead of concatenating every upstream response, each agent result is
+reduced once per run to an AgentDigest: its status, the "Field: value" facts
+found in the response and a short narrative excerpt. A verification step is
+handed only the facts it declares in VerificationStep.context_fields, and the
+rendered block is capped at a token budget measured with the model tokenizer
+(tiktoken) when it is installed, or a characters-per-token estimate otherwise.
+"""
+
+import json
+import re
+
+from orch_config import (
+    CONTEXT_TOKEN_CAP,
+    CONTEXT_SUMMARY_TOKEN_CAP,
+    CONTEXT_MAX_FACTS,
+    CONTEXT_TOKENIZER_ENCODING,
+)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER_ENCODING)
+except ImportError:
+    _encoding = None
+except Exception as e:
+    print(f"⚠️ Tokenizer '{CONTEXT_TOKENIZER_ENCODING}' unavailable, estimating tokens from length: {str(e)}")
+    _encoding = None
+
+# Rough characters per token for English prose when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+# "- **Full Name:** Jane Doe", "PAN Number: ABCDE1234F", "2. Monthly Income: 85,000"
+_FACT_LINE = re.compile(
+    r"^\s*(?:[-*•]|\d+[.)])?\s*\**\s*([A-Za-z][A-Za-z0-9 /()&'.-]{1,60}?)\s*\**\s*:\s*\**\s*(.+?)\s*\**\s*$"
+)
+_MAX_FACT_VALUE_CHARS = 200
+
+PIPELINE_RESULT_KEYS = ["identity", "income", "guarantor", "inspection", "valuation", "underwriting", "loan_offer"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Number of prompt tokens the text will use"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return _encoding.decode(tokens[:max_tokens]).rstrip() + "…"
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def normalize_field(name: str) -> str:
+    """'Date of Birth' -> 'date_of_birth'"""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def _flatten_json(value, prefix="", facts=None):
+    facts = {} if facts is None else facts
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten_json(item, f"{prefix}{normalize_field(str(key))}.", facts)
+    elif not isinstance(value, list) and value not in (None, ""):
+        facts.setdefault(prefix.rstrip("."), str(value)[:_MAX_FACT_VALUE_CHARS])
+    return facts
+
+
+def extract_facts(response: str):
+    """Split a response into ({field: value} facts, remaining narrative lines)
+
+    JSON responses are flattened to dotted scalar fields; free-text responses
+    contribute their "Field: value" lines. The first value seen for a field wins.
+    """
+    text = (response or "").strip()
+    if text.startswith("{"):
+        try:
+            return _flatten_json(json.loads(text)), []
+        except json.JSONDecodeError:
+            pass
+
+    facts, narrative = {}, []
+    for line in text.splitlines():
+        match = _FACT_LINE.match(line)
+        if match and match.group(2).strip("*: "):
+            field = normalize_field(match.group(1))
+            if field and field not in facts:
+                facts[field] = match.group(2).strip("*: ")[:_MAX_FACT_VALUE_CHARS]
+                continue
+        stripped = line.strip(" #*-\t")
+        if stripped:
+            narrative.append(stripped)
+    return facts, narrative
+
+
+def _field_tokens(name: str) -> tuple:
+    """'Date of Birth' / 'applicant.date_of_birth' -> ('date', 'of', 'birth') words"""
+    return tuple(token for token in re.split(r"[^a-z0-9]+", name.lower()) if token)
+
+
+def _contains_tokens(tokens: tuple, wanted: tuple) -> bool:
+    """True if wanted occurs as a contiguous run of whole tokens"""
+    size = len(wanted)
+    return size > 0 and any(tokens[i:i + size] == wanted for i in range(len(tokens) - size + 1))
+
+
+def _result_hash(result: dict) -> int:
+    return hash((result.get("status"), result.get("full_response") or result.get("summary") or ""))
+
+
+class AgentDigest:
+    """Facts and excerpt extracted once from one agent result"""
+
+    __slots__ = ("key", "status", "facts", "excerpt", "source_hash")
+
+    def __init__(self, key: str, result: dict):
+        self.key = key
+        self.status = result.get("status", "unknown")
+        source = result.get("full_response") or result.get("summary") or ""
+        self.source_hash = _result_hash(result)
+        self.facts, narrative = extract_facts(source)
+        self.excerpt = " ".join(narrative)
+
+    def select(self, fields=()):
+        """Facts whose name contains one of the requested fields as whole words (all if none requested)
+
+        "pan" selects pan_number but not company, "age" selects age but not mortgage.
+        """
+        wanted = [_field_tokens(field) for field in fields]
+        selected = [
+            (name, value) for name, value in self.facts.items()
+            if not wanted or any(_contains_tokens(_field_tokens(name), tokens) for tokens in wanted)
+        ]
+        return selected[:CONTEXT_MAX_FACTS]
+
+    def render(self, label: str, fields=(), max_tokens: int = CONTEXT_TOKEN_CAP) -> str:
+        """Fact block for this agent, trimmed to max_tokens"""
+        lines = [f"{label.upper()} (status: {self.status}):"]
+        used = estimate_tokens(lines[0])
+        for name, value in self.select(fields):
+            line = f"- {name}: {value}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        # Narrative notes never take more than a third of the agent's budget
+        remaining = min(max_tokens - used, max_tokens // 3) - 2
+        if self.excerpt and remaining > 8:
+            lines.append(f"Notes: {truncate_to_tokens(self.excerpt, remaining)}")
+        return "\n".join(lines)
+
+
+class ContextBuilder:
+    """Builds bounded prompt context from a VerificationRun's agent results"""
+
+    def __init__(self, run, graph, token_cap: int = None, summary_token_cap: int = None):
+        self.run = run
+        self.graph = graph
+        self.token_cap = token_cap or CONTEXT_TOKEN_CAP
+        self.summary_token_cap = summary_token_cap or CONTEXT_SUMMARY_TOKEN_CAP
+
+    def digest(self, key: str):
+        """Digest of an agent result, extracted once and cached on the run"""
+        result = self.run.agent_results.get(key)
+        if result is None:
+            return None
+        digest = self.run.context_digests.get(key)
+        if digest is None or digest.source_hash != _result_hash(result):
+            digest = AgentDigest(key, result)
+            self.run.context_digests[key] = digest
+        return digest
+
+    def _label(self, key: str) -> str:
+        step = self.graph.steps.get(key)
+        return step.label if step else key.replace("_", " ").title()
+
+    def _render(self, keys, fields, token_cap: int) -> str:
+        digests = [digest for digest in (self.digest(key) for key in keys) if digest is not None]
+        if not digests:
+            return ""
+        per_agent = token_cap // len(digests)
+        return "\n\n".join(digest.render(self._label(digest.key), fields, per_agent) for digest in digests)
+
+    def for_step(self, step) -> str:
+        """Context for a verification step: the declared fields of its dependencies only"""
+        context = self._render(self.graph.dependencies(step.key), step.context_fields, self.token_cap)
+        self.run.context_tokens[step.key] = estimate_tokens(context)
+        return context
+
+    def summary(self, stage: str, keys=None) -> str:
+        """Budgeted digest of every available result, for the post-verification stages"""
+        keys = keys if keys is not None else [key for key in PIPELINE_RESULT_KEYS if key in self.run.agent_results]
+        context = self._render(keys, (), self.summary_token_cap)
+        self.run.context_tokens[stage] = estimate_tokens(context)
+        return context
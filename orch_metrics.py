@@ -0,0 +1,192 @@
+"""
+Latency and token instrumentation for the verification pipeline.
+
+Every timed stage (queue wait, thread creation, run polling, search tool time,
+Cosmos writes, email dispatch, ...) is recorded three ways:
+
+* on the VerificationRun, as a per-customer breakdown (run.stage_timings)
+* in process-wide Prometheus-style histograms, rendered by render_prometheus()
+  and served on METRICS_PORT when it is set
+* as an OpenTelemetry span, when opentelemetry-api is installed (spans are
+  exported by whatever SDK/exporter the hosting process configures)
+
+Token usage reported by agent runs is kept the same way (run.token_usage and
+the loan_agent_tokens histogram).
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from orch_config import METRICS_PORT
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("loan_verification")
+except ImportError:
+    _tracer = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with Prometheus text exposition"""
+
+    def __init__(self, name: str, documentation: str, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def _labels(self, key, extra: str = "") -> str:
+        parts = [f'{name}="{value}"' for name, value in zip(self.label_names, key) if value]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{self._labels(key, inf)} {series['count']}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{self._labels(key)} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "loan_pipeline_stage_duration_seconds",
+    "Duration of verification pipeline stages",
+    ("stage", "name"),
+    LATENCY_BUCKETS
+)
+AGENT_TOKENS = Histogram(
+    "loan_agent_tokens",
+    "Tokens used per agent run",
+    ("name", "kind"),
+    TOKEN_BUCKETS
+)
+HISTOGRAMS = [STAGE_SECONDS, AGENT_TOKENS]
+
+
+def record_stage(run, stage: str, seconds: float, name: str = ""):
+    """Record a stage duration on the run and in the stage histogram"""
+    STAGE_SECONDS.observe(seconds, stage=stage, name=name)
+    if run is not None:
+        key = f"{stage}:{name}" if name else stage
+        timing = run.stage_timings.setdefault(key, {"count": 0, "total_ms": 0.0})
+        timing["count"] += 1
+        timing["total_ms"] = round(timing["total_ms"] + seconds * 1000, 1)
+
+
+class StageTiming:
+    """Elapsed time of a stage_timer block, available once the block exits"""
+
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    @property
+    def ms(self) -> float:
+        return self.seconds * 1000
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str, run=None, name: str = "", **attributes):
+    """Time a block as a pipeline stage (and an OpenTelemetry span when available)
+
+    Yields a StageTiming whose seconds are set when the block exits.
+    """
+    timing = StageTiming()
+    span_cm = contextlib.nullcontext()
+    if _tracer is not None:
+        span_attributes = {"stage": stage, "name": name, **attributes}
+        if run is not None:
+            span_attributes.update({"customer_id": run.customer_id, "run_id": run.run_id})
+        span_cm = _tracer.start_as_current_span(f"loan.{stage}", attributes=span_attributes)
+    start = time.perf_counter()
+    with span_cm:
+        try:
+            yield timing
+        finally:
+            timing.seconds = time.perf_counter() - start
+            record_stage(run, stage, timing.seconds, name)
+
+
+def record_token_usage(run, name: str, usage):
+    """Record a run's token usage (RunCompletionUsage or dict) for an agent"""
+    if usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else (lambda field: getattr(usage, field, None))
+    counts = {kind: get(kind) for kind in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    counts = {kind: int(value) for kind, value in counts.items() if value is not None}
+    for kind, value in counts.items():
+        AGENT_TOKENS.observe(value, name=name, kind=kind.replace("_tokens", ""))
+    if run is not None and counts:
+        totals = run.token_usage.setdefault(name, {})
+        for kind, value in counts.items():
+            totals[kind] = totals.get(kind, 0) + value
+    if _tracer is not None and counts:
+        span = trace.get_current_span()
+        for kind, value in counts.items():
+            span.set_attribute(f"tokens.{kind}", value)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int = None):
+    """Serve /metrics on a background thread (no-op when no port is configured)"""
+    global _server
+    port = port if port is not None else METRICS_PORT
+    if not port or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Serving metrics on :{port}/metrics")
+    return _server
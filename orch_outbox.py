@@ -0,0 +1,353 @@
+"""
+Notification outbox for stage emails.
+
+Pipeline stages enqueue an email (customer_id + stage) and move on; a small
+pool of asyncio workers sends it in the background, retrying transient
+failures (timeouts, connection errors, HTTP 429/5xx) with exponential backoff
+and honouring Retry-After. Each customer_id + stage is sent at most once:
+within a process through the outbox's own key set, and across re-runs and
+processes through an "email_notification" document in the customer's Cosmos
+partition that is claimed before sending and marked sent afterwards.
+
+Logic App calls go through one pooled HTTP session (aiohttp when installed,
+otherwise a requests.Session used from worker threads).
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from orch_config import (
+    EMAIL_OUTBOX_ENABLED,
+    EMAIL_OUTBOX_WORKERS,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_BACKOFF_BASE,
+    EMAIL_OUTBOX_BACKOFF_MAX,
+    EMAIL_OUTBOX_HTTP_TIMEOUT,
+    EMAIL_OUTBOX_POOL_SIZE,
+    EMAIL_OUTBOX_CLAIM_TTL,
+    EMAIL_OUTBOX_DRAIN_TIMEOUT,
+)
+from orch_versioning import read_existing
+from orch_metrics import record_stage, stage_timer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+RETRYABLE_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_EXCEPTIONS = (TimeoutError, ConnectionError, requests.ConnectionError, requests.Timeout)
+# Only these transport results count as delivered; "fallback" and anything unknown did not send an email
+DELIVERED_STATUSES = {"submitted", "success", "sent"}
+
+SENT = "sent"
+SENDING = "sending"
+FAILED = "failed"
+
+
+class RetryableEmailError(Exception):
+    """Transient send failure; retry_after is the delay the server asked for, if any"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpEmailTransport:
+    """POSTs template emails to the Logic App over one pooled HTTP session"""
+
+    def __init__(self, url: str, build_payload, timeout: float = None, pool_size: int = None):
+        self.url = url
+        self.build_payload = build_payload
+        self.timeout = timeout or EMAIL_OUTBOX_HTTP_TIMEOUT
+        self.pool_size = pool_size or EMAIL_OUTBOX_POOL_SIZE
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            if aiohttp is not None:
+                self._session = aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    connector=aiohttp.TCPConnector(limit=self.pool_size)
+                )
+            else:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+        return self._session
+
+    async def _post(self, payload: dict):
+        """(HTTP status, Retry-After header) of one POST"""
+        session = self._get_session()
+        if aiohttp is not None:
+            try:
+                async with session.post(self.url, json=payload) as response:
+                    await response.read()
+                    return response.status, response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise RetryableEmailError(f"{type(e).__name__}: {str(e)}")
+        try:
+            response = await asyncio.to_thread(session.post, self.url, json=payload, timeout=self.timeout)
+            return response.status_code, response.headers.get("Retry-After")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableEmailError(f"{type(e).__name__}: {str(e)}")
+
+    async def send(self, customer_id: str, stage: str) -> dict:
+        payload, error = self.build_payload(customer_id, stage)
+        if error:
+            return error
+        status, retry_after = await self._post(payload)
+        if status in RETRYABLE_HTTP_STATUSES:
+            raise RetryableEmailError(f"HTTP {status}", _retry_after(retry_after))
+        if status >= 400:
+            return {"status": "error", "customer_id": customer_id, "stage": stage, "http_status": status,
+                    "message": f"Logic App rejected the email with HTTP {status}"}
+        return {"status": "submitted", "customer_id": customer_id, "stage": stage,
+                "template_name": payload.get("template_name"), "http_status": status}
+
+    async def close(self):
+        if self._session is not None:
+            if aiohttp is not None:
+                await self._session.close()
+            else:
+                self._session.close()
+            self._session = None
+
+
+class CallableEmailTransport:
+    """Sends with a blocking function such as send_email_template, off the event loop
+
+    Error results flagged "retryable" or carrying a retryable http_status, and
+    timeouts / connection errors raised by the function, are retried by the
+    outbox; any other error result is final.
+    """
+
+    def __init__(self, send_function):
+        self.send_function = send_function
+
+    async def send(self, customer_id: str, stage: str) -> dict:
+        try:
+            result = await asyncio.to_thread(self.send_function, customer_id, stage)
+        except TRANSIENT_EXCEPTIONS as e:
+            raise RetryableEmailError(f"{type(e).__name__}: {str(e)}")
+        except Exception as e:
+            return {"status": "error", "customer_id": customer_id, "stage": stage,
+                    "message": f"{type(e).__name__}: {str(e)}"}
+        if result.get("status") == "error" and (
+                result.get("retryable") or result.get("http_status") in RETRYABLE_HTTP_STATUSES):
+            raise RetryableEmailError(result.get("message", "send failed"), _retry_after(result.get("retry_after")))
+        return result
+
+    async def close(self):
+        pass
+
+
+class EmailOutbox:
+    """Deduplicated background delivery of stage emails"""
+
+    def __init__(self, transport, cosmos_service=None, workers: int = None, max_attempts: int = None,
+                 enabled: bool = None):
+        self.transport = transport
+        self.cosmos_service = cosmos_service
+        self.workers = workers or EMAIL_OUTBOX_WORKERS
+        self.max_attempts = max_attempts or EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.enabled = EMAIL_OUTBOX_ENABLED if enabled is None else enabled
+        self._keys = {}
+        self._queue = None
+        self._worker_tasks = []
+        self.counts = {"queued": 0, "duplicate": 0, SENT: 0, FAILED: 0}
+
+    @staticmethod
+    def idempotency_key(customer_id: str, stage: str) -> str:
+        return f"{customer_id}:{stage}"
+
+    @staticmethod
+    def notification_id(customer_id: str, stage: str) -> str:
+        """Deterministic ID of the email_notification document for a customer and stage"""
+        return f"{customer_id}_email_{stage}"
+
+    def _container(self):
+        return getattr(self.cosmos_service, "container", None)
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker_tasks = [
+                asyncio.create_task(self._worker(), name=f"email-outbox-{i + 1}")
+                for i in range(max(1, self.workers))
+            ]
+
+    async def enqueue(self, run, stage: str) -> dict:
+        """Queue a stage email for a run's customer without waiting for delivery
+
+        Returns {"status": "queued"} or {"status": "duplicate"}; when the outbox
+        is disabled the email is delivered inline and the send result returned.
+        """
+        key = self.idempotency_key(run.customer_id, stage)
+        if self._keys.get(key) in ("queued", SENDING, SENT):
+            self.counts["duplicate"] += 1
+            return {"status": "duplicate", "customer_id": run.customer_id, "stage": stage}
+        self._keys[key] = "queued"
+        job = {"run": run, "stage": stage, "key": key, "queued_at": time.perf_counter()}
+        if not self.enabled:
+            return await self._deliver(job)
+        self._start()
+        self.counts["queued"] += 1
+        self._queue.put_nowait(job)
+        return {"status": "queued", "customer_id": run.customer_id, "stage": stage}
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(job)
+            except Exception as e:
+                self._keys[job["key"]] = FAILED
+                print(f"⚠️ Email outbox error for {job['key']}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, customer_id: str, stage: str, run_id: str) -> bool:
+        """Claim the customer + stage notification in Cosmos; False if it was already sent or claimed"""
+        container = self._container()
+        if container is None:
+            return True
+        doc_id = self.notification_id(customer_id, stage)
+        try:
+            existing = await read_existing(container, doc_id, customer_id)
+            if existing is not None:
+                if existing.get("status") == SENT:
+                    return False
+                claimed_at = existing.get("claimed_at_epoch", 0)
+                if existing.get("status") == SENDING and time.time() - claimed_at < EMAIL_OUTBOX_CLAIM_TTL:
+                    return False
+            document = {
+                "id": doc_id,
+                "customer_id": customer_id,
+                "document_type": "email_notification",
+                "stage": stage,
+                "run_id": run_id,
+                "status": SENDING,
+                "claimed_at_epoch": time.time(),
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            if existing is None:
+                await container.create_item(body=document)
+            else:
+                await container.replace_item(
+                    item=doc_id,
+                    body=document,
+                    etag=existing.get("_etag"),
+                    match_condition=MatchConditions.IfNotModified
+                )
+            return True
+        except (exceptions.CosmosResourceExistsError, exceptions.CosmosAccessConditionFailedError):
+            # Another run claimed it between our read and write
+            return False
+        except Exception as e:
+            # Without the ledger, sending beats silently dropping the email
+            print(f"⚠️ Email ledger unavailable for {customer_id}/{stage}, sending anyway: {str(e)}")
+            return True
+
+    async def _record(self, customer_id: str, stage: str, run_id: str, status: str, attempts: int, result: dict):
+        container = self._container()
+        if container is None:
+            return
+        try:
+            await container.upsert_item(body={
+                "id": self.notification_id(customer_id, stage),
+                "customer_id": customer_id,
+                "document_type": "email_notification",
+                "stage": stage,
+                "run_id": run_id,
+                "status": status,
+                "attempts": attempts,
+                "result_status": result.get("status"),
+                "message": result.get("message"),
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            })
+        except Exception as e:
+            print(f"⚠️ Failed to record email {status} for {customer_id}/{stage}: {str(e)}")
+
+    def _backoff(self, attempt: int, retry_after: float = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, EMAIL_OUTBOX_BACKOFF_MAX)
+        delay = min(EMAIL_OUTBOX_BACKOFF_MAX, EMAIL_OUTBOX_BACKOFF_BASE * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _deliver(self, job) -> dict:
+        """Claim, send with retries and record one email"""
+        run, stage, key = job["run"], job["stage"], job["key"]
+        customer_id = run.customer_id
+        record_stage(run, "email_queue_wait", time.perf_counter() - job["queued_at"], stage)
+
+        if not await self._claim(customer_id, stage, run.run_id):
+            self._keys[key] = SENT
+            self.counts["duplicate"] += 1
+            print(f"⏭️  {stage} email for customer {customer_id} already sent")
+            return {"status": "duplicate", "customer_id": customer_id, "stage": stage}
+
+        self._keys[key] = SENDING
+        result = {"status": "error", "message": "not sent"}
+        attempt = 0
+        with stage_timer("email_dispatch", run, stage):
+            while attempt < self.max_attempts:
+                attempt += 1
+                try:
+                    result = await self.transport.send(customer_id, stage)
+                    break
+                except RetryableEmailError as e:
+                    result = {"status": "error", "message": str(e)}
+                    if attempt < self.max_attempts:
+                        delay = self._backoff(attempt, e.retry_after)
+                        print(f"🔁 {stage} email for {customer_id} failed ({str(e)}), retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+
+        status = SENT if result.get("status") in DELIVERED_STATUSES else FAILED
+        self._keys[key] = status
+        self.counts[status] += 1
+        await self._record(customer_id, stage, run.run_id, status, attempt, result)
+        if status == SENT:
+            print(f"📧 {stage} email delivered for customer {customer_id} ({result.get('status')})")
+        else:
+            print(f"⚠️ {stage} email for customer {customer_id} not delivered after {attempt} attempt(s) "
+                  f"({result.get('status')}): {result.get('message')}")
+        return result
+
+    async def drain(self, timeout: float = None):
+        """Wait until every queued email has been delivered or given up on"""
+        if self._queue is None:
+            return True
+        timeout = timeout if timeout is not None else EMAIL_OUTBOX_DRAIN_TIMEOUT
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"⚠️ Email outbox still had {self._queue.qsize()} queued email(s) after {timeout:.0f}s")
+            return False
+
+    async def close(self, timeout: float = None):
+        """Drain pending emails, stop the workers and release the HTTP session"""
+        await self.drain(timeout)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+        await self.transport.close()
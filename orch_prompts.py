@@ -0,0 +1,97 @@
+"""
+Cached, hot-reloadable store for the instruction and prompt files.
+
+All files in the instructions directory are read once and kept in memory,
+keyed by file name together with the mtime/size they were read at. A file is
+re-read only when it changes on disk, and every entry carries a SHA-256
+content hash that callers can use for cache keys and audit records.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from orch_config import PROMPT_RELOAD_CHECK_INTERVAL
+
+INSTRUCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instructions')
+
+
+class PromptEntry:
+    """A loaded prompt file and the file state it was read at"""
+
+    __slots__ = ("name", "text", "mtime_ns", "size", "sha256", "checked_at")
+
+    def __init__(self, name: str, text: str, mtime_ns: int, size: int):
+        self.name = name
+        self.text = text
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.checked_at = time.monotonic()
+
+
+class PromptStore:
+    """In-memory prompt cache that reloads a file only when it changes on disk"""
+
+    def __init__(self, directory: str = INSTRUCTIONS_DIR, check_interval: float = None):
+        self.directory = directory
+        self.check_interval = PROMPT_RELOAD_CHECK_INTERVAL if check_interval is None else check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read(self, name: str, stat: os.stat_result) -> PromptEntry:
+        with open(self._path(name), 'r', encoding='utf-8') as f:
+            text = f.read()
+        return PromptEntry(name, text, stat.st_mtime_ns, stat.st_size)
+
+    def load_all(self) -> int:
+        """Eagerly load every .txt file in the directory; returns the number loaded"""
+        count = 0
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.txt'):
+                self.entry(name)
+                count += 1
+        return count
+
+    def entry(self, name: str) -> PromptEntry:
+        """Return the cached entry for a file, reloading it if it changed on disk"""
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(name)
+            stat = os.stat(self._path(name))
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                if entry is not None:
+                    print(f"🔄 Reloading changed prompt file {name}")
+                entry = self._read(name, stat)
+                self._entries[name] = entry
+            else:
+                entry.checked_at = now
+            return entry
+
+    def get(self, name: str) -> str:
+        """Prompt text for a file in the instructions directory"""
+        return self.entry(name).text
+
+    def content_hash(self, name: str) -> str:
+        """SHA-256 of the current content of a prompt file"""
+        return self.entry(name).sha256
+
+    def invalidate(self, name: str = None):
+        """Drop one cached file (or all of them) so the next access re-reads it"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+# Shared store for orch.py and the agent factories in agents/
+prompt_store = PromptStore()
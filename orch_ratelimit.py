@@ -0,0 +1,318 @@
+"""
+Rate-limit aware throttling of Azure OpenAI / agent calls.
+
+One AdaptiveLimiter per model deployment bounds how many calls (agent runs,
+completions) are in flight against it. The window grows additively while
+calls succeed and is cut multiplicatively when the service answers 429/503 or
+an agent run fails with rate_limit_exceeded (AIMD), and a Retry-After from the
+service pauses new calls on that deployment until it has passed. Pipelines
+running many customers at once therefore settle just under the deployment's
+TPM quota instead of repeatedly overrunning it.
+
+Async callers use `async with limiter.slot()`, blocking callers (thread pool
+code, scripts) `with limiter.slot_sync()`; both share the same window.
+"""
+
+import asyncio
+import contextlib
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from orch_config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_INITIAL_CONCURRENCY,
+    RATE_LIMIT_MIN_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    RATE_LIMIT_INCREASE,
+    RATE_LIMIT_DECREASE,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE,
+    RATE_LIMIT_BACKOFF_MAX,
+    RATE_LIMIT_DEPLOYMENT_LIMITS,
+)
+
+THROTTLE_HTTP_STATUSES = {429, 503}
+RETRY_AFTER_HEADERS = ("retry-after-ms", "x-ms-retry-after-ms", "retry-after")
+RATE_LIMIT_RUN_ERROR_CODES = {"rate_limit_exceeded"}
+_TRY_AGAIN_PATTERN = re.compile(r"try again in (\d+(?:\.\d+)?) ?(ms|milliseconds|s|sec|seconds)?", re.IGNORECASE)
+
+
+def _retry_after_from_text(text: str):
+    match = _TRY_AGAIN_PATTERN.search(text or "")
+    if not match:
+        return None
+    value = float(match.group(1))
+    return value / 1000 if (match.group(2) or "").lower() in ("ms", "milliseconds") else value
+
+
+def _retry_after_from_headers(headers):
+    for name in RETRY_AFTER_HEADERS:
+        value = headers.get(name) if headers else None
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue  # HTTP-date form, fall back to backoff
+        return seconds / 1000 if name.endswith("-ms") else seconds
+    return None
+
+
+def throttle_signal(error):
+    """(status, retry_after seconds or None) if an exception is a 429/503 throttle, else None
+
+    Only the structured HTTP status (error.status_code or error.response) counts;
+    the message text is never searched for status codes, which would misread IDs
+    or amounts as throttles.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None) \
+        or getattr(response, "status", None)
+    if status not in THROTTLE_HTTP_STATUSES:
+        return None
+    retry_after = _retry_after_from_headers(getattr(response, "headers", None))
+    if retry_after is None:
+        retry_after = _retry_after_from_text(str(error))
+    return status, retry_after
+
+
+def run_throttle_signal(run):
+    """(429, retry_after) if an agent run failed because the deployment was rate limited, else None"""
+    last_error = getattr(run, "last_error", None)
+    if not last_error:
+        return None
+    code = last_error.get("code") if isinstance(last_error, dict) else getattr(last_error, "code", None)
+    if str(code).lower() not in RATE_LIMIT_RUN_ERROR_CODES:
+        return None
+    message = last_error.get("message") if isinstance(last_error, dict) else getattr(last_error, "message", "")
+    return 429, _retry_after_from_text(message)
+
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Delay before retry number attempt (1-based), honouring the service's Retry-After"""
+    if retry_after is not None:
+        return min(retry_after, RATE_LIMIT_BACKOFF_MAX)
+    delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class LimiterSlot:
+    """One admitted call; mark it throttled() when the service pushed back"""
+
+    def __init__(self, limiter, started: float):
+        self.limiter = limiter
+        self.started = started
+        self.throttle = None
+
+    def throttled(self, status: int, retry_after: float = None):
+        """Record the HTTP status the caller detected (429 or 503) and the service's Retry-After"""
+        self.throttle = (status, retry_after)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window for one model deployment"""
+
+    def __init__(self, name: str, initial: float = None, minimum: float = None, maximum: float = None,
+                 increase: float = None, decrease: float = None):
+        self.name = name
+        self.minimum = max(1.0, minimum or RATE_LIMIT_MIN_CONCURRENCY)
+        self.maximum = max(self.minimum, maximum or RATE_LIMIT_MAX_CONCURRENCY)
+        self.limit = min(self.maximum, max(self.minimum, initial or RATE_LIMIT_INITIAL_CONCURRENCY))
+        self.increase = increase or RATE_LIMIT_INCREASE
+        self.decrease = decrease or RATE_LIMIT_DECREASE
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"admitted": 0, "throttled": 0, "decreases": 0}
+        self._lock = threading.Lock()
+        self._sync_waiters = threading.Condition(self._lock)
+        self._async_waiters = deque()
+
+    def _try_admit(self, now: float):
+        """Admit a call if the window and any Retry-After pause allow it; else seconds to wait (or None)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return 0.0
+        return None
+
+    def _wake(self):
+        """Let every waiter re-check the window (caller holds the lock)"""
+        self._sync_waiters.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, future)
+
+    async def acquire(self) -> float:
+        """Wait for room in the window; returns the admission time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                wait = self._try_admit(time.monotonic())
+                if wait == 0.0:
+                    return time.monotonic()
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            try:
+                await asyncio.wait({future}, timeout=wait)
+            finally:
+                with self._lock:
+                    if (loop, future) in self._async_waiters:
+                        self._async_waiters.remove((loop, future))
+
+    def acquire_sync(self) -> float:
+        with self._lock:
+            while True:
+                wait = self._try_admit(time.monotonic())
+                if wait == 0.0:
+                    return time.monotonic()
+                self._sync_waiters.wait(timeout=wait)
+
+    def release(self, started: float, throttle=None):
+        """Return a slot, adapting the window to how the call went"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if throttle is None:
+                # Additive increase: about +increase per window's worth of successes
+                self.limit = min(self.maximum, self.limit + self.increase / max(self.limit, 1.0))
+            else:
+                self.stats["throttled"] += 1
+                status, retry_after = throttle
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                # Calls admitted before the last cut saw the old window; only cut once per congestion event
+                if started >= self.last_decrease:
+                    previous = self.limit
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.last_decrease = now
+                    self.stats["decreases"] += 1
+                    print(f"🚦 {self.name}: HTTP {status} - concurrency {previous:.1f} → {self.limit:.1f}"
+                          + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+            self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        started = await self.acquire()
+        slot = LimiterSlot(self, started)
+        throttle = None
+        try:
+            yield slot
+            throttle = slot.throttle
+        except BaseException as e:
+            throttle = slot.throttle or throttle_signal(e)
+            raise
+        finally:
+            self.release(started, throttle)
+
+    @contextlib.contextmanager
+    def slot_sync(self):
+        started = self.acquire_sync()
+        slot = LimiterSlot(self, started)
+        throttle = None
+        try:
+            yield slot
+            throttle = slot.throttle
+        except BaseException as e:
+            throttle = slot.throttle or throttle_signal(e)
+            raise
+        finally:
+            self.release(started, throttle)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "deployment": self.name,
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                **self.stats
+            }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Unlimited:
+    """Stand-in limiter when RATE_LIMIT_ENABLED is false"""
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        yield LimiterSlot(self, time.monotonic())
+
+    @contextlib.contextmanager
+    def slot_sync(self):
+        yield LimiterSlot(self, time.monotonic())
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_unlimited = _Unlimited()
+
+
+def get_limiter(deployment: str):
+    """Process-wide limiter of a model deployment"""
+    if not RATE_LIMIT_ENABLED:
+        return _unlimited
+    with _limiters_lock:
+        limiter = _limiters.get(deployment)
+        if limiter is None:
+            overrides = RATE_LIMIT_DEPLOYMENT_LIMITS.get(deployment, {})
+            limiter = AdaptiveLimiter(
+                deployment,
+                initial=overrides.get("initial"),
+                minimum=overrides.get("min"),
+                maximum=overrides.get("max")
+            )
+            _limiters[deployment] = limiter
+        return limiter
+
+
+def limiter_snapshots() -> list:
+    with _limiters_lock:
+        return [limiter.snapshot() for limiter in _limiters.values()]
+
+
+async def call_with_rate_limit(deployment: str, func, *args, max_retries: int = None, **kwargs):
+    """Await func(*args, **kwargs) inside the deployment's window, retrying throttled calls"""
+    max_retries = RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+    limiter = get_limiter(deployment)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            async with limiter.slot():
+                return await func(*args, **kwargs)
+        except Exception as e:
+            signal = throttle_signal(e)
+            if signal is None or attempt > max_retries:
+                raise
+            delay = backoff_delay(attempt, signal[1])
+            print(f"🔁 {deployment} throttled (HTTP {signal[0]}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def call_with_rate_limit_sync(deployment: str, func, *args, max_retries: int = None, **kwargs):
+    """Blocking counterpart of call_with_rate_limit"""
+    max_retries = RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+    limiter = get_limiter(deployment)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with limiter.slot_sync():
+                return func(*args, **kwargs)
+        except Exception as e:
+            signal = throttle_signal(e)
+            if signal is None or attempt > max_retries:
+                raise
+            delay = backoff_delay(attempt, signal[1])
+            print(f"🔁 {deployment} throttled (HTTP {signal[0]}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,54 @@
+"""
+Per-customer verification run context.
+
+A VerificationRun carries everything one orchestration used to keep in
+orch.py module globals (agent results, shared context and the customer ID),
+so a single process can verify many customers concurrently.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+from orch_streaming import RunEventBus
+
+
+def new_shared_context() -> dict:
+    """Empty shared context accumulated across agents during a run"""
+    return {
+        "applicant_name": "",
+        "applicant_details": {},
+        "risk_factors": [],
+        "supporting_evidence": [],
+        "recommendations": []
+    }
+
+
+class VerificationRun:
+    """State for one customer's loan verification orchestration"""
+
+    def __init__(self, customer_id: str, run_id: str = None):
+        self.customer_id = customer_id
+        self.run_id = run_id or uuid.uuid4().hex
+        self.started_at = datetime.now(timezone.utc)
+        self.agent_results = {}
+        self.shared_context = new_shared_context()
+        self.final_recommendation = None
+        # Cosmos document IDs of stored agent results, keyed by agent name
+        self.result_documents = {}
+        # Facts extracted from agent results and prompt-context sizes (orch_context)
+        self.context_digests = {}
+        self.context_tokens = {}
+        # Keyword scans of agent responses, keyed by (agent key, text hash) (orch_signals)
+        self.signal_scans = {}
+        # Per-stage latency and per-agent token usage (orch_metrics)
+        self.stage_timings = {}
+        self.token_usage = {}
+        # Streamed agent events for subscribers (orch_streaming)
+        self.events = RunEventBus(self)
+
+    @property
+    def applicant_name(self) -> str:
+        return self.shared_context.get("applicant_name") or ""
+
+    def __repr__(self):
+        return f"VerificationRun(customer_id={self.customer_id!r}, run_id={self.run_id!r})"
@@ -0,0 +1,197 @@
+"""
+Dependency graph and scheduler for the loan verification steps.
+
+Each verification step declares the upstream steps whose findings it actually
+needs. The scheduler starts a step as soon as its dependencies have finished,
+runs independent steps concurrently (bounded by a concurrency cap) and hands
+each step only the context produced along its own incoming edges.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from orch_config import VERIFICATION_MAX_CONCURRENCY
+from orch_metrics import stage_timer
+
+
+@dataclass(frozen=True)
+class VerificationStep:
+    """A single node in the verification graph"""
+    key: str                      # agent_results key, e.g. "identity"
+    name: str                     # display / Cosmos agent name, e.g. "Identity Check"
+    agent: str                    # key into the agents dict, e.g. "Identity"
+    function_name: str            # LoanVerificationPlugin kernel function
+    context_arg: str              # keyword argument carrying upstream context
+    prompt_file: str              # prompt in the instructions directory
+    label: str                    # heading used when building context strings
+    depends_on: Tuple[str, ...] = field(default_factory=tuple)
+    context_fields: Tuple[str, ...] = field(default_factory=tuple)  # upstream facts needed (all if empty)
+
+
+class VerificationGraph:
+    """Declarative DAG of verification steps with a concurrent scheduler"""
+
+    def __init__(self, steps: List[VerificationStep]):
+        self.steps = {step.key: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Duplicate verification step keys in graph")
+        self.order = self._topological_order(steps)
+
+    def _topological_order(self, steps: List[VerificationStep]) -> List[str]:
+        """Return step keys in a stable topological order, rejecting cycles"""
+        for step in steps:
+            for dep in step.depends_on:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{step.key}' depends on unknown step '{dep}'")
+
+        order, visiting, done = [], set(), set()
+
+        def visit(key):
+            if key in done:
+                return
+            if key in visiting:
+                raise ValueError(f"Cycle detected in verification graph at '{key}'")
+            visiting.add(key)
+            for dep in self.steps[key].depends_on:
+                visit(dep)
+            visiting.discard(key)
+            done.add(key)
+            order.append(key)
+
+        for step in steps:
+            visit(step.key)
+        return order
+
+    def dependencies(self, key: str) -> List[str]:
+        """Direct dependencies of a step, in graph order"""
+        deps = self.steps[key].depends_on
+        return [k for k in self.order if k in deps]
+
+    def critical_path(self) -> List[str]:
+        """Longest dependency chain (in number of steps) through the graph"""
+        best: Dict[str, List[str]] = {}
+        for key in self.order:
+            chains = [best[dep] for dep in self.steps[key].depends_on]
+            longest = max(chains, key=len) if chains else []
+            best[key] = longest + [key]
+        return max(best.values(), key=len) if best else []
+
+    def build_context(self, key: str, outputs: Dict[str, Any]) -> str:
+        """Concatenate upstream outputs along the incoming edges of a step"""
+        context = ""
+        for dep in self.dependencies(key):
+            if dep in outputs:
+                context += f"{self.steps[dep].label}: {outputs[dep]}\n\n"
+        return context
+
+    async def run(
+        self,
+        invoke_step: Callable[[VerificationStep, str], Awaitable[Any]],
+        max_concurrency: Optional[int] = None,
+        is_success: Callable[[Any], bool] = lambda result: True,
+        build_context: Optional[Callable[[VerificationStep, Dict[str, Any]], str]] = None,
+        run: Any = None,
+        completed: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute the graph and return a dict of step key -> result.
+
+        invoke_step is awaited with the step and its upstream context. A step
+        whose dependency failed (per is_success) or was skipped is skipped
+        itself and left out of the returned dict. Steps in completed (e.g.
+        restored from a checkpoint) are not executed; their given result is
+        used as is. Time spent waiting for a concurrency slot is recorded as
+        the queue_wait stage of run.
+        """
+        completed = completed or {}
+        limit = max_concurrency or VERIFICATION_MAX_CONCURRENCY
+        semaphore = asyncio.Semaphore(max(1, limit))
+        outputs: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: VerificationStep) -> bool:
+            dep_ok = await asyncio.gather(*(tasks[dep] for dep in step.depends_on))
+            if not all(dep_ok):
+                print(f"⏭️  Skipping {step.label} - upstream verification did not pass")
+                return False
+
+            if step.key in completed:
+                outputs[step.key] = completed[step.key]
+                print(f"♻️  {step.label} restored from checkpoint")
+                return is_success(completed[step.key])
+
+            if build_context:
+                context = build_context(step, outputs)
+            else:
+                context = self.build_context(step.key, outputs)
+
+            with stage_timer("queue_wait", run, step.name):
+                await semaphore.acquire()
+            try:
+                print(f"▶️  {step.label}...")
+                with stage_timer("verification_step", run, step.name):
+                    result = await invoke_step(step, context)
+            finally:
+                semaphore.release()
+
+            outputs[step.key] = result
+            ok = is_success(result)
+            print(f"{'✅' if ok else '⚠️'} {step.label} completed\n")
+            return ok
+
+        for key in self.order:
+            tasks[key] = asyncio.create_task(run_step(self.steps[key]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        return {key: outputs[key] for key in self.order if key in outputs}
+
+
+# Identity and inspection only read their own indexes, so they start together.
+# Income and guarantor cross-reference the applicant's identity; valuation
+# weighs income and inspection findings. context_fields lists the upstream
+# facts each step's prompt actually uses.
+VERIFICATION_STEPS = [
+    VerificationStep(
+        key="identity", name="Identity Check", agent="Identity",
+        function_name="verify_identity", context_arg="context",
+        prompt_file="identity_verification_prompt.txt",
+        label="Identity Verification",
+    ),
+    VerificationStep(
+        key="income", name="Income Check", agent="Income",
+        function_name="verify_income", context_arg="identity_context",
+        prompt_file="income_verification_prompt.txt",
+        label="Income Verification", depends_on=("identity",),
+        context_fields=("name", "birth", "dob", "pan", "aadhaar", "address", "employer", "occupation"),
+    ),
+    VerificationStep(
+        key="guarantor", name="Guarantor Check", agent="Guarantor",
+        function_name="verify_guarantor", context_arg="previous_context",
+        prompt_file="guarantor_verification_prompt.txt",
+        label="Guarantor Verification", depends_on=("identity",),
+        context_fields=("name", "address", "pan", "relationship"),
+    ),
+    VerificationStep(
+        key="inspection", name="Collateral Inspection Check", agent="Inspection",
+        function_name="inspect_collateral", context_arg="verification_context",
+        prompt_file="collateral_inspection_prompt.txt",
+        label="Inspection",
+    ),
+    VerificationStep(
+        key="valuation", name="Valuation Check", agent="Valuation",
+        function_name="verify_valuation", context_arg="all_context",
+        prompt_file="valuation_verification_prompt.txt",
+        label="Valuation", depends_on=("income", "inspection"),
+        context_fields=("income", "salary", "employer", "property", "condition", "area",
+                        "location", "construction", "age", "defect", "damage", "value"),
+    ),
+]
+
+verification_graph = VerificationGraph(VERIFICATION_STEPS)
@@ -0,0 +1,94 @@
+"""
+Single-pass risk / evidence signal extraction for agent responses.
+
+Every keyword the orchestrator looks for is compiled into one alternation
+regex, so a response is scanned once instead of once per keyword list. Scans
+return structured hits with character offsets and are cached on the
+VerificationRun, so summary rebuilds reuse the scan of an unchanged response.
+Matching keeps the original case-insensitive substring semantics: the
+alternation sits in a lookahead so overlapping keywords are all found
+("authenticoncern" -> "authentic", "concern"), and a hit on a longer keyword
+also counts for the shorter keywords it contains ("inconsistent" ->
+"consistent", "failed" -> "fail").
+"""
+
+import re
+from typing import Iterable, List, NamedTuple
+
+# Signals recorded in the run's shared context
+RISK_KEYWORDS = ('discrepancy', 'inconsistent', 'missing', 'insufficient', 'concern', 'risk', 'issue')
+POSITIVE_KEYWORDS = ('verified', 'consistent', 'adequate', 'sufficient', 'valid', 'authentic')
+# Signals that mark a step as having an issue in summaries and the final recommendation
+ISSUE_KEYWORDS = RISK_KEYWORDS + ('fail', 'no_response')
+RECOMMENDATION_RISK_KEYWORDS = ('risk', 'issue', 'concern', 'discrepancy', 'missing', 'failed', 'error')
+
+ALL_KEYWORDS = tuple(dict.fromkeys(
+    RISK_KEYWORDS + POSITIVE_KEYWORDS + ISSUE_KEYWORDS + RECOMMENDATION_RISK_KEYWORDS
+))
+
+# Longest first so the alternation prefers "inconsistent" over "consistent"; the
+# zero-width lookahead tries every offset, so overlapping keywords are not consumed
+_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(keyword) for keyword in sorted(ALL_KEYWORDS, key=len, reverse=True)) + "))",
+    re.IGNORECASE
+)
+# Keywords implied by a match: the keyword itself plus every keyword it contains
+_IMPLIED = {
+    keyword: frozenset(other for other in ALL_KEYWORDS if other in keyword)
+    for keyword in ALL_KEYWORDS
+}
+
+
+class SignalHit(NamedTuple):
+    """One keyword occurrence in a response"""
+    keyword: str
+    start: int
+    end: int
+
+
+class SignalScan:
+    """Result of scanning one response: hits in text order plus the keyword set"""
+
+    __slots__ = ("hits", "keywords", "source_hash")
+
+    def __init__(self, text: str):
+        self.source_hash = hash(text)
+        self.hits: List[SignalHit] = []
+        covered = 0
+        for match in _PATTERN.finditer(text or ""):
+            # A keyword inside an earlier hit is already implied by it
+            if match.end(1) <= covered:
+                continue
+            self.hits.append(SignalHit(match.group(1).lower(), match.start(1), match.end(1)))
+            covered = match.end(1)
+        keywords = set()
+        for hit in self.hits:
+            keywords |= _IMPLIED[hit.keyword]
+        self.keywords = frozenset(keywords)
+
+    def found(self, keywords: Iterable[str]) -> List[str]:
+        """Keywords from the given list that occur, in the list's order"""
+        return [keyword for keyword in keywords if keyword in self.keywords]
+
+    def any_of(self, keywords: Iterable[str]) -> bool:
+        return not self.keywords.isdisjoint(keywords)
+
+    def hits_for(self, keywords: Iterable[str]) -> List[SignalHit]:
+        """Hits that count for any of the given keywords"""
+        wanted = set(keywords)
+        return [hit for hit in self.hits if not wanted.isdisjoint(_IMPLIED[hit.keyword])]
+
+
+def scan_signals(text: str) -> SignalScan:
+    """Scan a response once for every known signal keyword"""
+    return SignalScan(text or "")
+
+
+def get_signals(run, agent_key: str, text: str) -> SignalScan:
+    """Scan of an agent's text, computed once per distinct text and cached on the run"""
+    cache_key = (agent_key, hash(text or ""))
+    scan = run.signal_scans.get(cache_key)
+    if scan is None:
+        scan = scan_signals(text)
+        run.signal_scans[cache_key] = scan
+    return scan
@@ -0,0 +1,101 @@
+"""
+Event stream for a verification run.
+
+While a run is streamed, every agent publishes its progress to the run's
+RunEventBus: agent_started, token (each text delta), partial (the message so
+far, throttled), message (a completed message) and agent_completed (the final
+result, after it has been stored as usual). Each subscriber gets its own
+bounded asyncio.Queue, so the console, the DocumentsVerificationUI backend and
+SSE endpoints can all follow the same run. The bus ends with run_finished.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from orch_config import AGENT_STREAM_QUEUE_SIZE
+
+RUN_FINISHED = "run_finished"
+
+
+def make_event(run, event_type: str, **fields) -> dict:
+    """Event dict for a run, stamped with its customer, run ID and time"""
+    return {
+        "type": event_type,
+        "customer_id": run.customer_id,
+        "run_id": run.run_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **fields
+    }
+
+
+class RunEventBus:
+    """Fan-out of one run's events to any number of subscriber queues"""
+
+    def __init__(self, run):
+        self.run = run
+        self._subscribers = set()
+        self.closed = False
+
+    @property
+    def active(self) -> bool:
+        """True while at least one consumer is listening"""
+        return bool(self._subscribers)
+
+    def subscribe(self, maxsize: int = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=maxsize or AGENT_STREAM_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        """Deliver an event to every subscriber without waiting
+
+        A subscriber that falls behind loses token events first; for any other
+        event its oldest queued event is dropped to make room.
+        """
+        for queue in list(self._subscribers):
+            if queue.full():
+                if event["type"] == "token":
+                    continue
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def close(self):
+        """Publish run_finished so consumers stop"""
+        if not self.closed:
+            self.closed = True
+            self.publish(make_event(self.run, RUN_FINISHED))
+
+
+async def iter_events(queue: asyncio.Queue):
+    """Yield events from a subscription until the run finishes"""
+    while True:
+        event = await queue.get()
+        yield event
+        if event["type"] == RUN_FINISHED:
+            return
+
+
+def format_sse(event: dict) -> str:
+    """Server-Sent Events frame for an event"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def print_stream_events(queue: asyncio.Queue):
+    """Console consumer: report first tokens and completed messages as they arrive"""
+    first_token = set()
+    async for event in iter_events(queue):
+        agent = event.get("agent")
+        if event["type"] == "token" and agent not in first_token:
+            first_token.add(agent)
+            print(f"⚡ {agent}: first tokens after {event.get('elapsed_ms', 0) / 1000:.1f}s")
+        elif event["type"] == "message":
+            print(f"📨 {agent}: message received ({len(event.get('text', ''))} chars)")
+        elif event["type"] == "agent_completed":
+            print(f"{'✅' if event.get('success') else '⚠️'} {agent}: streamed in {event.get('processing_time_ms', 0) / 1000:.1f}s")
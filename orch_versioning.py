@@ -0,0 +1,106 @@
+"""
+Versioned, idempotent document writes for Cosmos DB.
+
+Documents that are rewritten on every orchestration (agent results, the
+per-customer "latest" pointer) carry the run_id and run start time of the run
+that produced them plus a monotonically increasing version. A write is
+planned against the currently stored document:
+
+* nothing stored             -> create (version 1)
+* stored by a newer run      -> skip (late retry of an older run)
+* same run, same content     -> skip (replay of a write that already landed)
+* otherwise                  -> replace guarded by the stored document's ETag
+
+ETag conflicts (another writer got there first) are retried against the
+freshly read document, so replays never pile up documents or RUs.
+"""
+
+import hashlib
+import json
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from orch_config import COSMOS_WRITE_MAX_RETRIES
+
+# Bookkeeping fields excluded from the content hash
+_VOLATILE_FIELDS = {"timestamp", "updated_at", "version", "content_hash"}
+
+CREATE = "create"
+REPLACE = "replace"
+SKIP = "skip"
+
+
+def content_hash(document: dict) -> str:
+    """Hash of a document's payload, ignoring Cosmos system and bookkeeping fields"""
+    payload = {
+        key: value for key, value in document.items()
+        if not key.startswith("_") and key not in _VOLATILE_FIELDS
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def plan_versioned_write(existing, document: dict):
+    """Decide how to write a versioned document given what is stored
+
+    Returns (action, document_to_write, etag).
+    """
+    document = dict(document)
+    document["content_hash"] = content_hash(document)
+
+    if existing is None:
+        document["version"] = 1
+        return CREATE, document, None
+
+    existing_started = existing.get("run_started_at") or ""
+    if existing_started and document.get("run_started_at") and existing_started > document["run_started_at"]:
+        return SKIP, existing, existing.get("_etag")
+
+    if existing.get("run_id") == document.get("run_id") and existing.get("content_hash") == document["content_hash"]:
+        return SKIP, existing, existing.get("_etag")
+
+    document["version"] = int(existing.get("version", 0)) + 1
+    return REPLACE, document, existing.get("_etag")
+
+
+async def read_existing(container, item_id: str, partition_key: str):
+    """Point-read the stored version of a document, or None if it does not exist"""
+    try:
+        return await container.read_item(item=item_id, partition_key=partition_key)
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+
+
+async def write_versioned(container, document: dict, partition_key_field: str = "customer_id",
+                          max_retries: int = None):
+    """Create or ETag-guarded replace of a versioned document; returns the action taken"""
+    max_retries = max_retries if max_retries is not None else COSMOS_WRITE_MAX_RETRIES
+    partition_key = document[partition_key_field]
+
+    for attempt in range(max_retries + 1):
+        existing = await read_existing(container, document["id"], partition_key)
+        action, body, etag = plan_versioned_write(existing, document)
+        try:
+            if action == CREATE:
+                await container.create_item(body=body)
+            elif action == REPLACE:
+                await container.replace_item(
+                    item=body["id"],
+                    body=body,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified
+                )
+            return action
+        except (exceptions.CosmosResourceExistsError, exceptions.CosmosAccessConditionFailedError):
+            if attempt == max_retries:
+                raise
+            # Someone else wrote the document in between - re-plan against it
+
+    return SKIP
+
+
+def batch_operation(action: str, document: dict, etag: str = None):
+    """Transactional batch operation tuple for a planned write"""
+    if action == CREATE:
+        return ("create", (document,))
+    return ("replace", (document["id"], document), {"if_match_etag": etag})
@@ -0,0 +1,220 @@
+"""
+Write-behind buffer for Cosmos DB documents.
+
+Documents are queued per partition key (customer_id) and written with Cosmos
+transactional batches, either when a partition reaches the batch size or when
+the flush interval elapses, so agent steps never wait on storage. Each write
+is planned with orch_versioning (create, ETag-guarded replace or skip), so
+replays and retries are idempotent. Writes are planned against the version
+(and ETag) the buffer itself last wrote; a document is only point-read when
+the buffer has not written it yet or a batch was rejected with 409/412.
+Documents whose flush fails are appended to a local JSONL spill file and
+replayed on the next start.
+"""
+
+import asyncio
+import json
+import os
+from collections import OrderedDict, defaultdict
+
+from azure.cosmos import exceptions
+
+from orch_config import (
+    COSMOS_WRITE_BATCH_SIZE,
+    COSMOS_WRITE_FLUSH_INTERVAL,
+    COSMOS_WRITE_SPILL_FILE,
+    COSMOS_WRITE_MAX_RETRIES,
+)
+from orch_versioning import SKIP, batch_operation, plan_versioned_write, read_existing
+from orch_metrics import stage_timer
+
+# Service limits for a single transactional batch
+MAX_BATCH_OPERATIONS = 100
+MAX_BATCH_BYTES = 1_800_000
+# Written documents whose stored version the buffer remembers (least recently written dropped first)
+MAX_KNOWN_DOCUMENTS = 10_000
+
+
+def _chunk_documents(documents):
+    """Split documents into chunks that fit in one transactional batch"""
+    chunk, chunk_bytes = [], 0
+    for document in documents:
+        size = len(json.dumps(document, default=str))
+        if chunk and (len(chunk) >= MAX_BATCH_OPERATIONS or chunk_bytes + size > MAX_BATCH_BYTES):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(document)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def _result_etag(result):
+    """ETag of one transactional batch operation result"""
+    if not isinstance(result, dict):
+        return None
+    return result.get("eTag") or result.get("_etag") or (result.get("resourceBody") or {}).get("_etag")
+
+
+class CosmosWriteBuffer:
+    """Batches versioned writes per partition key and flushes them in the background"""
+
+    def __init__(self, container, partition_key_field: str = "customer_id",
+                 batch_size: int = None, flush_interval: float = None, spill_path: str = None):
+        self.container = container
+        self.partition_key_field = partition_key_field
+        self.batch_size = batch_size or COSMOS_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else COSMOS_WRITE_FLUSH_INTERVAL
+        self.spill_path = spill_path or COSMOS_WRITE_SPILL_FILE
+        self._pending = defaultdict(dict)
+        # (partition key, id) -> document as last written by this buffer, with its _etag
+        self._known = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._flush_tasks = set()
+        self._timer_task = None
+        self.documents_written = 0
+        self.batches_written = 0
+        self.documents_spilled = 0
+
+    def start(self):
+        """Start the periodic flush loop on the running event loop"""
+        if self._timer_task is None:
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def enqueue(self, document: dict):
+        """Queue a document for writing; returns without waiting for storage
+
+        A later document with the same id in the same partition replaces the
+        queued one, so only the latest version is written.
+        """
+        partition_key = document[self.partition_key_field]
+        self._pending[partition_key][document["id"]] = document
+        if len(self._pending[partition_key]) >= self.batch_size:
+            task = asyncio.create_task(self._flush_partition(partition_key))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _take(self, partition_key):
+        async with self._lock:
+            return list(self._pending.pop(partition_key, {}).values())
+
+    async def _flush_partition(self, partition_key):
+        documents = await self._take(partition_key)
+        for chunk in _chunk_documents(documents):
+            try:
+                await self._write_chunk(partition_key, chunk)
+            except Exception as e:
+                print(f"⚠️ Cosmos batch for {partition_key} failed ({str(e)}) - spilling {len(chunk)} documents")
+                self._spill(chunk)
+
+    async def _stored_version(self, partition_key, document_id):
+        """Document as last written by this buffer, else as read from the container"""
+        known = self._known.get((partition_key, document_id))
+        if known is not None:
+            return known
+        return await read_existing(self.container, document_id, partition_key)
+
+    def _remember(self, partition_key, body: dict, etag):
+        key = (partition_key, body["id"])
+        self._known.pop(key, None)
+        if etag:
+            self._known[key] = {**body, "_etag": etag}
+            if len(self._known) > MAX_KNOWN_DOCUMENTS:
+                self._known.popitem(last=False)
+
+    async def _write_chunk(self, partition_key, chunk):
+        """Plan each write against the stored version and commit them in one batch
+
+        A batch rejected because a document changed underneath it (ETag or
+        create conflict) is re-planned against freshly read documents and
+        retried.
+        """
+        for attempt in range(COSMOS_WRITE_MAX_RETRIES + 1):
+            existing = await asyncio.gather(
+                *(self._stored_version(partition_key, document["id"]) for document in chunk)
+            )
+            operations, bodies = [], []
+            for stored, document in zip(existing, chunk):
+                action, body, etag = plan_versioned_write(stored, document)
+                if action != SKIP:
+                    operations.append(batch_operation(action, body, etag))
+                    bodies.append(body)
+                elif stored is not None:
+                    self._remember(partition_key, stored, stored.get("_etag"))
+            if not operations:
+                return
+            try:
+                with stage_timer("cosmos_batch_write"):
+                    results = await self.container.execute_item_batch(
+                        batch_operations=operations,
+                        partition_key=partition_key
+                    )
+            except exceptions.CosmosBatchOperationError as e:
+                # Whatever this buffer remembers about the chunk may be stale now
+                for document in chunk:
+                    self._known.pop((partition_key, document["id"]), None)
+                if attempt == COSMOS_WRITE_MAX_RETRIES or e.error_index is None:
+                    raise
+                status = e.operation_responses[e.error_index].get("statusCode")
+                if status not in (409, 412):
+                    raise
+                continue
+            for body, result in zip(bodies, results or []):
+                self._remember(partition_key, body, _result_etag(result))
+            self.documents_written += len(operations)
+            self.batches_written += 1
+            return
+
+    async def flush(self):
+        """Write every queued document now, one concurrent batch per partition"""
+        partition_keys = list(self._pending.keys())
+        await asyncio.gather(*(self._flush_partition(pk) for pk in partition_keys))
+        if self._flush_tasks:
+            await asyncio.gather(*list(self._flush_tasks), return_exceptions=True)
+
+    def _spill(self, documents):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for document in documents:
+                f.write(json.dumps(document, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.documents_spilled += len(documents)
+
+    async def replay_spill(self) -> int:
+        """Re-queue documents left in the spill file by a failed flush"""
+        if not os.path.exists(self.spill_path):
+            return 0
+        replay_path = f"{self.spill_path}.replay"
+        os.replace(self.spill_path, replay_path)
+        count = 0
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    await self.enqueue(json.loads(line))
+                    count += 1
+                except (json.JSONDecodeError, KeyError) as e:
+                    print(f"⚠️ Skipping unreadable spilled document: {str(e)}")
+        await self.flush()
+        os.remove(replay_path)
+        if count:
+            print(f"♻️  Replayed {count} spilled Cosmos documents")
+        return count
+
+    async def close(self):
+        """Stop the flush loop and write anything still queued"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        await self.flush()